@@ -0,0 +1,105 @@
+"""
+Kite Exchange Simulator
+
+Local stand-in for Kite Connect (REST + KiteTicker WebSocket + postbacks) for
+end-to-end load tests of the unmodified bot. Prices are a seeded random walk;
+SL orders trigger and fill against it; every fill is posted to the bot.
+
+    # Terminal 1 - 300 open positions, 10 packets/s, 3 moves per token per packet
+    pdm run python trading-bot/scripts/kite_simulator.py --positions 300 --packet-hz 10 --ticks-per-packet 3
+
+    # Terminal 2 - the bot, pointed at the simulator (any API key / token works)
+    KITE_API_ROOT=http://127.0.0.1:8700 KITE_WS_ROOT=ws://127.0.0.1:8765 \\
+    API_KEY=sim ACCESS_TOKEN=sim ACCESS_TOKEN_DATE=$(date +%F) pdm run start-bot
+
+Throughput and latency are printed periodically and served at /sim/stats.
+"""
+
+import sys
+import os
+# Add the trading-bot directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import threading
+import time
+from waitress.server import create_server
+from src.simulator.exchange import SimulatedExchange
+from src.simulator.server import PostbackSender, TickerServer, create_rest_app
+from src.utils.logging_setup import setup_logging
+
+
+def keep_positions_open(exchange, target, stop_event, product="MIS", interval=1.0):
+    """Play the manual trader: top the book back up to `target` open positions"""
+    while not stop_event.wait(interval):
+        for _ in range(max(0, target - exchange.open_positions())):
+            if not exchange.open_position(product=product):
+                break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Kite Connect simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--rest-port", type=int, default=8700)
+    parser.add_argument("--ws-port", type=int, default=8765)
+    parser.add_argument("--postback-url", default="http://127.0.0.1:5001/postback")
+    parser.add_argument("--instruments", type=int, default=1000, help="Simulated NFO option contracts")
+    parser.add_argument("--positions", type=int, default=100, help="Open positions to keep alive (0 = none)")
+    parser.add_argument("--product", default="MIS", help="Product of the simulated BUYs (NRML to test SL_MODE=GTT)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds before the first positions open")
+    parser.add_argument("--packet-hz", type=float, default=10.0, help="WebSocket messages per second")
+    parser.add_argument("--ticks-per-packet", type=int, default=1, help="Price moves per token per message")
+    parser.add_argument("--volatility", type=float, default=0.002, help="Std-dev of each price move (fraction)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added to every REST call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra REST latency, uniform 0..N")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Fraction of place/modify calls rejected")
+    parser.add_argument("--order-rate", type=float, default=10.0, help="Order calls per second per API key (429 above)")
+    parser.add_argument("--api-rate", type=float, default=10.0, help="Other calls per second per API key")
+    parser.add_argument("--rest-threads", type=int, default=16)
+    parser.add_argument("--user-id", default="SIM001")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--stats-every", type=float, default=10.0, help="Seconds between stats lines (0 = off)")
+    args = parser.parse_args()
+
+    setup_logging("INFO")
+
+    exchange = SimulatedExchange(
+        instruments=args.instruments, seed=args.seed, volatility=args.volatility, user_id=args.user_id,
+        order_rate=args.order_rate, api_rate=args.api_rate, reject_rate=args.reject_rate,
+    )
+    postbacks = PostbackSender(args.postback_url, exchange).start()
+    exchange.on_order_update = postbacks.send
+
+    rest = create_server(create_rest_app(exchange, args.latency_ms, args.jitter_ms, args.seed),
+                         host=args.host, port=args.rest_port, threads=args.rest_threads)
+    threading.Thread(target=rest.run, name="sim-rest", daemon=True).start()
+    ticker = TickerServer(exchange, args.host, args.ws_port, args.packet_hz, args.ticks_per_packet).start()
+
+    print(f"🧪 Kite simulator: REST http://{args.host}:{args.rest_port}  WS ws://{args.host}:{ticker.port}")
+    print(f"📮 Postbacks -> {args.postback_url}")
+
+    stop_event = threading.Event()
+    if args.positions:
+        def trader():
+            if not stop_event.wait(args.warmup):
+                keep_positions_open(exchange, args.positions, stop_event, args.product)
+        threading.Thread(target=trader, name="sim-trader", daemon=True).start()
+
+    try:
+        while True:
+            time.sleep(args.stats_every or 3600)
+            if args.stats_every:
+                print(json.dumps(exchange.stats()))
+    except KeyboardInterrupt:
+        print("\n📊 Final stats:")
+        print(json.dumps(exchange.stats(), indent=2))
+    finally:
+        stop_event.set()
+        ticker.stop()
+        postbacks.stop()
+        rest.close()
+
+
+if __name__ == "__main__":
+    main()
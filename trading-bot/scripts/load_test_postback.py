@@ -0,0 +1,220 @@
+"""
+Postback Load Test
+
+Fires synthetic order postbacks at a postback server and reports sustained
+throughput and latency percentiles.
+
+Modes:
+- open (default): status OPEN updates against a running server. The bot
+  ignores them, so only the HTTP layer is measured and no orders are placed.
+- complete: BUY fills followed by SL exits, served in-process by the real
+  Flask app and bot on a stubbed Kite client. Every postback takes the bot
+  lock, places/matches an SL and writes state - the serialized hot path.
+
+Usage:
+    pdm run python scripts/load_test_postback.py --url http://localhost:5001/postback --requests 5000 --concurrency 32
+    pdm run python scripts/load_test_postback.py --mode complete --requests 5000 --concurrency 32
+"""
+
+import sys
+import os
+# Add the trading-bot directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import itertools
+import json
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StubKiteClient:
+    """KiteClient stand-in for the in-process server - answers instantly, no network"""
+
+    def __init__(self):
+        self.user_id = "LOADTEST"
+        self._order_ids = itertools.count(1)
+        self._tokens = itertools.count(1000)
+
+    def get_positions(self):
+        return {"day": [], "net": []}
+
+    def get_ltp(self, *instruments):
+        return {key: {"instrument_token": next(self._tokens)} for key in instruments}
+
+    def get_instruments(self, exchange=None):
+        return []
+
+    def reserve_orders(self, count=1):
+        return True
+
+    def place_sl_order(self, symbol, quantity, trigger, limit, product, reserved=False):
+        return f"SL{next(self._order_ids)}"
+
+    def modify_order(self, order_id, trigger, limit, reserved=False):
+        return order_id
+
+    def cancel_order(self, order_id, reserved=False):
+        return order_id
+
+
+def start_stub_server(port, threads):
+    """Serve the real postback app and bot on a stubbed Kite client"""
+    import run_bot
+    from waitress.server import create_server
+    from src.accounts import AccountRegistry
+    from src.bot import DynamicTradingBot
+
+    bot = DynamicTradingBot(
+        kite_client=StubKiteClient(),
+        state_file=os.path.join(tempfile.mkdtemp(), "state.json"),
+        instruments=None,
+        user_id="LOADTEST",
+    )
+    bot.start_market_websocket = lambda: None  # No ticker in the load test
+    registry = AccountRegistry()
+    registry._default_bot = bot
+    run_bot.registry = registry
+
+    server = create_server(run_bot.app, host="127.0.0.1", port=port, threads=threads)
+    run_bot.server = server
+    threading.Thread(target=server.run, name="stub-server", daemon=True).start()
+    return bot
+
+
+def build_open_payload(i):
+    """Build a postback the bot parses fully but never acts on"""
+    return json.dumps({
+        "user_id": "LOADTEST",
+        "order_id": f"LT{i:010d}",
+        "status": "OPEN",
+        "tradingsymbol": "NIFTY24DEC25000CE",
+        "exchange": "NFO",
+        "transaction_type": "BUY",
+        "order_type": "LIMIT",
+        "quantity": 75,
+        "average_price": 0,
+    }).encode()
+
+
+def build_complete_payloads(i):
+    """BUY fill opening a position, then the fill of the SL the bot placed for it"""
+    symbol = f"NIFTY24DEC{20000 + i}CE"
+    buy = json.dumps({
+        "user_id": "LOADTEST",
+        "order_id": f"LTB{i:010d}",
+        "status": "COMPLETE",
+        "tradingsymbol": symbol,
+        "exchange": "NFO",
+        "transaction_type": "BUY",
+        "order_type": "MARKET",
+        "quantity": 75,
+        "average_price": 100.0,
+    }).encode()
+    return symbol, buy
+
+
+def build_exit_payload(symbol, sl_order_id):
+    """Fill of the SL order the bot placed for a position"""
+    return json.dumps({
+        "user_id": "LOADTEST",
+        "order_id": sl_order_id,
+        "status": "COMPLETE",
+        "tradingsymbol": symbol,
+        "exchange": "NFO",
+        "transaction_type": "SELL",
+        "order_type": "SL",
+        "quantity": 75,
+        "average_price": 93.3,
+    }).encode()
+
+
+def post(url, body, timeout):
+    """POST one postback body, return (ok, latency_seconds)"""
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def send_open(url, i, timeout):
+    return [post(url, build_open_payload(i), timeout)]
+
+
+def send_complete(url, i, timeout, bot):
+    """Open a position, then close it through its SL fill"""
+    symbol, buy = build_complete_payloads(i)
+    results = [post(url, buy, timeout)]
+    position = bot.active_positions.get(symbol)
+    if position is None:
+        return results + [(False, 0.0)]
+    results.append(post(url, build_exit_payload(symbol, position['sl_order_id']), timeout))
+    return results
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the postback endpoint")
+    parser.add_argument("--mode", choices=["open", "complete"], default="open")
+    parser.add_argument("--url", default="http://localhost:5001/postback", help="Target server (open mode)")
+    parser.add_argument("--port", type=int, default=5099, help="Port for the in-process server (complete mode)")
+    parser.add_argument("--threads", type=int, default=8, help="Server worker threads (complete mode)")
+    parser.add_argument("--requests", type=int, default=5000, help="Total postbacks to send")
+    parser.add_argument("--concurrency", type=int, default=32, help="Parallel client connections")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout in seconds")
+    args = parser.parse_args()
+
+    if args.mode == "complete":
+        bot = start_stub_server(args.port, args.threads)
+        url = f"http://127.0.0.1:{args.port}/postback"
+        time.sleep(0.5)
+        # Each iteration sends a BUY and its SL exit
+        iterations = args.requests // 2
+        send = lambda i: send_complete(url, i, args.timeout, bot)
+    else:
+        url = args.url
+        iterations = args.requests
+        send = lambda i: send_open(url, i, args.timeout)
+
+    print(f"🚀 Sending {args.requests} {args.mode.upper()} postbacks to {url} with concurrency {args.concurrency}...")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = [result for batch in pool.map(send, range(iterations)) for result in batch]
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for ok, latency in results if ok)
+    failures = sum(1 for ok, _ in results if not ok)
+
+    print("\n📊 RESULTS:")
+    print(f"   Duration:     {elapsed:.2f}s")
+    print(f"   Succeeded:    {len(latencies)}")
+    print(f"   Failed:       {failures}")
+    print(f"   Throughput:   {len(latencies) / elapsed:.1f} postbacks/s")
+    if latencies:
+        print(f"   Latency p50:  {percentile(latencies, 50) * 1000:.1f} ms")
+        print(f"   Latency p95:  {percentile(latencies, 95) * 1000:.1f} ms")
+        print(f"   Latency p99:  {percentile(latencies, 99) * 1000:.1f} ms")
+        print(f"   Latency max:  {latencies[-1] * 1000:.1f} ms")
+    if args.mode == "complete":
+        print(f"   Open positions left: {len(bot.active_positions)}")
+
+
+if __name__ == "__main__":
+    main()
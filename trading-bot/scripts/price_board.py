@@ -0,0 +1,50 @@
+"""
+Live Price Board
+
+Prints the bot's latest LTP, tick age and SL per instrument straight from
+shared memory - no Kite API call, no request to the bot.
+
+Usage: pdm run prices [--name kite_prices_AB1234] [--watch 1]
+"""
+
+import sys
+import os
+# Add the trading-bot directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from src import config
+from src.price_board import PriceBoardReader
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the bot's shared-memory price board")
+    parser.add_argument("--name", default=config.PRICE_BOARD_NAME,
+                        help="Board name (default: PRICE_BOARD_NAME; multi-account boards end in _<user_id>)")
+    parser.add_argument("--watch", type=float, default=0, help="Refresh every N seconds")
+    args = parser.parse_args()
+
+    try:
+        board = PriceBoardReader(args.name)
+    except FileNotFoundError:
+        sys.exit(f"❌ No price board {args.name!r} - is the bot running with PRICE_BOARD_NAME set?")
+
+    try:
+        while True:
+            now = time.time()
+            print(f"{'token':>10} {'ltp':>10} {'sl':>10} {'age':>7}")
+            for token, price in sorted(board.snapshot().items()):
+                print(f"{token:>10} {price['ltp']:>10.2f} {price['sl_trigger']:>10.2f} {now - price['ts']:>6.1f}s")
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+            print()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        board.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Offline Strategy Replay
+
+Feeds recorded ticks through the live strategy engine with paper fills and
+prints how each position would have been trailed and exited.
+
+Tick file: CSV with header `timestamp,symbol,ltp` (epoch seconds), sorted by time.
+
+Usage: pdm run python scripts/replay_ticks.py ticks.csv --entry NIFTY24DEC25000CE:120.5:75 [--rules strategy_rules.json]
+"""
+
+import sys
+import os
+# Add the trading-bot directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import csv
+from src import config
+from src.replay import replay
+from src.rules import RuleStore, default_params
+
+
+def read_ticks(path):
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            yield float(row["timestamp"]), row["symbol"], float(row["ltp"])
+
+
+def parse_entry(value):
+    symbol, price, quantity = value.split(":")
+    return symbol, float(price), int(quantity)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded ticks through the strategy engine")
+    parser.add_argument("ticks", help="CSV file with timestamp,symbol,ltp")
+    parser.add_argument("--entry", action="append", type=parse_entry, required=True,
+                        help="SYMBOL:BUY_PRICE:QTY, may be repeated")
+    parser.add_argument("--rules", default=config.STRATEGY_RULES_FILE, help="Strategy rules file")
+    args = parser.parse_args()
+
+    rules = RuleStore(args.rules, default_params(config))
+    results = replay(read_ticks(args.ticks), args.entry, rules, config.MIN_SL_STEP)
+
+    total = 0.0
+    for symbol, result in results.items():
+        total += result['pnl']
+        print(f"\n📈 {symbol} bought @ {result['buy_price']} x {result['quantity']}")
+        for timestamp, sl, reason in result['sl_changes']:
+            print(f"   {timestamp:.0f}  SL -> {sl:.2f} ({reason})")
+        if result['exit_reason']:
+            print(f"   Exit @ {result['exit_price']:.2f} ({result['exit_reason']})")
+        else:
+            print(f"   Still open, last LTP {result['last_ltp']:.2f}")
+        print(f"   P&L: {result['pnl']:.2f}")
+    print(f"\n💰 Total P&L: {total:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,39 +22,67 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from flask import Flask, request, jsonify
+import hmac
 import json
 import logging
+import math
 import threading
+import time
+import _thread
 import signal
 import atexit
-from src.bot import DynamicTradingBot
+from src.accounts import AccountRegistry
+from src.session import SessionError
+from src.utils.logging_setup import setup_logging, stop_logging
+from src.utils.profiler import MIN_INTERVAL, memory_report, profile_for, stop_memory_tracing
 from src import config
 
+# Records are formatted and written on a background thread, off the tick/postback path
+setup_logging(config.LOG_LEVEL, config.LOG_FORMAT, config.LOG_SAMPLE_SECONDS)
+logger = logging.getLogger("run_bot")
+
 # Optional ngrok import
 ngrok = None
 if config.USE_NGROK:
     try:
         from pyngrok import ngrok
-        logging.info("✅ pyngrok imported successfully")
+        logger.info("✅ pyngrok imported successfully")
     except ImportError:
-        logging.warning("⚠️  pyngrok not installed. Install with: pip install pyngrok")
-        logging.warning("⚠️  Continuing without ngrok support...")
+        logger.warning("⚠️  pyngrok not installed. Install with: pip install pyngrok")
+        logger.warning("⚠️  Continuing without ngrok support...")
         config.USE_NGROK = False
 
+# Production WSGI server (one process, many worker threads, so the single
+# bot instance per account is shared by every request)
+create_server = None
+if config.SERVER_MODE == "production":
+    try:
+        from waitress.server import create_server
+        from waitress import wasyncore
+    except ImportError:
+        # Never silently run the development server in production
+        sys.exit("❌ SERVER_MODE=production requires waitress. Install with: pdm install")
+elif config.SERVER_MODE != "development":
+    sys.exit(f"❌ Unknown SERVER_MODE '{config.SERVER_MODE}' - use development or production")
+
 app = Flask(__name__)
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 
-# Global bot instance (in production, use proper singleton pattern)
-bot_instance = None
+# Global registry of bot instances - one per account
+registry = None
 ngrok_tunnel = None
+server = None
 shutdown_event = threading.Event()
+_profile_lock = threading.Lock()  # One profile at a time - concurrent samplers would skew each other
+_drain_lock = threading.Lock()
+_drained = False
+drain_complete = threading.Event()
 
 def cleanup():
     """Clean up resources on exit"""
-    global ngrok_tunnel, bot_instance
+    global ngrok_tunnel, registry
     
-    # Set shutdown event to stop any running threads gracefully
-    shutdown_event.set()
+    # Flush bot state if we got here without a signal (e.g. server crash)
+    drain()
     
     # Clean up ngrok tunnel
     if ngrok_tunnel:
@@ -64,21 +92,69 @@ def cleanup():
         except:
             pass
     
-    # Clean up bot instance
-    if bot_instance and hasattr(bot_instance, 'market_ws') and bot_instance.market_ws:
-        try:
-            bot_instance.market_ws.close()
-        except:
-            pass
+    # Clean up bot instances
+    for bot in (registry.all_bots() if registry else []):
+        if bot.market_ws:
+            try:
+                bot.market_ws.close()
+            except:
+                pass
     
-    # Ensure logging is properly flushed
+    # Flush records still queued for the writer thread
+    stop_logging()
     logging.shutdown()
 
+def _wait_for_idle_workers(timeout):
+    """Wait until waitress has no queued or running postbacks"""
+    dispatcher = server.task_dispatcher
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not dispatcher.queue and dispatcher.active_count == 0:
+            return True
+        time.sleep(0.05)
+    return False
+
+def drain():
+    """Stop taking postbacks, let in-flight ones finish and flush bot state"""
+    global _drained
+    with _drain_lock:
+        if _drained:
+            return
+        _drained = True
+    
+    # New postbacks (including ones already queued) get 503 from here on
+    shutdown_event.set()
+    
+    if server is not None:
+        # Close the listener from inside the server loop - asyncore is not thread-safe
+        server.trigger.pull_trigger(lambda: wasyncore.dispatcher.close(server))
+        if not _wait_for_idle_workers(config.SHUTDOWN_TIMEOUT_SECONDS):
+            logger.error("⚠️  Postbacks still running after %ss", config.SHUTDOWN_TIMEOUT_SECONDS)
+    
+    # Wait for in-flight SL modifications, then persist state
+    if registry:
+        registry.shutdown()
+    drain_complete.set()
+
+def _drain_and_stop():
+    """Drain off the main thread, then stop the server loop running there"""
+    drain()
+    # Re-enters signal_handler on the main thread, which now raises
+    # KeyboardInterrupt - server.run()/app.run() treat that as a clean stop
+    # and waitress stops its (now idle) worker threads
+    _thread.interrupt_main()
+
 def signal_handler(signum, frame):
     """Handle system signals gracefully"""
+    # Signal handlers interrupt the server loop wherever it is - possibly while
+    # it holds waitress locks - so only flag here and drain on another thread
+    if drain_complete.is_set():
+        raise KeyboardInterrupt
+    if shutdown_event.is_set():
+        return
     print(f"\n⏹️  Received signal {signum}, shutting down gracefully...")
-    cleanup()
-    sys.exit(0)
+    shutdown_event.set()
+    threading.Thread(target=_drain_and_stop, name="drain").start()
 
 # Register signal handlers and cleanup
 signal.signal(signal.SIGINT, signal_handler)
@@ -88,34 +164,105 @@ atexit.register(cleanup)
 @app.route('/postback', methods=['POST'])
 def handle_postback():
     """Handle postback from Zerodha"""
+    if shutdown_event.is_set():
+        return jsonify({"status": "error", "message": "Server is shutting down"}), 503
+    
     try:
         # Get the postback data
-        data = request.get_json()
+        data = request.get_json(silent=True)
         
         if not data:
             # Sometimes data comes as form data
             data = request.form.to_dict()
+
+        if not isinstance(data, dict):
+            # Valid JSON but not an order (a list, string or number)
+            return jsonify({"status": "error", "message": "Postback must be a JSON object"}), 400
+
+        # Full payload only at DEBUG - INFO logs one line per order from the bot
+        logger.debug("Received postback: %s", data,
+                     extra={"order_id": data.get("order_id"), "user_id": data.get("user_id")})
         
-        logging.info(f"Received postback: {data}")
-        
-        # Forward to bot if available
-        if bot_instance:
-            bot_instance.handle_order_update(data)
+        # Forward to the bot that owns this account
+        bot = registry.route(data) if registry else None
+        if bot:
+            bot.handle_order_update(data)
+        elif registry:
+            logger.warning("No bot registered for user_id %s - postback ignored", data.get('user_id'))
         
         return jsonify({"status": "success"})
         
     except Exception as e:
-        logging.error(f"Error handling postback: {e}")
+        logger.error("Error handling postback: %s", e)
         return jsonify({"status": "error", "message": str(e)}), 500
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "message": "Postback server is running"})
+    if shutdown_event.is_set():
+        return jsonify({"status": "draining", "message": "Postback server is shutting down"}), 503
+    return jsonify({
+        "status": "healthy",
+        "message": "Postback server is running",
+        "ticks": {bot.user_id or "default": bot.dispatcher.stats() for bot in (registry.all_bots() if registry else [])},
+    })
+
+def _admin_denied():
+    """Error response unless the request carries ADMIN_TOKEN (admin endpoints are off without one)"""
+    if not config.ADMIN_TOKEN:
+        return jsonify({"status": "error", "message": "Admin endpoints are disabled - set ADMIN_TOKEN"}), 404
+    supplied = request.headers.get("X-Admin-Token") or request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(supplied.encode(), config.ADMIN_TOKEN.encode()):
+        return jsonify({"status": "error", "message": "Invalid admin token"}), 401
+    return None
+
+@app.route('/admin/profile', methods=['GET'])
+def admin_profile():
+    """Sample every thread's stack for ?seconds=N and return collapsed stacks (flamegraph input)"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    try:
+        seconds = float(request.args.get("seconds", 10))
+        interval = float(request.args.get("interval_ms", 10)) / 1000
+    except ValueError:
+        return jsonify({"status": "error", "message": "seconds and interval_ms must be numbers"}), 400
+    if not (math.isfinite(seconds) and seconds > 0):
+        return jsonify({"status": "error", "message": "seconds must be a positive number"}), 400
+    if not (math.isfinite(interval) and interval >= MIN_INTERVAL):
+        # A tighter loop would hold the GIL and stall the tick path being profiled
+        return jsonify({"status": "error", "message": f"interval_ms must be at least {MIN_INTERVAL * 1000:g}"}), 400
+    seconds = min(seconds, config.PROFILE_MAX_SECONDS)
+    if not _profile_lock.acquire(blocking=False):
+        return jsonify({"status": "error", "message": "A profile is already running"}), 409
+    try:
+        logger.info("🔬 Profiling all threads for %ss at %sms", seconds, interval * 1000)
+        profiler = profile_for(seconds, interval)
+    finally:
+        _profile_lock.release()
+    return profiler.collapsed(), 200, {"Content-Type": "text/plain; charset=utf-8",
+                                       "X-Profile-Samples": str(profiler.samples)}
+
+@app.route('/admin/memory', methods=['GET', 'DELETE'])
+def admin_memory():
+    """Top allocation sites and growth since the last call (GET); stop tracemalloc (DELETE)"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if request.method == 'DELETE':
+        stop_memory_tracing()
+        return jsonify({"status": "success", "message": "Memory tracing stopped"})
+    try:
+        top = int(request.args.get("top", 25))
+    except ValueError:
+        top = 0
+    if top <= 0:
+        return jsonify({"status": "error", "message": "top must be a positive integer"}), 400
+    return jsonify(memory_report(top))
 
 def run_postback_server():
     """Run the integrated bot with postback server"""
-    global bot_instance, ngrok_tunnel
+    global registry, ngrok_tunnel, server
     
     print("🚀 Starting Dynamic Trading Bot...")
     print("📡 Integrated with real-time postback notifications!")
@@ -128,7 +275,7 @@ def run_postback_server():
                 ngrok.set_auth_token(config.NGROK_AUTH_TOKEN)
             
             # Create tunnel
-            ngrok_tunnel = ngrok.connect(5001)
+            ngrok_tunnel = ngrok.connect(config.SERVER_PORT)
             public_url = ngrok_tunnel.public_url
             
             print(f"\n🌐 NGROK TUNNEL CREATED:")
@@ -137,7 +284,7 @@ def run_postback_server():
             print(f"   📍 Health check: {public_url}/health")
             
         except Exception as e:
-            logging.error(f"❌ Failed to create ngrok tunnel: {e}")
+            logger.error("❌ Failed to create ngrok tunnel: %s", e)
             print("⚠️  Continuing without ngrok tunnel...")
     
     print("\n�🔧 POSTBACK SETUP:")
@@ -149,28 +296,47 @@ def run_postback_server():
         print("   📍 Production: https://yourdomain.com/postback")
         print("   📍 Local: https://your-ngrok-url.ngrok.io/postback")
         print("\n💡 For local testing:")
-        print("   📱 Run: ngrok http 5001")
+        print(f"   📱 Run: ngrok http {config.SERVER_PORT}")
         print("   📍 Or set USE_NGROK=true in .env for automatic tunnel")
     
     print("\n✅ Once configured, you'll get INSTANT order notifications!")
     print("📈 Just place your orders in Kite - bot handles the rest!")
     print("⏹️  Press Ctrl+C to stop everything.\n")
     
-    # Start the bot in a separate thread
-    bot_instance = DynamicTradingBot()
-    bot_thread = threading.Thread(target=bot_instance.run, daemon=True)
-    bot_thread.start()
+    # Start one bot per account, each in its own thread
+    try:
+        if config.ACCOUNTS_FILE:
+            registry = AccountRegistry.from_file(config.ACCOUNTS_FILE)
+            print(f"👥 Multi-account mode: {len(registry.bots)} accounts from {config.ACCOUNTS_FILE}")
+        else:
+            registry = AccountRegistry.single()
+        registry.start()
+    except SessionError as e:
+        # Unattended restarts land here instead of blocking on a login prompt
+        logger.error("❌ Session %s: %s", e.status, e)
+        registry = None
+        sys.exit(2)
+    except ValueError as e:
+        # A malformed accounts file - same clean exit, nothing to retry
+        logger.error("❌ %s", e)
+        registry = None
+        sys.exit(2)
     
     print("🤖 Trading bot started and ready...")
-    print("🌐 Flask postback server starting on port 5001...")
     
     try:
-        # Run Flask server on port 5001 to avoid macOS AirPlay conflict
-        app.run(host='0.0.0.0', port=5001, debug=False, use_reloader=False)
+        if create_server:
+            print(f"🌐 Production postback server (waitress, {config.SERVER_THREADS} threads) starting on port {config.SERVER_PORT}...")
+            server = create_server(app, host=config.SERVER_HOST, port=config.SERVER_PORT, threads=config.SERVER_THREADS)
+            server.run()
+        else:
+            # Default port 5001 avoids the macOS AirPlay conflict on 5000
+            print(f"🌐 Flask postback server starting on port {config.SERVER_PORT}...")
+            app.run(host=config.SERVER_HOST, port=config.SERVER_PORT, debug=False, use_reloader=False, threaded=True)
     except (KeyboardInterrupt, SystemExit):
         print("\n⏹️  Shutting down...")
     except Exception as e:
-        logging.error(f"Server error: {e}")
+        logger.error("Server error: %s", e)
     finally:
         # cleanup() will be called automatically via atexit
         pass
@@ -0,0 +1,70 @@
+"""
+Trade Journal Report
+
+End-of-day (or any range) analytics from the SQLite trade journal: realized
+P&L, win rate, slippage against the SL trigger, SL modifies per trade and
+time in trade, grouped by day, symbol, underlying or account.
+
+Usage: pdm run report [--from 2024-01-01] [--to 2024-03-31] [--underlying NIFTY] [--by underlying] [--trades]
+"""
+
+import sys
+import os
+# Add the trading-bot directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import datetime
+from zoneinfo import ZoneInfo
+from src import config
+from src.journal import query_trades, summarize
+
+
+def main():
+    exchange_tz = ZoneInfo(config.MARKET_TIMEZONE)  # The journal buckets trades by exchange day
+    today = datetime.datetime.now(exchange_tz).date().isoformat()
+    parser = argparse.ArgumentParser(description="Summarize the trade journal")
+    parser.add_argument("--db", default=config.JOURNAL_FILE, help="Journal file (default: JOURNAL_FILE)")
+    parser.add_argument("--from", dest="start", default=today, help="First day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--to", dest="end", default=today, help="Last day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--symbol")
+    parser.add_argument("--underlying")
+    parser.add_argument("--account", dest="user_id")
+    parser.add_argument("--by", dest="group_by", default="day", choices=["day", "symbol", "underlying", "user_id"])
+    parser.add_argument("--trades", action="store_true", help="Also list every trade")
+    args = parser.parse_args()
+
+    if not args.db or not os.path.exists(args.db):
+        sys.exit(f"❌ No trade journal at {args.db!r} - set JOURNAL_FILE or pass --db")
+
+    filters = {"start": args.start, "end": args.end, "symbol": args.symbol,
+               "underlying": args.underlying, "user_id": args.user_id}
+
+    if args.trades:
+        print(f"{'opened':19}  {'symbol':24} {'qty':>5} {'buy':>8} {'exit':>8} {'slip':>6} {'mods':>4} {'held':>7} {'P&L':>10}  reason")
+        for trade in query_trades(args.db, **filters):
+            opened = datetime.datetime.fromtimestamp(trade['opened_at'], exchange_tz).strftime("%Y-%m-%d %H:%M:%S")
+            fmt = lambda value, spec: format(value, spec) if value is not None else "-"
+            print(f"{opened:19}  {trade['symbol']:24} {trade['quantity']:>5} {trade['buy_price']:>8.2f} "
+                  f"{fmt(trade['exit_price'], '>8.2f'):>8} {fmt(trade['slippage'], '>6.2f'):>6} {trade['modifies']:>4} "
+                  f"{fmt(trade['seconds_in_trade'], '>6.0f'):>6}s {fmt(trade['realized_pnl'], '>10.2f'):>10}  "
+                  f"{trade['exit_reason'] or 'open'}")
+        print()
+
+    rows = summarize(args.db, group_by=args.group_by, **filters)
+    if not rows:
+        print(f"📭 No closed trades between {args.start} and {args.end}")
+        return
+
+    print(f"{args.group_by:24} {'trades':>6} {'win%':>6} {'P&L':>12} {'avg slip':>9} {'avg mods':>9} {'avg held':>9}")
+    total = 0.0
+    for row in rows:
+        total += row['realized_pnl']
+        slippage = f"{row['avg_slippage']:.2f}" if row['avg_slippage'] is not None else "-"
+        print(f"{str(row[args.group_by]):24} {row['trades']:>6} {row['win_rate'] * 100:>5.0f}% {row['realized_pnl']:>12.2f} "
+              f"{slippage:>9} {row['avg_modifies']:>9.1f} {row['avg_seconds_in_trade']:>8.0f}s")
+    print(f"\n💰 Total realized P&L: {total:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,45 @@
 """
 Zerodha Authentication Utility
 Standalone script for getting Zerodha API credentials and access tokens
+
+Usage:
+    pdm run auth                      # Single account from .env
+    pdm run auth --account AB1234     # One account from ACCOUNTS_FILE (multi-account mode)
 """
 
+import argparse
 from src.auth import ZerodhaAuth
+from src import config
+
+def login_account(user_id):
+    """Daily login for one account of the multi-account setup"""
+    from src.accounts import load_accounts
+    
+    if not config.ACCOUNTS_FILE:
+        print("❌ ACCOUNTS_FILE is not set in .env")
+        return None
+    
+    accounts = {a['user_id']: a for a in load_accounts(config.ACCOUNTS_FILE, require_tokens=False)}
+    if user_id not in accounts:
+        print(f"❌ Account {user_id} not found in {config.ACCOUNTS_FILE}")
+        return None
+    
+    return ZerodhaAuth().login_account(accounts[user_id])
 
 def main():
     """Main function to run authentication"""
+    parser = argparse.ArgumentParser(description="Zerodha authentication")
+    parser.add_argument("--account", help="user_id from ACCOUNTS_FILE to log in")
+    args = parser.parse_args()
+    
     print("=== Zerodha Authentication Utility ===")
     
+    if args.account:
+        access_token = login_account(args.account)
+        if access_token:
+            print(f"\n=== Authentication Successful for {args.account} ===")
+        return access_token
+    
     auth = ZerodhaAuth()
     credentials = auth.authenticate()
     
@@ -20,4 +51,4 @@ def main():
     return credentials
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,229 @@
+import json
+import logging
+import threading
+from typing import Dict, List, Optional
+from src.auth import load_account_token
+from src.bot import DynamicTradingBot
+from src.instruments import InstrumentCache
+from src.journal import TradeJournal
+from src.kite_client import KiteClient
+from src.market_hours import MarketCalendar, MarketScheduler
+from src.rules import RuleStore, default_params
+from src.session import MISSING, SessionError, SessionValidator, env_credentials, reload_env_token
+from src import config
+
+logger = logging.getLogger(__name__)
+
+"""
+MULTI-ACCOUNT MODE
+==================
+Runs one DynamicTradingBot per client account inside a single process.
+Accounts share the instrument cache, strategy rules and trade journal; each keeps its own Kite session,
+rate-limit budget, state file and WebSocket. Postbacks are routed by the
+`user_id` field Zerodha includes in every order update.
+
+Kite access tokens expire daily. Each morning run `pdm run auth --account <user_id>`
+for every account; tokens are kept in TOKENS_DIR, not in the accounts file.
+"""
+
+
+def load_accounts(path: str, require_tokens: bool = True) -> List[dict]:
+    """Load and validate the accounts file, attaching today's access tokens
+
+    Raises ValueError for a malformed file and SessionError (MISSING) for an
+    account without a token today.
+    """
+    with open(path, "r") as f:
+        accounts = json.load(f)
+
+    if not isinstance(accounts, list) or not accounts:
+        raise ValueError(f"{path} must contain a non-empty JSON list of accounts")
+
+    seen = set()
+    for account in accounts:
+        for field in ("user_id", "api_key"):
+            if not account.get(field):
+                raise ValueError(f"Account entry missing '{field}': {account.get('user_id', '<unknown>')}")
+        if account["user_id"] in seen:
+            raise ValueError(f"Duplicate account user_id: {account['user_id']}")
+        seen.add(account["user_id"])
+        account.setdefault("state_file", f"state_{account['user_id']}.json")
+
+    state_files = [account["state_file"] for account in accounts]
+    if len(set(state_files)) != len(state_files):
+        raise ValueError("Accounts must not share a state_file")
+
+    if require_tokens:
+        for account in accounts:
+            account["access_token"] = account.get("access_token") or load_account_token(account["user_id"])
+            if not account["access_token"]:
+                raise SessionError(MISSING, f"No valid access token for {account['user_id']} today - "
+                                            f"run: pdm run auth --account {account['user_id']}")
+
+    return accounts
+
+
+class AccountRegistry:
+    """Owns every bot in the process and routes postbacks to the right one"""
+
+    def __init__(self):
+        self.instruments = InstrumentCache()
+        self.rules = RuleStore(config.STRATEGY_RULES_FILE, default_params(config))
+        # One journal (and writer thread) for every account; rows carry the user_id
+        self.journal = TradeJournal(config.JOURNAL_FILE, timezone=config.MARKET_TIMEZONE) if config.JOURNAL_FILE else None
+        self._stop_event = threading.Event()
+        self.scheduler: Optional[MarketScheduler] = None
+        self.bots: Dict[str, DynamicTradingBot] = {}  # user_id -> bot
+        self.accounts_path: Optional[str] = None  # Re-read for each day's tokens
+        self._default_bot: Optional[DynamicTradingBot] = None
+
+    @classmethod
+    def single(cls):
+        """Registry for the classic one-account setup driven by .env"""
+        registry = cls()
+        registry._default_bot = DynamicTradingBot(instruments=registry.instruments, rules=registry.rules,
+                                                  journal=registry.journal)
+        return registry
+
+    @classmethod
+    def from_file(cls, path: str):
+        """Registry with one bot per entry of the accounts file"""
+        registry = cls()
+        registry.accounts_path = path
+        for account in load_accounts(path):
+            user_id = account["user_id"]
+            kite_client = KiteClient(account["api_key"], account["access_token"], user_id=user_id)
+            registry.bots[user_id] = DynamicTradingBot(
+                kite_client=kite_client,
+                state_file=account["state_file"],
+                instruments=registry.instruments,
+                user_id=user_id,
+                rules=registry.rules,
+                journal=registry.journal,
+            )
+            logger.info("👤 Registered account %s (state: %s)", user_id, account['state_file'])
+        return registry
+
+    def all_bots(self) -> List[DynamicTradingBot]:
+        if self._default_bot:
+            return [self._default_bot]
+        return list(self.bots.values())
+
+    def route(self, order: dict) -> Optional[DynamicTradingBot]:
+        """Find the bot that owns an order update"""
+        if self._default_bot:
+            return self._default_bot
+        return self.bots.get(order.get("user_id"))
+
+    def warm(self):
+        """Validate every session and (re)load the shared instrument cache
+
+        Raises SessionError if any account's access token is missing or rejected.
+        """
+        failures = self._validate(self.all_bots())
+        if failures:
+            errors = list(failures.values())
+            raise SessionError(errors[0].status, "; ".join(str(e) for e in errors))
+
+    def prewarm(self) -> List[DynamicTradingBot]:
+        """The daily warm(): load today's token into every client first; returns the bots that can't trade
+
+        A client reads its token once, when it is created, and Kite tokens
+        expire daily - without this the second day would reconnect on
+        yesterday's session.
+        """
+        inline = {}
+        if self.accounts_path:
+            try:
+                inline = {account["user_id"]: account.get("access_token")
+                          for account in load_accounts(self.accounts_path, require_tokens=False)}
+            except (OSError, ValueError) as e:
+                logger.error("❌ Could not re-read %s for today's tokens: %s", self.accounts_path, e)
+
+        failures, ready = {}, []
+        for bot in self.all_bots():
+            try:
+                bot.kite_client.set_access_token(self._todays_token(bot, inline))
+                ready.append(bot)
+            except SessionError as e:
+                failures[bot] = e
+        failures.update(self._validate(ready))
+        for bot, error in failures.items():
+            logger.critical("🚨 Session %s for %s - its ticker stays off until the next pre-warm: %s",
+                            error.status, bot.user_id or "default", error, extra={"user_id": bot.user_id})
+        return list(failures)
+
+    def _todays_token(self, bot: DynamicTradingBot, inline: Dict[str, str]) -> str:
+        """Today's access token for a bot - from .env, the accounts file or TOKENS_DIR"""
+        if bot is self._default_bot:
+            reload_env_token()
+            return env_credentials()["access_token"]
+        token = inline.get(bot.user_id) or load_account_token(bot.user_id)
+        if not token:
+            raise SessionError(MISSING, f"No valid access token for {bot.user_id} today - "
+                                        f"run: pdm run auth --account {bot.user_id}")
+        return token
+
+    def _validate(self, bots: List[DynamicTradingBot]) -> Dict[DynamicTradingBot, SessionError]:
+        """Check every session with Kite while the instrument dump loads; returns the failures"""
+        validators = [(bot, SessionValidator(bot.kite_client).start()) for bot in bots]
+        if bots:
+            try:
+                # One instruments dump serves every account - without it each bot
+                # would pay a per-symbol LTP call on its own rate-limit budget
+                self.instruments.load(bots[0].kite_client, "NFO")
+            except Exception as e:
+                logger.warning("⚠️  Instrument dump failed, falling back to per-symbol lookups: %s", e)
+        
+        # Refuse to trade on a session Kite won't accept - better to stop now
+        # than to find out from the first rejected SL order
+        failures = {}
+        for bot, validator in validators:
+            try:
+                validator.wait(config.SESSION_VALIDATE_TIMEOUT_SECONDS)
+            except SessionError as e:
+                failures[bot] = e
+        return failures
+
+    def start(self):
+        """Warm up (see warm()), then run every bot in its own daemon thread
+
+        Raises SessionError if any account's access token is missing or rejected.
+        """
+        self.warm()
+        bots = self.all_bots()
+        
+        threads = []
+        if config.MARKET_SCHEDULER:
+            self.scheduler = MarketScheduler(MarketCalendar.from_config(), self.all_bots, warm=self.prewarm)
+            # Before the bots run - outside the session they must not open a ticker
+            self.scheduler.sync()
+            scheduler = threading.Thread(target=self.scheduler.run, args=(self._stop_event,),
+                                         name="market-hours", daemon=True)
+            scheduler.start()
+            threads.append(scheduler)
+        if self.rules.path:
+            # One watcher for every account - reloads swap the shared table atomically
+            watcher = threading.Thread(target=self.rules.watch, args=(self._stop_event, config.RULES_POLL_SECONDS),
+                                       name="rules-watch", daemon=True)
+            watcher.start()
+            threads.append(watcher)
+        
+        for bot in bots:
+            name = f"bot-{bot.user_id}" if bot.user_id else "bot"
+            thread = threading.Thread(target=bot.run, name=name, daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def shutdown(self):
+        """Drain every bot"""
+        self._stop_event.set()
+        for bot in self.all_bots():
+            try:
+                bot.shutdown()
+            except Exception as e:
+                logger.error("Error shutting down bot %s: %s", bot.user_id, e)
+        # After the bots - their last exits are queued by now
+        if self.journal is not None:
+            self.journal.close()
@@ -4,6 +4,40 @@ import json
 import datetime
 from kiteconnect import KiteConnect
 from . import config
+from .session import SessionError, env_credentials
+
+
+def account_token_path(user_id):
+    """Per-account daily token file used in multi-account mode"""
+    return os.path.join(config.TOKENS_DIR, f"{user_id}.json")
+
+
+def load_account_token(user_id):
+    """Return today's access token for an account, or None if missing/expired"""
+    path = account_token_path(user_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            saved = json.load(f)
+        token_date = datetime.datetime.strptime(saved['date'], '%Y-%m-%d').date()
+    except (ValueError, KeyError, TypeError, json.JSONDecodeError):
+        return None
+    if token_date < datetime.datetime.now().date():
+        return None
+    return saved.get('access_token')
+
+
+def save_account_token(user_id, access_token):
+    """Store an account's access token with today's date"""
+    os.makedirs(config.TOKENS_DIR, exist_ok=True)
+    path = account_token_path(user_id)
+    today_str = datetime.datetime.now().date().strftime('%Y-%m-%d')
+    with open(path, 'w') as f:
+        json.dump({'access_token': access_token, 'date': today_str}, f)
+    # Tokens grant trading access - keep them private to the bot user
+    os.chmod(path, 0o600)
+    print(f"✅ Access token for {user_id} saved to {path} (valid until {today_str})")
 
 
 class ZerodhaAuth:
@@ -69,20 +103,11 @@ class ZerodhaAuth:
         print(f"✅ Access token saved to .env file (valid until {token_date})")
     
     def _is_token_valid(self):
-        """Check if stored access token is still valid (same day)"""
-        # Reload config to get latest .env values
-        from . import config
-        from importlib import reload
-        reload(config)
-        
-        if not config.ACCESS_TOKEN or not config.ACCESS_TOKEN_DATE:
-            return False
-            
+        """Check if the .env access token was issued today (validity is checked by src.session)"""
         try:
-            token_date = datetime.datetime.strptime(config.ACCESS_TOKEN_DATE, '%Y-%m-%d').date()
-            today = datetime.datetime.now().date()
-            return token_date >= today
-        except (ValueError, TypeError):
+            env_credentials()
+            return True
+        except SessionError:
             return False
         
     def _load_credentials(self):
@@ -135,22 +160,42 @@ class ZerodhaAuth:
             sys.exit()
     
     def authenticate(self):
-        """Main authentication method"""
+        """Interactive login - only for scripts/zerodha_auth.py, the bot itself never prompts"""
         print("---Getting Access Token---")
         self._load_credentials()
         self._get_access_token()
         
-        if config.ACCESS_TOKEN and config.ACCESS_TOKEN_DATE:
-            token_date = config.ACCESS_TOKEN_DATE
-            print(f"🔑 Using access token (valid until {token_date})")
-        else:
-            print(f"🔑 Access token: {self.access_token[:20]}..." if len(self.access_token) > 20 else self.access_token)
+        print(f"🔑 Access token: {self.access_token[:20]}..." if len(self.access_token) > 20 else self.access_token)
         
         return {
             "api_key": self.login_credential["api_key"],
             "access_token": self.access_token
         }
     
+    def login_account(self, account):
+        """Interactive daily login for one entry of the accounts file"""
+        user_id = account['user_id']
+        if not account.get('api_secret'):
+            print(f"❌ Account {user_id} has no api_secret in the accounts file")
+            sys.exit()
+        
+        print(f"🔐 Generating new access token for {user_id}...")
+        kite = KiteConnect(api_key=account['api_key'])
+        print("Login url : ", kite.login_url())
+        request_tkn = input(f"Login as {user_id} and enter your 'request token' here : ")
+        
+        try:
+            access_token = kite.generate_session(
+                request_token=request_tkn,
+                api_secret=account['api_secret']
+            )['access_token']
+            save_account_token(user_id, access_token)
+            print("Login successful...")
+            return access_token
+        except Exception as e:
+            print(f"Login Failed {{{e}}}")
+            sys.exit()
+    
     def get_credentials(self):
         """Get credentials without re-authentication if already loaded"""
         if not self.login_credential or not self.access_token:
@@ -0,0 +1,89 @@
+import math
+from array import array
+from typing import Dict, List, Optional
+
+"""
+TOP OF BOOK
+===========
+Best bid/ask and a smoothed spread per subscribed token, fed by full-mode
+ticks and used to price SL limit orders. Illiquid strikes with wide spreads
+get a deeper limit so a triggered SL still fills through a gap; liquid
+strikes get a limit close to the trigger instead of a fixed ORDER_BUFFER.
+
+Tokens get a fixed slot in preallocated float arrays when they are tracked.
+Updating a tick writes three floats in place - nothing is allocated on the
+tick path. `capacity` bounds how many tokens are in full mode at once (a
+full-mode tick is ~23x the bytes of an LTP tick); the rest stay on LTP and
+fall back to the fixed buffer.
+"""
+
+TICK_SIZE = 0.05
+
+
+class TopOfBook:
+    """Fixed-capacity per-token best bid/ask and spread EWMA"""
+
+    def __init__(self, capacity: int, alpha: float, multiplier: float, max_buffer: float, default_buffer: float):
+        self.capacity = capacity
+        self.alpha = alpha
+        self.multiplier = multiplier
+        self.max_buffer = max_buffer
+        self.default_buffer = default_buffer
+        self.bid = array('d', [0.0]) * capacity
+        self.ask = array('d', [0.0]) * capacity
+        self.spread = array('d', [0.0]) * capacity  # EWMA, 0 until the first two-sided quote
+        self._slots: Dict[int, int] = {}  # token -> slot
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def track(self, token: int) -> bool:
+        """Give a token a slot; False when the book is full (keep it on LTP mode)"""
+        if token in self._slots:
+            return True
+        if not self._free:
+            return False
+        slot = self._free.pop()
+        self.bid[slot] = self.ask[slot] = self.spread[slot] = 0.0
+        self._slots[token] = slot
+        return True
+
+    def forget(self, token: int):
+        slot = self._slots.pop(token, None)
+        if slot is not None:
+            self._free.append(slot)
+
+    def update(self, token: int, depth: dict):
+        """Fold a full-mode tick's depth into the token's slot"""
+        slot = self._slots.get(token)
+        if slot is None:
+            return
+        buy, sell = depth.get('buy'), depth.get('sell')
+        bid = buy[0]['price'] if buy else 0.0
+        ask = sell[0]['price'] if sell else 0.0
+        self.bid[slot] = bid
+        self.ask[slot] = ask
+        if bid > 0 and ask > bid:
+            previous = self.spread[slot]
+            spread = ask - bid
+            self.spread[slot] = spread if previous == 0.0 else previous + self.alpha * (spread - previous)
+
+    def quote(self, token: int) -> Optional[tuple]:
+        """(bid, ask, spread EWMA) for a tracked token"""
+        slot = self._slots.get(token)
+        if slot is None:
+            return None
+        return self.bid[slot], self.ask[slot], self.spread[slot]
+
+    def limit_buffer(self, token: Optional[int]) -> float:
+        """Points between an SL's trigger and its limit price
+
+        A multiple of the smoothed spread, rounded up to the tick size and
+        capped at max_buffer; the fixed default until the token has a quote.
+        """
+        slot = self._slots.get(token)
+        if slot is None or self.spread[slot] == 0.0:
+            return self.default_buffer
+        buffer = min(self.multiplier * self.spread[slot], self.max_buffer)
+        return round(max(TICK_SIZE, math.ceil(round(buffer / TICK_SIZE, 6)) * TICK_SIZE), 2)
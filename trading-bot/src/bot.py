@@ -1,10 +1,23 @@
 import logging
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional, Set
 from src.utils.file_helpers import load_state, save_state
-from src.utils.math_helpers import money_to_points, trailing_steps
+from src.positions import build_position
+from src.strategies.engine import StrategyEngine
 from src.strategies.trailing_sl import TrailingSL
+from src.strategies.gtt_sl import GttSL
 from src.kite_client import KiteClient
+from src.dispatch import TickDispatcher
+from src.book import TopOfBook
+from src.price_board import PriceBoard
+from src.underlying import UnderlyingTracker, parse_instruments
+from src.lifecycle import PositionLifecycle, open_quantities
+from src import journal as trade_journal
+from src.instruments import InstrumentCache
+from src.rules import RuleStore, default_params
+from src.utils.math_helpers import money_to_points
+from src.utils.clock import SYSTEM_CLOCK
 from kiteconnect import KiteTicker
 from src import config
 
@@ -17,71 +30,130 @@ and starts trailing stop-loss management for those positions.
 Usage: python scripts/run_bot.py
 """
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 class DynamicTradingBot:
-    def __init__(self):
-        self.kite_client = KiteClient()
+    def __init__(self, kite_client: KiteClient = None, state_file: str = None,
+                 instruments: InstrumentCache = None, user_id: str = None,
+                 rules: RuleStore = None, journal: "trade_journal.TradeJournal" = None,
+                 clock=None, ticker_factory=None):
+        # Multi-account mode passes per-account client/state and a shared instrument cache
+        # Simulations inject a VirtualClock and an in-process ticker; live uses the real ones
+        self.clock = clock or SYSTEM_CLOCK
+        self._ticker_factory = ticker_factory or KiteTicker
+        self.kite_client = kite_client or KiteClient()
+        self.user_id = user_id
+        self.state_file = state_file or config.STATE_FILE
+        # Explicit None check - an empty shared cache is falsy (it defines __len__)
+        self.instruments = instruments if instruments is not None else InstrumentCache()
+        # Per-instrument strategy parameters; a shared store is watched by its owner
+        self._owns_rules = rules is None
+        self.rules = rules or RuleStore(config.STRATEGY_RULES_FILE, default_params(config))
+        self.engine = StrategyEngine(config.MIN_SL_STEP)
+        # Trade history outlives state.json; events are only queued here, never written inline
+        self.journal = journal
+        self.dispatcher = TickDispatcher()
+        # Depth-aware SL limits: top of book for up to DEPTH_MAX_TOKENS full-mode tokens
+        self.book = None
+        if config.SL_LIMIT_MODE == "DEPTH":
+            self.book = TopOfBook(config.DEPTH_MAX_TOKENS, config.DEPTH_SPREAD_ALPHA, config.DEPTH_SPREAD_MULTIPLIER,
+                                  config.DEPTH_MAX_BUFFER, config.ORDER_BUFFER)
         self.active_positions: Dict[str, dict] = {}  # symbol -> position info
         self.market_ws = None
         self.subscribed_tokens: Set[int] = set()
-        self.state = load_state(config.STATE_FILE)
+        self.token_to_symbol: Dict[int, str] = {}  # instrument token -> symbol, for tick routing
+        # TRAIL_SOURCE=UNDERLYING positions, grouped by the index/future they are repriced from
+        self.underlyings = UnderlyingTracker(parse_instruments(config.UNDERLYING_INSTRUMENTS),
+                                             lambda symbol: self.instruments.get_expiry(symbol),
+                                             config.RISK_FREE_RATE, config.IV_REFRESH_SECONDS,
+                                             config.MARKET_CLOSE, config.MARKET_TIMEZONE)
+        self.underlying_tokens: Dict[int, str] = {}  # instrument token -> underlying key
+        self.state = load_state(self.state_file)
+        # Postbacks arrive on server worker threads while ticks arrive on the
+        # ticker thread - serialize everything that touches positions or orders
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        # Set by the market-hours scheduler outside the session - no ticker, no tick processing
+        self._market_paused = threading.Event()
+        # Shared-memory LTP/SL board for local readers - opened by run(), the live process
+        self.price_board: Optional[PriceBoard] = None
+        # Retires positions closed outside the bot (reconciled by run() every RECONCILE_SECONDS)
+        self.lifecycle = PositionLifecycle(self, config.RECONCILE_SECONDS, self.clock)
         
     def get_instrument_token(self, symbol: str) -> Optional[int]:
         """Get instrument token for a symbol"""
-        try:
-            ltp_resp = self.kite_client.kite.ltp(f"NFO:{symbol}")
-            key = f"NFO:{symbol}"
-            return ltp_resp[key].get("instrument_token")
-        except Exception as e:
-            logging.error(f"Failed to get instrument token for {symbol}: {e}")
-            return None
+        return self.instruments.get_token(self.kite_client, symbol)
 
-    def start_trailing_for_position(self, symbol: str, buy_price: float, quantity: int):
-        """Start trailing SL logic for a position"""
-        logging.info(f"Starting trailing SL for {symbol}: price={buy_price}, qty={quantity}")
-        
-        # Calculate lots based on configured lot size
-        lots = max(1, quantity // config.LOT_SIZE)
-        
-        logging.info(f"{symbol}: lot_size={config.LOT_SIZE}, lots={lots}, quantity={quantity}")
-        
-        sl_gap = money_to_points(config.RISK_RUPEES, quantity, lots, config.RISK_MODE)
-        target_gap = money_to_points(config.REWARD_RUPEES, quantity, lots, config.RISK_MODE)
-        trail_step = money_to_points(config.TRAIL_RUPEES, quantity, lots, config.RISK_MODE)
+    def _save_state(self):
+        """Persist this account's state"""
+        # Re-entrant for the tick/postback paths; serializes square-off workers' saves
+        with self._lock:
+            save_state(self.state, self.state_file)
+
+    def _journal(self, kind: str, position: dict, price: float = None, order_id=None, **detail):
+        """Queue a lifecycle event for the trade journal, if one is configured"""
+        if self.journal is not None:
+            self.journal.record(kind, position, self.user_id, price, order_id, **detail)
+
+    def _build_position(self, symbol: str, buy_price: float, quantity: int, params: dict, saved: dict = None) -> dict:
+        """Create the in-memory position plus the SL order executor for it"""
+        position = build_position(symbol, buy_price, quantity, params, self.clock.time(), saved)
         
         # Create position-specific state
         position_state = {
             'buy_price': buy_price,
             'position_qty': quantity,
-            'first_target_hit': False,
-            'sl_order_id': None,
-            'sl_trigger': 0.0
+            'first_target_hit': position['first_target_hit'],
+            'sl_order_id': position['sl_order_id'],
+            'sl_trigger': position['sl_trigger'],
+            'gtt_id': position['gtt_id']
         }
+        limit_buffer = None
+        if self.book is not None:
+            limit_buffer = lambda: self.book.limit_buffer(self.get_instrument_token(symbol))
+        if self._uses_gtt(symbol, params, saved):
+            gtt_step = money_to_points(params['gtt_step_rupees'], quantity, position['lots'], params['risk_mode'])
+            position['trailing_sl'] = GttSL(self.kite_client, symbol, quantity, config, position_state,
+                                            persist=self._save_state, step=gtt_step, base_sl=position['base_sl'],
+                                            first_target=position['first_target'], target_gap=position['target_gap'],
+                                            limit_buffer=limit_buffer, clock=self.clock)
+        else:
+            position['trailing_sl'] = TrailingSL(self.kite_client, symbol, quantity, config, position_state,
+                                                 persist=self._save_state, limit_buffer=limit_buffer, clock=self.clock)
+        return position
+
+    def _uses_gtt(self, symbol: str, params: dict, saved: dict = None) -> bool:
+        """Whether a position's stop is parked as a GTT OCO rather than an SL order"""
+        if params.get('sl_mode', "ORDER") != "GTT":
+            return False
+        if config.PRODUCT == "MIS":
+            logger.warning("⚠️  %s: GTT stops need an NRML/CNC product, using an SL order for PRODUCT=MIS",
+                           symbol, extra={"symbol": symbol})
+            return False
+        # A position restored with a live SL order keeps it - never protect it twice
+        return not (saved and saved.get('sl_order_id'))
+
+    def start_trailing_for_position(self, symbol: str, buy_price: float, quantity: int, exchange: str = "NFO"):
+        """Start trailing SL logic for a position"""
+        logger.info("Starting trailing SL for %s: price=%s, qty=%s", symbol, buy_price, quantity)
         
-        # Create position info
-        position_info = {
-            'symbol': symbol,
-            'buy_price': buy_price,
-            'quantity': quantity,
-            'sl_gap': sl_gap,
-            'target_gap': target_gap,
-            'trail_step': trail_step,
-            'first_target_hit': False,
-            'sl_order_id': None,
-            'sl_trigger': 0.0,
-            'trailing_sl': TrailingSL(self.kite_client, symbol, quantity, config, position_state)
-        }
+        # Parameters are resolved once, when the position opens, and stay with it
+        params = self.rules.resolve(symbol, exchange)
+        position_info = self._build_position(symbol, buy_price, quantity, params)
+        sl_gap = position_info['sl_gap']
+        
+        logger.info("%s: lot_size=%s, lots=%s, quantity=%s", symbol, params['lot_size'], position_info['lots'], quantity)
         
         # Place initial SL
         initial_sl_trigger = buy_price - sl_gap
         try:
-            sl_order_id = position_info['trailing_sl'].place_initial_sl(initial_sl_trigger)
-            position_info['sl_order_id'] = sl_order_id
+            position_info['trailing_sl'].place_initial_sl(initial_sl_trigger)
+            position_info['sl_order_id'] = position_info['trailing_sl'].state.get('sl_order_id')
+            position_info['gtt_id'] = position_info['trailing_sl'].state.get('gtt_id')
             position_info['sl_trigger'] = initial_sl_trigger
-            logging.info(f"Initial SL placed for {symbol} at {initial_sl_trigger}")
+            logger.info("Initial SL placed for %s at %s", symbol, initial_sl_trigger)
         except Exception as e:
-            logging.error(f"Failed to place initial SL for {symbol}: {e}")
+            logger.error("Failed to place initial SL for %s: %s", symbol, e)
             return
         
         # Store position
@@ -93,82 +165,151 @@ class DynamicTradingBot:
         self.state['active_positions'][symbol] = {
             'buy_price': buy_price,
             'quantity': quantity,
-            'sl_order_id': sl_order_id,
+            'sl_order_id': position_info['sl_order_id'],
+            'gtt_id': position_info['gtt_id'],
             'sl_trigger': initial_sl_trigger,
-            'first_target_hit': False
+            'first_target_hit': False,
+            'opened_at': position_info['opened_at'],
+            'params': params
         }
-        save_state(self.state, config.STATE_FILE)
+        self._save_state()
+        self._journal(trade_journal.ENTRY, position_info, buy_price, strategy=params.get('strategy'))
+        self._journal(trade_journal.SL_PLACED, position_info, initial_sl_trigger,
+                      position_info['sl_order_id'] or position_info['gtt_id'])
         
         # Start WebSocket if not already running
         if not self.market_ws:
-            logging.info("🚀 Starting WebSocket for position monitoring...")
+            logger.info("🚀 Starting WebSocket for position monitoring...")
             self.start_market_websocket()
         
         # Subscribe to market data
         self.subscribe_to_symbol(symbol)
+        self._track_underlying(position_info)
     
     def subscribe_to_symbol(self, symbol: str):
         """Subscribe to market data for a symbol"""
         if not self.market_ws:
-            logging.warning(f"⚠️  WebSocket not available for {symbol} - will start when connection is established")
+            logger.warning("⚠️  WebSocket not available for %s - will start when connection is established", symbol)
             return
             
         instrument_token = self.get_instrument_token(symbol)
         if not instrument_token:
-            logging.error(f"Could not get instrument token for {symbol}")
+            logger.error("Could not get instrument token for %s", symbol)
             return
             
         if instrument_token not in self.subscribed_tokens:
             try:
+                # Full mode (with depth) only while the book has room - the rest stay on LTP
+                mode = self.market_ws.MODE_LTP
+                if self.book is not None and self.book.track(instrument_token):
+                    mode = self.market_ws.MODE_FULL
                 self.market_ws.subscribe([instrument_token])
-                self.market_ws.set_mode(self.market_ws.MODE_LTP, [instrument_token])
+                self.market_ws.set_mode(mode, [instrument_token])
                 self.subscribed_tokens.add(instrument_token)
-                logging.info(f"📈 Subscribed to market data for {symbol} (token: {instrument_token})")
+                self.token_to_symbol[instrument_token] = symbol
+                logger.info("📈 Subscribed to market data for %s (token: %s, mode: %s)", symbol, instrument_token,
+                            mode, extra={"symbol": symbol})
             except Exception as e:
-                logging.error(f"Failed to subscribe to {symbol}: {e}")
+                logger.error("Failed to subscribe to %s: %s", symbol, e)
                 if "403" in str(e) or "Forbidden" in str(e):
-                    logging.error("💡 Market data access restricted - this is normal during market closure")
+                    logger.error("💡 Market data access restricted - this is normal during market closure")
     
+    def _track_underlying(self, position: dict):
+        """TRAIL_SOURCE=UNDERLYING: trail this position from its underlying's ticks"""
+        if position['params'].get('trail_source', "OPTION") != "UNDERLYING":
+            return
+        key = self.underlyings.add(position)
+        if key:
+            position['underlying'] = key
+            self.subscribe_to_underlying(key)
+
+    def subscribe_to_underlying(self, key: str):
+        """Subscribe to an underlying ("NSE:NIFTY 50") once, however many positions follow it"""
+        exchange, name = key.split(":", 1)
+        token = self.instruments.get_token(self.kite_client, name, exchange)
+        if not token:
+            logger.error("Could not get instrument token for underlying %s", key)
+            return
+        self.underlying_tokens[token] = key
+        if not self.market_ws or token in self.subscribed_tokens:
+            return
+        try:
+            self.market_ws.subscribe([token])
+            self.market_ws.set_mode(self.market_ws.MODE_LTP, [token])
+            self.subscribed_tokens.add(token)
+            logger.info("📈 Subscribed to underlying %s (token: %s)", key, token)
+        except Exception as e:
+            logger.error("Failed to subscribe to underlying %s: %s", key, e)
+
     def remove_position(self, symbol: str):
         """Remove position from monitoring - SL triggered or position closed"""
         try:
             # Remove from active positions
             if symbol in self.active_positions:
                 del self.active_positions[symbol]
-                logging.info(f"🗑️  Removed {symbol} from active positions")
+                logger.info("🗑️  Removed %s from active positions", symbol)
+            
+            # Last position on an underlying - stop its feed too
+            underlying = self.underlyings.remove(symbol)
+            if underlying:
+                token = next((t for t, key in self.underlying_tokens.items() if key == underlying), None)
+                self.underlying_tokens.pop(token, None)
+                self.dispatcher.forget(token)
+                if token in self.subscribed_tokens:
+                    try:
+                        if self.market_ws:
+                            self.market_ws.unsubscribe([token])
+                        self.subscribed_tokens.remove(token)
+                    except Exception as e:
+                        logger.error("Failed to unsubscribe from underlying %s: %s", underlying, e)
             
             # Unsubscribe from WebSocket
             instrument_token = self.get_instrument_token(symbol)
+            self.token_to_symbol.pop(instrument_token, None)
+            self.dispatcher.forget(instrument_token)
+            if self.price_board is not None:
+                self.price_board.remove(instrument_token)
+            if self.book is not None:
+                self.book.forget(instrument_token)
             if instrument_token and instrument_token in self.subscribed_tokens:
                 try:
                     if self.market_ws:
                         self.market_ws.unsubscribe([instrument_token])
-                        logging.info(f"📡 Unsubscribed from market data for {symbol}")
+                        logger.info("📡 Unsubscribed from market data for %s", symbol)
                     self.subscribed_tokens.remove(instrument_token)
                 except Exception as e:
-                    logging.error(f"Failed to unsubscribe from {symbol}: {e}")
+                    logger.error("Failed to unsubscribe from %s: %s", symbol, e)
             
             # Remove from persistent state
             if 'active_positions' in self.state and symbol in self.state['active_positions']:
                 del self.state['active_positions'][symbol]
-                save_state(self.state, config.STATE_FILE)
-                logging.info(f"💾 Removed {symbol} from persistent state")
+                self._save_state()
+                logger.info("💾 Removed %s from persistent state", symbol)
             
             # Close WebSocket if no more positions to monitor
             if not self.active_positions and self.market_ws:
-                logging.info("📡 No more positions to monitor - closing WebSocket")
+                logger.info("📡 No more positions to monitor - closing WebSocket")
                 try:
                     self.market_ws.close()
                     self.market_ws = None
                     self.subscribed_tokens.clear()
+                    self.token_to_symbol.clear()
                 except Exception as e:
-                    logging.error(f"Error closing WebSocket: {e}")
+                    logger.error("Error closing WebSocket: %s", e)
                     
         except Exception as e:
-            logging.error(f"Error removing position {symbol}: {e}")
+            logger.error("Error removing position %s: %s", symbol, e)
     
     def handle_order_update(self, order):
         """Handle order update from polling or postback"""
+        if self._stop_event.is_set():
+            logger.warning("⏹️  Bot shutting down - ignoring order update %s", order.get('order_id'),
+                           extra={"order_id": order.get('order_id'), "user_id": self.user_id})
+            return
+        with self._lock:
+            self._handle_order_update(order)
+
+    def _handle_order_update(self, order):
         try:
             status = order.get('status')
             transaction_type = order.get('transaction_type')
@@ -176,6 +317,12 @@ class DynamicTradingBot:
             order_type = order.get('order_type', '')
             order_id = order.get('order_id')
             
+            # Every sell fill goes to the journal - it carries the real exit price,
+            # even when the position was already dropped on an LTP below the SL
+            if status == 'COMPLETE' and transaction_type == 'SELL' and self.journal is not None:
+                self.journal.record_fill(self.user_id, symbol, float(order.get('average_price') or 0), order_id,
+                                         int(order.get('filled_quantity') or order.get('quantity') or 0))
+            
             # Check if this is a SL order completion (position exit)
             if (status == 'COMPLETE' and 
                 transaction_type == 'SELL' and 
@@ -185,10 +332,46 @@ class DynamicTradingBot:
                 # Check if this is our SL order
                 position = self.active_positions[symbol]
                 if position.get('sl_order_id') == order_id:
-                    logging.info(f"🎯 SL order executed for {symbol}! Position closed.")
+                    logger.info("🎯 SL order executed for %s! Position closed.", symbol,
+                                extra={"symbol": symbol, "order_id": order_id, "user_id": self.user_id})
+                    self._journal(trade_journal.EXIT, position, float(order.get('average_price') or 0), order_id,
+                                  reason="sl_order")
                     self.remove_position(symbol)
                     return
             
+            # A triggered GTT places a plain LIMIT sell - the OCO's other leg is
+            # cancelled by Kite, so the position is done either way. Not so for
+            # our own exit's sell: that GTT was deleted, and the exit journals it
+            if (status == 'COMPLETE' and
+                transaction_type == 'SELL' and
+                symbol in self.active_positions and
+                self.active_positions[symbol].get('gtt_id') and
+                not self.active_positions[symbol].get('exiting')):
+                logger.info("🎯 GTT %s triggered for %s! Position closed.", self.active_positions[symbol]['gtt_id'],
+                            symbol, extra={"symbol": symbol, "order_id": order_id, "user_id": self.user_id})
+                self._journal(trade_journal.EXIT, self.active_positions[symbol], float(order.get('average_price') or 0),
+                              order_id, reason="gtt")
+                self.remove_position(symbol)
+                return
+            
+            # Any other sell of a trailed position was placed outside the bot (by
+            # hand in Kite, say) - our own exits are flagged before they are sent
+            if (status == 'COMPLETE' and
+                transaction_type == 'SELL' and
+                symbol in self.active_positions and
+                not self.active_positions[symbol].get('exiting')):
+                position = self.active_positions[symbol]
+                sold = int(order.get('filled_quantity') or order.get('quantity') or 0)
+                if sold >= position['quantity']:
+                    logger.info("✋ %s sold outside the bot (order %s) - no longer trailing", symbol, order_id,
+                                extra={"symbol": symbol, "order_id": order_id, "user_id": self.user_id})
+                    self.retire_position(symbol, "manual_close", float(order.get('average_price') or 0), order_id)
+                else:
+                    logger.warning("⚠️  %s: %s of %s sold outside the bot - the stop still covers the full quantity",
+                                   symbol, sold, position['quantity'],
+                                   extra={"symbol": symbol, "order_id": order_id, "user_id": self.user_id})
+                return
+            
             # Only process BUY orders that are COMPLETE for new positions
             if (status == 'COMPLETE' and 
                 transaction_type == 'BUY' and 
@@ -200,142 +383,220 @@ class DynamicTradingBot:
                 quantity = int(order.get('quantity', 0))
                 
                 if buy_price > 0 and quantity > 0:
-                    logging.info(f"New BUY execution detected: {symbol} @ {buy_price} qty={quantity}")
-                    self.start_trailing_for_position(symbol, buy_price, quantity)
+                    logger.info("New BUY execution detected: %s @ %s qty=%s", symbol, buy_price, quantity,
+                                extra={"symbol": symbol, "order_id": order_id, "user_id": self.user_id})
+                    self.start_trailing_for_position(symbol, buy_price, quantity, order.get("exchange") or "NFO")
             else:
-                logging.debug(f"Ignored order update: {order}")
+                logger.debug("Ignored order update: %s", order, extra={"order_id": order_id, "user_id": self.user_id})
                     
         except Exception as e:
-            logging.error(f"Error processing order update: {e}")
+            logger.error("Error processing order update: %s", e)
     
     def handle_market_tick(self, tick):
         """Handle market data tick"""
+        self.handle_ticks([tick])
+
+    def handle_ticks(self, ticks):
+        """Handle one packet of market data ticks"""
+        if self._stop_event.is_set() or self._market_paused.is_set():
+            return
+        with self._lock:
+            self._handle_ticks(ticks)
+
+    def _handle_ticks(self, ticks):
         try:
-            instrument_token = tick.get('instrument_token')
-            ltp = tick.get('last_price') or tick.get('ltp')
-            
-            if not ltp:
-                return
+            updates = []
+            published = []
+            spots = {}
+            # Work per packet is bounded by the number of tokens, not ticks
+            for tick in self.dispatcher.conflate(ticks):
+                token = tick.get('instrument_token')
+                depth = tick.get('depth')
+                if depth and self.book is not None:
+                    self.book.update(token, depth)
+                
+                ltp = tick.get('last_price') or tick.get('ltp')
+                if not ltp:
+                    continue
                 
-            ltp = float(ltp)
+                # Find which symbol this tick belongs to
+                symbol = self.token_to_symbol.get(token)
+                position = self.active_positions.get(symbol)
+                if position is not None:
+                    ltp = float(ltp)
+                    position['option_ltp'] = ltp
+                    published.append((token, position, ltp))
+                    # Underlying-driven positions only hand their own ticks to the
+                    # engine when they cross the SL - the trail comes from the model
+                    if position.get('underlying') is None or ltp <= position['sl_trigger']:
+                        updates.append((position, ltp))
+                elif token in self.underlying_tokens:
+                    spots[self.underlying_tokens[token]] = float(ltp)
             
-            # Find which symbol this tick belongs to
-            for symbol, position in self.active_positions.items():
-                symbol_token = self.get_instrument_token(symbol)
-                if symbol_token == instrument_token:
-                    self.process_price_update(symbol, position, ltp)
-                    break
+            # One pricing pass per underlying; a model price at or below the SL is
+            # left to the option's own ticks, which know whether the stop really filled
+            now = self.clock.time()
+            for key, spot in spots.items():
+                updates.extend((position, price) for position, price in self.underlyings.reprice(key, spot, now)
+                               if price > position['sl_trigger'])
+            
+            if updates:
+                self.process_price_updates(updates)
+            if published and self.price_board is not None:
+                self._publish_prices(published)
                     
         except Exception as e:
-            logging.error(f"Error processing market tick: {e}")
+            logger.error("Error processing market ticks: %s", e)
     
+    def _publish_prices(self, published):
+        """Mirror LTP and the SL (as it stands after this packet) to the shared price board"""
+        now = self.clock.time()
+        for token, position, ltp in published:
+            if position['symbol'] in self.active_positions:  # Not closed by this very tick
+                self.price_board.publish(token, ltp, now, position['sl_trigger'])
+
+    def process_price_updates(self, updates):
+        """Evaluate a batch of (position, ltp) updates and act on the strategies' decisions"""
+        ltps = {position['symbol']: ltp for position, ltp in updates}
+        for decision in self.engine.evaluate(updates, self.clock.time()):
+            position = self.active_positions.get(decision.symbol)
+            if position is None:
+                continue  # Removed by an earlier decision in this batch
+            try:
+                self._apply_decision(position, decision, ltps[decision.symbol])
+            except Exception as e:
+                logger.error("Failed to apply %s for %s: %s", decision.reason, decision.symbol, e,
+                             extra={"symbol": decision.symbol})
+
     def process_price_update(self, symbol: str, position: dict, ltp: float):
         """Process price update for a position"""
-        buy_price = position['buy_price']
-        target_gap = position['target_gap']
-        trail_step = position['trail_step']
+        self.process_price_updates([(position, ltp)])
+
+    def _apply_decision(self, position: dict, decision, ltp: float):
+        """Turn one strategy decision into broker orders and state changes"""
+        symbol = decision.symbol
         trailing_sl = position['trailing_sl']
         current_sl = position['sl_trigger']
         
-        # Check if SL might have been triggered (LTP below SL trigger)
-        if ltp <= current_sl:
-            logging.info(f"🚨 {symbol}: SL likely triggered! LTP={ltp:.2f} <= SL={current_sl:.2f}")
-            logging.info(f"📤 Removing {symbol} from monitoring (position likely closed)")
+        # A model price running ahead of the option's quote would put the stop
+        # above the market, where it fills at once - wait for the quote to follow
+        if (position.get('underlying') is not None and decision.action == "modify" and
+                position.get('option_ltp') is not None and decision.sl >= position['option_ltp']):
+            return
+        
+        if decision.action == "sl_hit":
+            logger.info("🚨 %s: SL likely triggered! LTP=%.2f <= SL=%.2f - removing from monitoring",
+                        symbol, ltp, current_sl, extra={"symbol": symbol})
+            self._journal(trade_journal.EXIT, position, ltp, reason=decision.reason)
             self.remove_position(symbol)
             return
         
-        first_target = buy_price + target_gap
+        if decision.action == "exit":
+            logger.info("⏱️  %s: %s - exiting at market (LTP=%.2f)", symbol, decision.reason, ltp,
+                        extra={"symbol": symbol})
+            position['exiting'] = True  # Its sell postback is ours, not a manual close
+            trailing_sl.exit_position()
+            self._journal(trade_journal.EXIT, position, ltp, reason=decision.reason)
+            self.remove_position(symbol)
+            return
         
-        # Check if first target hit
-        if not position['first_target_hit'] and ltp >= first_target:
+        if decision.reason == "first_target":
             position['first_target_hit'] = True
-            
-            if config.FIRST_TARGET_SL_MODE == "BUY":
-                new_sl = buy_price
-            else:
-                new_sl = (buy_price + first_target) / 2.0
-                
-            logging.info(f"{symbol}: First target hit (LTP={ltp:.2f}). Updating SL -> {new_sl:.2f}")
-            
-            try:
-                trailing_sl.modify_sl(new_sl)
-                position['sl_trigger'] = new_sl
-                
-                # Update persistent state
-                if symbol in self.state.get('active_positions', {}):
-                    self.state['active_positions'][symbol]['first_target_hit'] = True
-                    self.state['active_positions'][symbol]['sl_trigger'] = new_sl
-                    save_state(self.state, config.STATE_FILE)
-                    
-            except Exception as e:
-                logging.error(f"Failed to modify SL for {symbol}: {e}")
-            return
+            logger.info("%s: First target hit (LTP=%.2f). Updating SL -> %.2f", symbol, ltp, decision.sl,
+                        extra={"symbol": symbol})
+            self._journal(trade_journal.TARGET_HIT, position, ltp)
+            # Update persistent state
+            if symbol in self.state.get('active_positions', {}):
+                self.state['active_positions'][symbol]['first_target_hit'] = True
+                self._save_state()
+            if decision.sl <= current_sl:
+                return
+        else:
+            # Fires on most ticks of a trending position - sampled per symbol
+            logger.info("%s: %s SL update: LTP=%.2f new SL=%.4f current SL=%.4f",
+                        symbol, decision.reason, ltp, decision.sl, current_sl,
+                        extra={"symbol": symbol, "sample": True})
         
-        # Trailing mode after first target
-        if position['first_target_hit'] and ltp > first_target:
-            if config.FIRST_TARGET_SL_MODE == "BUY":
-                base_sl = buy_price
-            else:
-                base_sl = (buy_price + first_target) / 2.0
-                
-            new_sl = trailing_steps(base_sl, ltp, first_target, trail_step)
-            current_sl = position['sl_trigger']
-            
-            if new_sl > current_sl + config.MIN_SL_STEP:
-                logging.info(f"{symbol}: Trailing SL update: LTP={ltp:.2f} new SL={new_sl:.4f} current SL={current_sl:.4f}")
-                try:
-                    trailing_sl.modify_sl(new_sl)
-                    position['sl_trigger'] = new_sl
-                    
-                    # Update persistent state
-                    if symbol in self.state.get('active_positions', {}):
-                        self.state['active_positions'][symbol]['sl_trigger'] = new_sl
-                        save_state(self.state, config.STATE_FILE)
-                        
-                except Exception as e:
-                    logging.error(f"Failed to modify trailing SL for {symbol}: {e}")
+        # A throttled/rate-limited modify (or, in GTT mode, a move smaller than
+        # the GTT step) returns False - the strategy asks again on a later tick
+        if trailing_sl.modify_sl(decision.sl, ltp):
+            self._record_sl_update(symbol, position, decision.sl)
+            self._save_state()
+    
+    def _record_sl_update(self, symbol: str, position: dict, new_sl: float):
+        """Mirror a confirmed SL change into the position and persistent state"""
+        position['sl_trigger'] = new_sl
+        # The order id changes when TrailingSL recreates the order after too many modifies
+        position['sl_order_id'] = position['trailing_sl'].state.get('sl_order_id')
+        position['gtt_id'] = position['trailing_sl'].state.get('gtt_id')
+        saved = self.state.get('active_positions', {}).get(symbol)
+        if saved is not None:
+            saved['sl_trigger'] = new_sl
+            saved['sl_order_id'] = position['sl_order_id']
+            saved['gtt_id'] = position['gtt_id']
+        self._journal(trade_journal.SL_MODIFIED, position, new_sl, position['sl_order_id'] or position['gtt_id'])
     
     def start_market_websocket(self):
         """Start market data websocket"""
         try:
             # Only start if we have positions to monitor
             if not self.active_positions:
-                logging.info("⏸️  No active positions - WebSocket will start when needed")
+                logger.info("⏸️  No active positions - WebSocket will start when needed")
+                return
+            if self._market_paused.is_set():
+                logger.info("🌙 Market closed - WebSocket will start at the next session")
                 return
                 
-            self.market_ws = KiteTicker(self.kite_client.kite.api_key, self.kite_client.kite.access_token)
+            self.market_ws = self._ticker_factory(self.kite_client.kite.api_key, self.kite_client.kite.access_token,
+                                                  root=config.KITE_WS_ROOT)
+            # A new connection starts with no subscriptions - forget the old
+            # connection's so on_connect subscribes every position again
+            self.subscribed_tokens.clear()
             
             def on_ticks(ws, ticks):
-                for tick in ticks:
-                    self.handle_market_tick(tick)
+                # Whole packet at once - strategies evaluate in batches
+                self.handle_ticks(ticks)
             
             def on_connect(ws, response):
-                logging.info("📡 Market data websocket connected")
-                # Resubscribe to existing positions
-                for symbol in self.active_positions.keys():
-                    self.subscribe_to_symbol(symbol)
+                logger.info("📡 Market data websocket connected")
+                # Resubscribe to existing positions - under the lock, postback
+                # threads may be adding positions while the ticker connects
+                with self._lock:
+                    for symbol in list(self.active_positions):
+                        self.subscribe_to_symbol(symbol)
+                    for key in self.underlyings.keys():
+                        self.subscribe_to_underlying(key)
             
             def on_error(ws, code, reason):
-                logging.error(f"WebSocket error: {code} - {reason}")
+                if self._market_paused.is_set():
+                    logger.debug("WebSocket error while market is closed: %s - %s", code, reason)
+                    return
+                logger.error("WebSocket error: %s - %s", code, reason)
                 if code == 403:
-                    logging.error("🚫 WebSocket access forbidden - check token permissions")
-                    logging.error("💡 This might happen during market close or with insufficient permissions")
+                    logger.error("🚫 WebSocket access forbidden - check token permissions")
+                    logger.error("💡 This might happen during market close or with insufficient permissions")
             
             def on_close(ws, code, reason):
-                logging.info(f"📡 WebSocket closed: {code} - {reason}")
+                if self._market_paused.is_set():
+                    logger.debug("WebSocket closed while market is closed: %s - %s", code, reason)
+                    return  # Paused on purpose - reconnect at the next session
+                logger.info("📡 WebSocket closed: %s - %s", code, reason)
                 if code == 403:
-                    logging.error("🚫 WebSocket connection rejected (403 Forbidden)")
-                    logging.error("🕐 This usually happens when:")
-                    logging.error("   • Markets are closed")
-                    logging.error("   • Token doesn't have websocket permissions") 
-                    logging.error("   • Rate limiting is active")
-                    logging.info("⏸️  WebSocket will retry when positions are active")
+                    logger.error("🚫 WebSocket connection rejected (403 Forbidden)")
+                    logger.error("🕐 This usually happens when:")
+                    logger.error("   • Markets are closed")
+                    logger.error("   • Token doesn't have websocket permissions")
+                    logger.error("   • Rate limiting is active")
+                    logger.info("⏸️  WebSocket will retry when positions are active")
                     return  # Don't auto-reconnect on 403
                 
+                if self._stop_event.is_set():
+                    return  # Closed by shutdown() - don't reconnect
+                
                 # Auto-reconnect for other errors (not 403)
                 if self.active_positions:  # Only reconnect if we have positions
-                    time.sleep(10)  # Longer delay to avoid rate limiting
-                    logging.info("🔄 Attempting to reconnect WebSocket...")
+                    self.clock.sleep(10)  # Longer delay to avoid rate limiting
+                    logger.info("🔄 Attempting to reconnect WebSocket...")
                     self.start_market_websocket()
             
             self.market_ws.on_ticks = on_ticks
@@ -343,115 +604,281 @@ class DynamicTradingBot:
             self.market_ws.on_error = on_error
             self.market_ws.on_close = on_close
             
-            logging.info("🔗 Starting market data websocket...")
+            logger.info("🔗 Starting market data websocket...")
             self.market_ws.connect(threaded=True)
             
         except Exception as e:
-            logging.error(f"❌ Failed to start market websocket: {e}")
+            logger.error("❌ Failed to start market websocket: %s", e)
             if "403" in str(e) or "Forbidden" in str(e):
-                logging.error("💡 WebSocket access forbidden - this is normal during market closure")
+                logger.error("💡 WebSocket access forbidden - this is normal during market closure")
     
+    def pause_market_data(self):
+        """Stop processing ticks and drop the ticker until resume_market_data() - market closed"""
+        self._market_paused.set()
+        with self._lock:
+            if self.market_ws:
+                try:
+                    self.market_ws.close()
+                    logger.info("🌙 Market closed - WebSocket closed, tick path paused")
+                except Exception as e:
+                    logger.error("Error closing WebSocket: %s", e)
+                self.market_ws = None
+                self.subscribed_tokens.clear()
+
+    def resume_market_data(self):
+        """Process ticks again, connecting the ticker now if positions are waiting for it"""
+        self._market_paused.clear()
+        with self._lock:
+            if self.active_positions and not self.market_ws and not self._stop_event.is_set():
+                self.start_market_websocket()
+
+    def square_off(self, workers: int = None) -> int:
+        """Cancel every position's stop and sell it at market, several at a time
+
+        The tick path is paused first so no trail step races the cancels.
+        Returns the number of positions closed. A position whose cancel fails
+        (usually because the stop just filled) is left for its postback.
+        """
+        self.pause_market_data()
+        with self._lock:
+            positions = list(self.active_positions.items())
+        if not positions:
+            return 0
+
+        def close(item):
+            symbol, position = item
+            try:
+                position['exiting'] = True
+                position['trailing_sl'].exit_position()
+                return symbol
+            except Exception as e:
+                logger.error("❌ Square-off of %s failed: %s", symbol, e, extra={"symbol": symbol, "user_id": self.user_id})
+                return None
+
+        # Budget-bound, not CPU-bound: workers keep the order rate limit busy
+        # instead of waiting out each call's round trip in turn
+        workers = min(workers or config.SQUARE_OFF_WORKERS, len(positions))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="square-off") as pool:
+            closed = [symbol for symbol in pool.map(close, positions) if symbol]
+
+        with self._lock:
+            for symbol in closed:
+                position = self.active_positions.get(symbol)
+                if position is not None:
+                    self._journal(trade_journal.EXIT, position, reason="square_off")
+                    self.remove_position(symbol)
+        logger.info("⏰ Squared off %s of %s positions", len(closed), len(positions), extra={"user_id": self.user_id})
+        return len(closed)
+
+    def retire_position(self, symbol: str, reason: str, price: float = None, order_id=None):
+        """Stop managing a position closed outside the bot, cancelling the stop it no longer needs"""
+        with self._lock:
+            position = self.active_positions.get(symbol)
+            if position is None:
+                return
+            try:
+                position['trailing_sl'].cancel_stop()
+            except Exception as e:
+                # Usually cancelled by the trader already - nothing left to sell twice
+                logger.warning("⚠️  %s: could not cancel the stop of a closed position: %s", symbol, e,
+                               extra={"symbol": symbol, "user_id": self.user_id})
+            self._journal(trade_journal.EXIT, position, price, order_id, reason=reason)
+            self.remove_position(symbol)
+
+    def reclaim(self, open_symbols=()) -> int:
+        """Drop bookkeeping no live position owns; returns how many entries went
+
+        Saved state of a position that is neither trailed nor open at the
+        broker (`open_symbols`), token mappings of removed positions, and
+        subscriptions and watermarks of tokens nothing is trailed from.
+        """
+        with self._lock:
+            reclaimed = 0
+            saved = self.state.get('active_positions', {})
+            for symbol in [symbol for symbol in saved if symbol not in self.active_positions and symbol not in open_symbols]:
+                del saved[symbol]
+                reclaimed += 1
+            if reclaimed:
+                self._save_state()
+
+            for token in [token for token, symbol in self.token_to_symbol.items() if symbol not in self.active_positions]:
+                del self.token_to_symbol[token]
+                reclaimed += 1
+            live = set(self.token_to_symbol) | set(self.underlying_tokens)
+            orphans = self.subscribed_tokens - live
+            if orphans:
+                try:
+                    if self.market_ws:
+                        self.market_ws.unsubscribe(list(orphans))
+                    self.subscribed_tokens -= orphans
+                    reclaimed += len(orphans)
+                except Exception as e:
+                    logger.error("Failed to unsubscribe stale tokens %s: %s", sorted(orphans), e)
+            for token in [token for token in self.dispatcher.watermarks if token not in live]:
+                self.dispatcher.forget(token)
+                reclaimed += 1
+            return reclaimed
+
     def restore_positions(self):
-        """Restore positions from saved state"""
+        """Restore positions from saved state, dropping the ones closed since"""
         saved_positions = self.state.get('active_positions', {})
+        if not saved_positions:
+            return
+        try:
+            quantities = open_quantities(self.kite_client)
+        except Exception as e:
+            # Keep every entry - the next start (or reconcile) can tell which are closed
+            logger.error("Error fetching positions to restore: %s", e)
+            return
         
-        for symbol, pos_data in saved_positions.items():
-            logging.info(f"Restoring position for {symbol}")
+        removed = False
+        for symbol, pos_data in list(saved_positions.items()):
+            logger.info("Restoring position for %s", symbol)
             
-            # Check if position still exists
             try:
-                positions = self.kite_client.get_positions()
-                position_exists = False
-                
-                for position in positions.get("day", []):
-                    if (position.get("tradingsymbol") == symbol and 
-                        float(position.get("quantity", 0)) > 0):
-                        position_exists = True
-                        break
-                
-                if position_exists:
+                if symbol in quantities:
                     # Recreate the position info
                     buy_price = pos_data['buy_price']
                     quantity = pos_data['quantity']
                     
-                    # Calculate gaps using configured lot size
-                    lots = max(1, quantity // config.LOT_SIZE)
-                    sl_gap = money_to_points(config.RISK_RUPEES, quantity, lots, config.RISK_MODE)
-                    target_gap = money_to_points(config.REWARD_RUPEES, quantity, lots, config.RISK_MODE)
-                    trail_step = money_to_points(config.TRAIL_RUPEES, quantity, lots, config.RISK_MODE)
-                    
-                    position_state = {
-                        'buy_price': buy_price,
-                        'position_qty': quantity,
-                        'first_target_hit': pos_data.get('first_target_hit', False),
-                        'sl_order_id': pos_data.get('sl_order_id'),
-                        'sl_trigger': pos_data.get('sl_trigger', 0.0)
-                    }
-                    
-                    position_info = {
-                        'symbol': symbol,
-                        'buy_price': buy_price,
-                        'quantity': quantity,
-                        'sl_gap': sl_gap,
-                        'target_gap': target_gap,
-                        'trail_step': trail_step,
-                        'first_target_hit': pos_data.get('first_target_hit', False),
-                        'sl_order_id': pos_data.get('sl_order_id'),
-                        'sl_trigger': pos_data.get('sl_trigger', 0.0),
-                        'trailing_sl': TrailingSL(self.kite_client, symbol, quantity, config, position_state)
-                    }
+                    # Keep the parameters the position was opened with, even if the
+                    # rules file changed since (older state files fall back to current rules)
+                    saved_params = pos_data.get('params')
+                    if saved_params:
+                        # Settings added since the position was saved take their defaults
+                        params = {**self.rules.defaults, **saved_params}
+                    else:
+                        params = self.rules.resolve(symbol)
+                    position_info = self._build_position(symbol, buy_price, quantity, params, saved=pos_data)
                     
                     self.active_positions[symbol] = position_info
                     self.subscribe_to_symbol(symbol)
-                    logging.info(f"Position restored for {symbol}")
+                    self._track_underlying(position_info)
+                    logger.info("Position restored for %s", symbol)
                 else:
-                    # Position closed, remove from state
-                    logging.info(f"Position {symbol} no longer exists, removing from state")
+                    # Position closed, remove from state - and its stop, which an
+                    # NRML position closed by hand leaves behind to sell again
+                    logger.info("Position %s no longer exists, removing from state", symbol)
+                    self._cancel_saved_stop(symbol, pos_data)
+                    del saved_positions[symbol]
+                    removed = True
                     
             except Exception as e:
-                logging.error(f"Error restoring position {symbol}: {e}")
+                logger.error("Error restoring position %s: %s", symbol, e)
+        if removed:
+            self._save_state()
+    
+    def _cancel_saved_stop(self, symbol: str, pos_data: dict):
+        """Best-effort cancel of a closed position's stop (most have already filled or expired)"""
+        try:
+            if pos_data.get('sl_order_id'):
+                self.kite_client.cancel_order(pos_data['sl_order_id'])
+            if pos_data.get('gtt_id'):
+                self.kite_client.delete_gtt(pos_data['gtt_id'])
+        except Exception as e:
+            logger.debug("Stop of closed position %s not cancelled: %s", symbol, e)
     
     def run(self):
         """Main run method - Postback mode only"""
-        logging.info("🚀 Starting Dynamic Trading Bot (Postback Mode)...")
+        logger.info("🚀 Starting Dynamic Trading Bot (Postback Mode)...")
+        self._open_price_board()
+        
+        # Pick up rules file edits without a restart
+        if self._owns_rules and self.rules.path:
+            threading.Thread(target=self.rules.watch, args=(self._stop_event, config.RULES_POLL_SECONDS),
+                             name="rules-watch", daemon=True).start()
         
         # Restore any existing positions
         self.restore_positions()
         
+        # Catch positions closed in Kite by hand, or whose postback never came
+        if config.RECONCILE_SECONDS > 0:
+            threading.Thread(target=self.lifecycle.run, args=(self._stop_event,), name="lifecycle",
+                             daemon=True).start()
+        
         # Only start websocket if we have active positions
         if self.active_positions:
-            logging.info("📍 Found existing positions - starting WebSocket...")
+            logger.info("📍 Found existing positions - starting WebSocket...")
             self.start_market_websocket()
         else:
-            logging.info("📡 WebSocket will start automatically when positions are detected")
+            logger.info("📡 WebSocket will start automatically when positions are detected")
         
         # Bot is now ready to receive postback notifications
-        logging.info("✅ Bot is ready! Waiting for postback notifications...")
-        logging.info("📡 Orders will be detected via postback URL automatically")
-        logging.info("🔧 Make sure your postback URL is configured in Zerodha app settings")
+        logger.info("✅ Bot is ready! Waiting for postback notifications...")
+        logger.info("📡 Orders will be detected via postback URL automatically")
+        logger.info("🔧 Make sure your postback URL is configured in Zerodha app settings")
         
         try:
-            while True:
-                # Just keep the bot alive for websocket and postback handling
-                time.sleep(30)  # Check every 30 seconds if everything is still running
+            # Just keep the bot alive for websocket and postback handling,
+            # checking every 30 seconds until shutdown() is requested
+            while not self.clock.wait(self._stop_event, 30):
                 
                 # Log status occasionally
                 active_count = len(self.active_positions)
                 if active_count > 0:
-                    logging.info(f"📊 Bot monitoring {active_count} active positions")
+                    logger.info("📊 Bot monitoring %s active positions", active_count)
                 
         except KeyboardInterrupt:
-            logging.info("⏹️  Bot stopped by user")
+            logger.info("⏹️  Bot stopped by user")
         except Exception as e:
-            logging.error(f"❌ Bot error: {e}")
+            logger.error("❌ Bot error: %s", e)
         finally:
             if self.market_ws:
                 try:
                     self.market_ws.close()
-                    logging.info("🔌 Market websocket closed")
+                    logger.info("🔌 Market websocket closed")
                 except:
                     pass
 
+    def shutdown(self, timeout: float = None):
+        """Stop processing, wait for in-flight SL work and flush state to disk"""
+        if timeout is None:
+            timeout = config.SHUTDOWN_TIMEOUT_SECONDS
+        logger.info("⏹️  Draining bot - no new ticks or postbacks will be processed")
+        self._stop_event.set()
+        
+        # Any modify/place already running holds the lock - wait for it so the
+        # persisted sl_order_id/sl_trigger match what is live at the broker
+        acquired = self._lock.acquire(timeout=timeout)
+        if not acquired:
+            logger.error("⚠️  SL operation still in flight after %ss - state may lag the broker", timeout)
+        try:
+            self._save_state()
+            logger.info("💾 State flushed for %s active positions", len(self.active_positions))
+        except Exception as e:
+            logger.error("❌ Failed to flush state on shutdown: %s", e)
+        finally:
+            # With the lock held no tick is mid-publish; otherwise leave the
+            # board to be taken over by the next start
+            if acquired and self.price_board is not None:
+                self.price_board.close()
+                self.price_board = None
+            if acquired:
+                self._lock.release()
+        
+        if self.market_ws:
+            try:
+                self.market_ws.close()
+                self.market_ws = None
+                logger.info("🔌 Market websocket closed")
+            except Exception as e:
+                logger.error("Error closing WebSocket: %s", e)
+
+
+    def _open_price_board(self):
+        """Publish prices to shared memory under PRICE_BOARD_NAME (per account in multi-account mode)"""
+        if not config.PRICE_BOARD_NAME or self.price_board is not None:
+            return
+        name = f"{config.PRICE_BOARD_NAME}_{self.user_id}" if self.user_id else config.PRICE_BOARD_NAME
+        try:
+            self.price_board = PriceBoard(name, config.PRICE_BOARD_SLOTS)
+            logger.info("📋 Publishing prices to shared memory %r (%s slots)", name, config.PRICE_BOARD_SLOTS)
+        except FileExistsError as e:
+            # Another live bot owns the name - its readers must not be switched to ours
+            logger.error("❌ Not publishing prices: %s", e)
+        except Exception as e:
+            logger.warning("⚠️  Price board %r unavailable, not publishing prices: %s", name, e)
+
 # Only class-based approach needed for postback integration
 if __name__ == "__main__":
     # For direct testing only
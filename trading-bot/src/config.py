@@ -10,6 +10,9 @@ API_KEY = os.getenv("API_KEY")
 API_SECRET = os.getenv("API_SECRET")
 ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
 ACCESS_TOKEN_DATE = os.getenv("ACCESS_TOKEN_DATE")
+# Optional: point the bot at scripts/kite_simulator.py instead of Zerodha
+KITE_API_ROOT = os.getenv("KITE_API_ROOT")  # e.g. http://127.0.0.1:8700
+KITE_WS_ROOT = os.getenv("KITE_WS_ROOT")  # e.g. ws://127.0.0.1:8765
 
 # ============================================================================
 # RISK MANAGEMENT SETTINGS
@@ -22,19 +25,92 @@ TRAIL_RUPEES = float(os.getenv("TRAIL_RUPEES", 250))
 RISK_MODE = os.getenv("RISK_MODE", "PER_LOT").upper()  # PER_LOT or ABSOLUTE
 FIRST_TARGET_SL_MODE = os.getenv("FIRST_TARGET_SL_MODE", "MIDPOINT").upper()  # BUY or MIDPOINT
 
+# STRATEGY: target_trail, breakeven_after, time_exit, percent_trail or atr_trail
+STRATEGY = os.getenv("STRATEGY", "target_trail").lower()
+TRAIL_PERCENT = float(os.getenv("TRAIL_PERCENT", 10.0))  # percent_trail: SL distance below the high
+ATR_PERIOD = int(os.getenv("ATR_PERIOD", 14))  # atr_trail: ticks in the range average
+ATR_MULTIPLIER = float(os.getenv("ATR_MULTIPLIER", 3.0))  # atr_trail: SL distance in ATRs
+BREAKEVEN_SECONDS = float(os.getenv("BREAKEVEN_SECONDS", 300))  # breakeven_after: seconds before SL -> buy price
+MAX_HOLD_SECONDS = float(os.getenv("MAX_HOLD_SECONDS", 0))  # time_exit: exit after this long (0 = never)
+# TRAIL_SOURCE: OPTION (trail on the option's own LTP) or UNDERLYING (trail on the option
+# repriced from its underlying's ticks - needs numpy)
+TRAIL_SOURCE = os.getenv("TRAIL_SOURCE", "OPTION").upper()
+# Underlying name -> instrument its options are priced from (index or future)
+UNDERLYING_INSTRUMENTS = os.getenv(
+    "UNDERLYING_INSTRUMENTS",
+    "NIFTY=NSE:NIFTY 50,BANKNIFTY=NSE:NIFTY BANK,FINNIFTY=NSE:NIFTY FIN SERVICE,"
+    "MIDCPNIFTY=NSE:NIFTY MID SELECT,SENSEX=BSE:SENSEX")
+IV_REFRESH_SECONDS = float(os.getenv("IV_REFRESH_SECONDS", 60))  # Implied vols re-solved from option LTPs
+RISK_FREE_RATE = float(os.getenv("RISK_FREE_RATE", 0.065))  # Annual, for option pricing
+
+# Optional per-instrument overrides of the settings above, hot-reloaded on change
+STRATEGY_RULES_FILE = os.getenv("STRATEGY_RULES_FILE")
+RULES_POLL_SECONDS = float(os.getenv("RULES_POLL_SECONDS", 5.0))
+
 # ============================================================================
 # ORDER MANAGEMENT SETTINGS
 # ============================================================================
 PRODUCT = os.getenv("PRODUCT", "MIS")  # MIS, NRML, CNC
 ORDER_BUFFER = float(os.getenv("ORDER_BUFFER", 0.05))
+# SL_LIMIT_MODE: BUFFER (limit = trigger - ORDER_BUFFER) or DEPTH (offset from the
+# smoothed bid/ask spread of full-mode ticks, for up to DEPTH_MAX_TOKENS instruments)
+SL_LIMIT_MODE = os.getenv("SL_LIMIT_MODE", "BUFFER").upper()
+DEPTH_MAX_TOKENS = int(os.getenv("DEPTH_MAX_TOKENS", 50))
+DEPTH_SPREAD_ALPHA = float(os.getenv("DEPTH_SPREAD_ALPHA", 0.2))  # Spread EWMA weight of the newest tick
+DEPTH_SPREAD_MULTIPLIER = float(os.getenv("DEPTH_SPREAD_MULTIPLIER", 2.0))  # Limit offset in spreads
+DEPTH_MAX_BUFFER = float(os.getenv("DEPTH_MAX_BUFFER", 5.0))  # Cap on the limit offset, in points
 MAX_MODIFY_BEFORE_RECREATE = int(os.getenv("MAX_MODIFY_BEFORE_RECREATE", 20))
 THROTTLE_SECONDS = float(os.getenv("THROTTLE_SECONDS", 2.0))
 MIN_SL_STEP = float(os.getenv("MIN_SL_STEP", 0.1))
+# SL_MODE: ORDER (SL order modified on every trail step) or GTT (stop + target parked
+# as one GTT OCO trigger, replaced only every GTT_STEP_RUPEES - NRML/CNC only)
+SL_MODE = os.getenv("SL_MODE", "ORDER").upper()
+GTT_STEP_RUPEES = float(os.getenv("GTT_STEP_RUPEES", 2500))
+ORDER_RATE_LIMIT = float(os.getenv("ORDER_RATE_LIMIT", 10))  # Order place/modify/cancel per second, per account
+API_RATE_LIMIT = float(os.getenv("API_RATE_LIMIT", 10))  # Other REST calls per second, per account
+
+# ============================================================================
+# MARKET HOURS
+# ============================================================================
+# The scheduler pre-warms before the open, pauses the tick path outside the
+# session and, for PRODUCT=MIS, squares everything off before the close.
+# Opt-in: turning it on sells every MIS position SQUARE_OFF_MINUTES before the close
+MARKET_SCHEDULER = os.getenv("MARKET_SCHEDULER", "false").lower() in ("true", "1", "yes", "on")
+MARKET_OPEN = os.getenv("MARKET_OPEN", "09:15")  # Exchange time (MARKET_TIMEZONE)
+MARKET_CLOSE = os.getenv("MARKET_CLOSE", "15:30")
+MARKET_TIMEZONE = os.getenv("MARKET_TIMEZONE", "Asia/Kolkata")
+MARKET_HOLIDAYS_FILE = os.getenv("MARKET_HOLIDAYS_FILE")  # Optional: holidays and special sessions (JSON)
+PREWARM_MINUTES = float(os.getenv("PREWARM_MINUTES", 10))  # Instruments, sessions and ticker before the open
+SQUARE_OFF_MINUTES = float(os.getenv("SQUARE_OFF_MINUTES", 15))  # MIS square-off this long before the close
+SQUARE_OFF_WORKERS = int(os.getenv("SQUARE_OFF_WORKERS", 8))  # Concurrent cancel+exit calls per account
 
 # ============================================================================
 # SYSTEM SETTINGS
 # ============================================================================
 STATE_FILE = os.getenv("STATE_FILE", "state.json")
+RECONCILE_SECONDS = float(os.getenv("RECONCILE_SECONDS", 60))  # Broker positions checked for closes made outside the bot (0 = off)
+ACCOUNTS_FILE = os.getenv("ACCOUNTS_FILE")  # Optional: JSON list of accounts for multi-account mode
+TOKENS_DIR = os.getenv("TOKENS_DIR", "tokens")  # Daily per-account access tokens (multi-account mode)
+SESSION_CACHE_DIR = os.getenv("SESSION_CACHE_DIR", ".sessions")  # Token validations shared between processes
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", 300))
+SESSION_VALIDATE_TIMEOUT_SECONDS = float(os.getenv("SESSION_VALIDATE_TIMEOUT_SECONDS", 15))
+JOURNAL_FILE = os.getenv("JOURNAL_FILE", "trades.db")  # SQLite trade history (empty = off)
+PRICE_BOARD_NAME = os.getenv("PRICE_BOARD_NAME", "kite_prices")  # Shared-memory LTP/SL board (empty = off)
+PRICE_BOARD_SLOTS = int(os.getenv("PRICE_BOARD_SLOTS", 256))  # Instruments the board can hold
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # text or json (one object per line)
+LOG_SAMPLE_SECONDS = float(os.getenv("LOG_SAMPLE_SECONDS", 5.0))  # Repeated per-tick messages: at most one per symbol per interval
+
+# ============================================================================
+# POSTBACK SERVER SETTINGS
+# ============================================================================
+SERVER_MODE = os.getenv("SERVER_MODE", "development").lower()  # development or production
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", 5001))
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", 8))  # Worker threads in production mode
+SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("SHUTDOWN_TIMEOUT_SECONDS", 10.0))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # Enables /admin/profile and /admin/memory (empty = off)
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 60))  # Longest profile one request may run
 
 # ============================================================================
 # NGROK SETTINGS (Optional - for quick testing)
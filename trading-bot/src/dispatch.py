@@ -0,0 +1,64 @@
+from typing import Dict, List
+
+
+def _tick_time(tick):
+    """Exchange time of a tick, when the subscription mode carries one (quote/full)"""
+    return tick.get('exchange_timestamp') or tick.get('last_trade_time')
+
+
+class TickDispatcher:
+    """Conflates each tick packet to the latest tick per instrument token
+
+    Strategies only care about the newest price, so a packet carrying several
+    ticks for one token costs a single evaluation. A per-token watermark of the
+    newest exchange time already acted on drops ticks that arrive late (e.g.
+    replayed after a reconnect), so decisions never go back to stale prices.
+    LTP-mode ticks carry no timestamp; for those packet order decides.
+    """
+
+    def __init__(self):
+        self.watermarks: Dict[int, object] = {}  # token -> newest exchange time dispatched
+        self.ticks_received = 0
+        self.ticks_conflated = 0
+        self.ticks_stale = 0
+        self.batches = 0
+
+    def conflate(self, ticks: List[dict]) -> List[dict]:
+        """Return at most one (the newest) tick per token from a packet"""
+        self.batches += 1
+        self.ticks_received += len(ticks)
+
+        latest: Dict[int, dict] = {}
+        for tick in ticks:
+            token = tick.get('instrument_token')
+            previous = latest.get(token)
+            if previous is not None:
+                self.ticks_conflated += 1
+                tick_time, previous_time = _tick_time(tick), _tick_time(previous)
+                if tick_time and previous_time and tick_time < previous_time:
+                    continue  # Out of order inside the packet - keep the newer one
+            latest[token] = tick
+
+        fresh = []
+        for token, tick in latest.items():
+            tick_time = _tick_time(tick)
+            if tick_time:
+                watermark = self.watermarks.get(token)
+                if watermark and tick_time < watermark:
+                    self.ticks_stale += 1
+                    continue
+                self.watermarks[token] = tick_time
+            fresh.append(tick)
+        return fresh
+
+    def forget(self, token: int):
+        """Drop the watermark of a token that is no longer traded"""
+        self.watermarks.pop(token, None)
+
+    def stats(self) -> dict:
+        return {
+            'batches': self.batches,
+            'ticks_received': self.ticks_received,
+            'ticks_conflated': self.ticks_conflated,
+            'ticks_stale': self.ticks_stale,
+        }
@@ -0,0 +1,62 @@
+import datetime
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentCache:
+    """Symbol -> instrument token lookup shared by every account in the process"""
+
+    def __init__(self):
+        self._tokens: Dict[str, int] = {}  # "NFO:SYMBOL" -> instrument token
+        self._expiries: Dict[str, datetime.date] = {}  # "NFO:SYMBOL" -> expiry date, F&O rows only
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def load(self, kite_client, exchange: str = "NFO"):
+        """Bulk-load every instrument of an exchange from the instruments dump, replacing its previous load"""
+        instruments = kite_client.get_instruments(exchange)
+        tokens = {f"{exchange}:{row['tradingsymbol']}": int(row['instrument_token']) for row in instruments}
+        expiries = {}
+        for row in instruments:
+            expiry = row.get('expiry')
+            if isinstance(expiry, str) and expiry:
+                expiry = datetime.date.fromisoformat(expiry)
+            if isinstance(expiry, datetime.date):
+                expiries[f"{exchange}:{row['tradingsymbol']}"] = expiry
+        # Swap in fresh maps so yesterday's expired contracts stop resolving;
+        # other exchanges' entries (LTP lookups of index tokens) are kept
+        prefix = f"{exchange}:"
+        with self._lock:
+            self._tokens = {**{key: token for key, token in self._tokens.items() if not key.startswith(prefix)},
+                            **tokens}
+            self._expiries = {**{key: expiry for key, expiry in self._expiries.items() if not key.startswith(prefix)},
+                              **expiries}
+        logger.info("📚 Loaded %s %s instruments into cache", len(tokens), exchange)
+
+    def get_expiry(self, symbol: str, exchange: str = "NFO") -> Optional[datetime.date]:
+        """Expiry date from the instruments dump (None if not loaded or not a derivative)"""
+        return self._expiries.get(f"{exchange}:{symbol}")
+
+    def get_token(self, kite_client, symbol: str, exchange: str = "NFO") -> Optional[int]:
+        """Get instrument token for a symbol, falling back to one LTP call on a miss"""
+        key = f"{exchange}:{symbol}"
+        token = self._tokens.get(key)
+        if token is not None:
+            return token
+
+        try:
+            ltp_resp = kite_client.get_ltp(key)
+            token = ltp_resp[key].get("instrument_token")
+        except Exception as e:
+            logger.error("Failed to get instrument token for %s: %s", symbol, e)
+            return None
+
+        if token:
+            with self._lock:
+                self._tokens[key] = token
+        return token
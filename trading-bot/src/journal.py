@@ -0,0 +1,280 @@
+import datetime
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+from src.rules import parse_symbol
+from src.utils.clock import SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+"""
+TRADE JOURNAL
+=============
+Every position's lifecycle - entry, SL placement, SL modifies, first target,
+exit and the exit fill - written to SQLite, so history survives the position
+leaving state.json.
+
+Callers only enqueue: `record()` puts a tuple on a queue and returns, so the
+tick thread never touches the database. A single writer thread owns the
+connection and applies whatever has queued up as one transaction.
+
+Two tables:
+    events  - append-only log, one row per event
+    trades  - one row per position, kept up to date by the writer, indexed by
+              day, symbol and underlying so reports over months of history
+              are index scans, not replays of the event log
+"""
+
+# Event kinds
+ENTRY = "entry"
+SL_PLACED = "sl_placed"
+SL_MODIFIED = "sl_modified"
+TARGET_HIT = "target_hit"
+EXIT = "exit"
+FILL = "fill"  # A SELL fill reported by postback - the actual exit price
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    trade_id      TEXT PRIMARY KEY,
+    user_id       TEXT NOT NULL,
+    symbol        TEXT NOT NULL,
+    underlying    TEXT,
+    expiry        TEXT,
+    day           TEXT NOT NULL,
+    quantity      INTEGER NOT NULL,
+    buy_price     REAL NOT NULL,
+    opened_at     REAL NOT NULL,
+    initial_sl    REAL,
+    sl_trigger    REAL,
+    sl_order_id   TEXT,
+    modifies      INTEGER NOT NULL DEFAULT 0,
+    target_hit_at REAL,
+    closed_at     REAL,
+    exit_reason   TEXT,
+    exit_trigger  REAL,
+    exit_price    REAL,
+    exit_filled   INTEGER NOT NULL DEFAULT 0,
+    realized_pnl  REAL
+);
+CREATE INDEX IF NOT EXISTS trades_day ON trades (day);
+CREATE INDEX IF NOT EXISTS trades_symbol_day ON trades (symbol, day);
+CREATE INDEX IF NOT EXISTS trades_underlying_day ON trades (underlying, day);
+CREATE INDEX IF NOT EXISTS trades_sl_order ON trades (sl_order_id);
+CREATE TABLE IF NOT EXISTS events (
+    id       INTEGER PRIMARY KEY,
+    trade_id TEXT,
+    ts       REAL NOT NULL,
+    kind     TEXT NOT NULL,
+    user_id  TEXT,
+    symbol   TEXT,
+    price    REAL,
+    order_id TEXT,
+    detail   TEXT
+);
+CREATE INDEX IF NOT EXISTS events_trade ON events (trade_id);
+"""
+
+_STOP = object()
+
+
+def trade_id(user_id: Optional[str], symbol: str, opened_at: float) -> str:
+    """Stable id of one position - survives restarts because opened_at is persisted"""
+    return f"{user_id or 'default'}:{symbol}:{opened_at:.3f}"
+
+
+def _day(ts: float, tz) -> str:
+    """Trading day of a timestamp - in exchange time, so a UTC host doesn't split a session"""
+    return datetime.datetime.fromtimestamp(ts, tz).strftime("%Y-%m-%d")
+
+
+class TradeJournal:
+    """Queue-fed SQLite journal with a single background writer"""
+
+    def __init__(self, path: str, batch_size: int = 500, clock=None, timezone: str = "Asia/Kolkata"):
+        self.path = path
+        self.batch_size = batch_size
+        self.clock = clock or SYSTEM_CLOCK
+        self.tz = ZoneInfo(timezone)  # Trades are bucketed by exchange day
+        self._queue = queue.SimpleQueue()
+        self._ready = threading.Event()
+        self.events_written = 0
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def record(self, kind: str, position: dict, user_id: Optional[str], price: float = None,
+               order_id: str = None, **detail):
+        """Queue one event for a position (never blocks, never touches the database)"""
+        self._queue.put((kind, self.clock.time(), user_id, position['symbol'], position['opened_at'],
+                         position['buy_price'], position['quantity'], price, order_id, detail))
+
+    def record_fill(self, user_id: Optional[str], symbol: str, price: float, order_id: str,
+                    quantity: int = None):
+        """Queue a SELL fill of `quantity`; the writer attaches it to the trade it closed"""
+        self._queue.put((FILL, self.clock.time(), user_id, symbol, None, None, quantity, price, order_id, {}))
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything queued so far is committed"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Commit what is queued and stop the writer"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    # ------------------------------------------------------------------ writer thread
+
+    def _run(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._ready.set()
+        try:
+            while True:
+                # Block for one event, then take whatever queued up behind it -
+                # under load the batch grows while the previous commit runs
+                batch = [self._queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = self._write(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch) -> bool:
+        stop = False
+        waiters = []
+        try:
+            with conn:
+                for item in batch:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        self._apply(conn, *item)
+                        self.events_written += 1
+        except sqlite3.Error as e:
+            logger.error("❌ Trade journal write of %s events failed: %s", len(batch), e)
+        for waiter in waiters:
+            waiter.set()
+        return stop
+
+    def _apply(self, conn, kind, ts, user_id, symbol, opened_at, buy_price, quantity, price, order_id, detail):
+        user_id = user_id or "default"
+        if kind == FILL:
+            tid = self._trade_for_fill(conn, user_id, symbol, order_id, quantity)
+        else:
+            tid = trade_id(user_id, symbol, opened_at)
+        conn.execute("INSERT INTO events (trade_id, ts, kind, user_id, symbol, price, order_id, detail) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     (tid, ts, kind, user_id, symbol, price, order_id, json.dumps(detail) if detail else None))
+
+        if kind == ENTRY:
+            parts = parse_symbol(symbol) or {"underlying": symbol, "expiry": None}
+            conn.execute("INSERT OR IGNORE INTO trades (trade_id, user_id, symbol, underlying, expiry, day, "
+                         "quantity, buy_price, opened_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (tid, user_id, symbol, parts["underlying"], parts["expiry"], _day(opened_at, self.tz),
+                          quantity, buy_price, opened_at))
+        elif kind == SL_PLACED:
+            conn.execute("UPDATE trades SET initial_sl = COALESCE(initial_sl, ?), sl_trigger = ?, sl_order_id = ? "
+                         "WHERE trade_id = ?", (price, price, order_id, tid))
+        elif kind == SL_MODIFIED:
+            conn.execute("UPDATE trades SET sl_trigger = ?, sl_order_id = ?, modifies = modifies + 1 "
+                         "WHERE trade_id = ?", (price, order_id, tid))
+        elif kind == TARGET_HIT:
+            conn.execute("UPDATE trades SET target_hit_at = ? WHERE trade_id = ?", (ts, tid))
+        elif kind == EXIT:
+            # Until the fill is reported, the exit price is the LTP that closed the position
+            conn.execute("UPDATE trades SET closed_at = ?, exit_reason = ?, exit_trigger = sl_trigger, "
+                         "exit_price = CASE WHEN exit_filled THEN exit_price ELSE ? END "
+                         "WHERE trade_id = ?", (ts, detail.get("reason"), price, tid))
+            conn.execute("UPDATE trades SET realized_pnl = (exit_price - buy_price) * quantity WHERE trade_id = ?", (tid,))
+        elif kind == FILL and tid:
+            conn.execute("UPDATE trades SET exit_price = ?, exit_filled = 1, realized_pnl = (? - buy_price) * quantity, "
+                         "closed_at = COALESCE(closed_at, ?), exit_reason = COALESCE(exit_reason, 'fill'), "
+                         "exit_trigger = COALESCE(exit_trigger, sl_trigger) "
+                         "WHERE trade_id = ?", (price, price, ts, tid))
+
+    @staticmethod
+    def _trade_for_fill(conn, user_id, symbol, order_id, quantity) -> Optional[str]:
+        """The trade a SELL fill closed: by its SL order id, else this symbol's latest unfilled trade
+        the fill sold all of - a partial sell closes nothing"""
+        row = conn.execute("SELECT trade_id FROM trades WHERE sl_order_id = ? AND user_id = ? AND exit_filled = 0",
+                           (order_id, user_id)).fetchone()
+        if row is None and quantity:
+            row = conn.execute("SELECT trade_id FROM trades WHERE user_id = ? AND symbol = ? AND exit_filled = 0 "
+                               "AND quantity <= ? ORDER BY opened_at DESC LIMIT 1",
+                               (user_id, symbol, quantity)).fetchone()
+        return row[0] if row else None
+
+
+# ---------------------------------------------------------------------- reports
+
+_TRADE_COLUMNS = ("trade_id", "user_id", "symbol", "underlying", "day", "quantity", "buy_price", "initial_sl",
+                  "exit_trigger", "exit_price", "exit_reason", "modifies", "opened_at", "closed_at", "realized_pnl")
+
+
+def _filters(start: str = None, end: str = None, symbol: str = None, underlying: str = None,
+             user_id: str = None):
+    clauses, args = [], []
+    for clause, value in (("day >= ?", start), ("day <= ?", end), ("symbol = ?", symbol),
+                          ("underlying = ?", underlying), ("user_id = ?", user_id)):
+        if value:
+            clauses.append(clause)
+            args.append(value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+
+def query_trades(path: str, **filters) -> List[dict]:
+    """Trades matching day range (YYYY-MM-DD, inclusive) / symbol / underlying / user_id"""
+    where, args = _filters(**filters)
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute(f"SELECT {', '.join(_TRADE_COLUMNS)} FROM trades{where} ORDER BY opened_at", args).fetchall()
+    trades = []
+    for row in rows:
+        trade = dict(zip(_TRADE_COLUMNS, row))
+        trade["slippage"] = (trade["exit_price"] - trade["exit_trigger"]
+                             if trade["exit_price"] is not None and trade["exit_trigger"] else None)
+        trade["seconds_in_trade"] = trade["closed_at"] - trade["opened_at"] if trade["closed_at"] else None
+        trades.append(trade)
+    return trades
+
+
+def summarize(path: str, group_by: str = "day", **filters) -> List[dict]:
+    """Closed-trade analytics per day, symbol or underlying
+
+    Slippage is exit price minus the SL trigger at exit (negative = filled
+    below the stop), averaged over exits that had a trigger.
+    """
+    if group_by not in ("day", "symbol", "underlying", "user_id"):
+        raise ValueError(f"Cannot group by {group_by!r}")
+    where, args = _filters(**filters)
+    where += (" AND " if where else " WHERE ") + "closed_at IS NOT NULL"
+    sql = (f"SELECT {group_by}, COUNT(*), SUM(realized_pnl), SUM(realized_pnl > 0), "
+           f"AVG(CASE WHEN exit_trigger > 0 THEN exit_price - exit_trigger END), "
+           f"AVG(modifies), AVG(closed_at - opened_at) "
+           f"FROM trades{where} GROUP BY {group_by} ORDER BY {group_by}")
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute(sql, args).fetchall()
+    return [{
+        group_by: key,
+        "trades": count,
+        "realized_pnl": round(pnl or 0.0, 2),
+        "win_rate": round(wins / count, 3) if count else 0.0,
+        "avg_slippage": round(slippage, 4) if slippage is not None else None,
+        "avg_modifies": round(modifies or 0.0, 2),
+        "avg_seconds_in_trade": round(held or 0.0, 1),
+    } for key, count, pnl, wins, slippage, modifies, held in rows]
@@ -1,22 +1,57 @@
 from kiteconnect import KiteConnect
-from .auth import ZerodhaAuth
+from .session import env_credentials
+from . import config
+from .utils.clock import SYSTEM_CLOCK
+from .utils.rate_limiter import RateLimitExceeded, TokenBucket
 
 class KiteClient:
-    def __init__(self, api_key=None, access_token=None):
-        # If credentials not provided, use auth module
+    def __init__(self, api_key=None, access_token=None, user_id=None, clock=None):
+        # If credentials not provided, use today's token from .env - never prompt,
+        # an unattended restart must fail fast with SessionError instead
         if not api_key or not access_token:
-            auth = ZerodhaAuth()
-            credentials = auth.get_credentials()
+            credentials = env_credentials()
             api_key = credentials["api_key"]
             access_token = credentials["access_token"]
             
-        self.kite = KiteConnect(api_key=api_key)
+        self.user_id = user_id
+        # KITE_API_ROOT points the client at the local simulator; unset means the real API
+        self.kite = KiteConnect(api_key=api_key, root=config.KITE_API_ROOT)
         self.kite.set_access_token(access_token)
+        
+        # Kite enforces rate limits per API key, so every account gets its own budget
+        # (burst of at least 2 so a cancel+place SL recreate can always be reserved)
+        clock = clock or SYSTEM_CLOCK
+        self.order_limiter = TokenBucket(config.ORDER_RATE_LIMIT, capacity=max(2, config.ORDER_RATE_LIMIT),
+                                         clock=clock.monotonic, sleep=clock.sleep)
+        self.api_limiter = TokenBucket(config.API_RATE_LIMIT, clock=clock.monotonic, sleep=clock.sleep)
+
+    def set_access_token(self, access_token):
+        """Switch to a new day's token - Kite tokens expire daily, the client outlives them"""
+        self.kite.set_access_token(access_token)
+
+    def get_profile(self):
+        self.api_limiter.acquire()
+        return self.kite.profile()
 
     def get_positions(self):
+        self.api_limiter.acquire()
         return self.kite.positions()
 
-    def place_sl_order(self, symbol, quantity, trigger, limit, product):
+    def get_ltp(self, *instruments):
+        self.api_limiter.acquire()
+        return self.kite.ltp(*instruments)
+
+    def get_instruments(self, exchange=None):
+        self.api_limiter.acquire()
+        return self.kite.instruments(exchange)
+
+    def reserve_orders(self, count=1):
+        """Take order budget up front for a multi-call operation, without waiting"""
+        return self.order_limiter.try_acquire(count)
+
+    def place_sl_order(self, symbol, quantity, trigger, limit, product, reserved=False):
+        if not reserved:
+            self.order_limiter.acquire()
         return self.kite.place_order(
             variety=self.kite.VARIETY_REGULAR,
             exchange="NFO",
@@ -30,7 +65,24 @@ class KiteClient:
             validity=self.kite.VALIDITY_DAY
         )
 
-    def modify_order(self, order_id, trigger, limit):
+    def place_market_exit(self, symbol, quantity, product):
+        self.order_limiter.acquire()
+        return self.kite.place_order(
+            variety=self.kite.VARIETY_REGULAR,
+            exchange="NFO",
+            tradingsymbol=symbol,
+            transaction_type=self.kite.TRANSACTION_TYPE_SELL,
+            quantity=quantity,
+            order_type=self.kite.ORDER_TYPE_MARKET,
+            product=product,
+            validity=self.kite.VALIDITY_DAY
+        )
+
+    def modify_order(self, order_id, trigger, limit, reserved=False):
+        # Modifies run on the tick path under the bot lock - never sleep there,
+        # let the caller skip this step and retry on a later tick
+        if not reserved and not self.order_limiter.try_acquire():
+            raise RateLimitExceeded(f"Order budget exhausted, modify of {order_id} deferred")
         return self.kite.modify_order(
             variety=self.kite.VARIETY_REGULAR,
             order_id=order_id,
@@ -38,5 +90,47 @@ class KiteClient:
             price=limit
         )
 
-    def cancel_order(self, order_id):
+    def cancel_order(self, order_id, reserved=False):
+        if not reserved:
+            self.order_limiter.acquire()
         return self.kite.cancel_order(variety=self.kite.VARIETY_REGULAR, order_id=order_id)
+
+    def _gtt_oco_args(self, symbol, quantity, stop, stop_limit, target, target_limit, last_price, product):
+        legs = [(stop, stop_limit), (target, target_limit)]
+        return {
+            "trigger_type": self.kite.GTT_TYPE_OCO,
+            "tradingsymbol": symbol,
+            "exchange": "NFO",
+            "trigger_values": [trigger for trigger, _ in legs],
+            "last_price": last_price,
+            "orders": [{
+                "transaction_type": self.kite.TRANSACTION_TYPE_SELL,
+                "quantity": quantity,
+                "order_type": self.kite.ORDER_TYPE_LIMIT,
+                "product": product,
+                "price": limit,
+            } for _, limit in legs],
+        }
+
+    def place_gtt_oco(self, symbol, quantity, stop, stop_limit, target, target_limit, last_price, product,
+                      reserved=False):
+        """Park a stop and a target as one exchange-side OCO trigger; returns the trigger id"""
+        if not reserved:
+            self.order_limiter.acquire()
+        result = self.kite.place_gtt(**self._gtt_oco_args(symbol, quantity, stop, stop_limit,
+                                                          target, target_limit, last_price, product))
+        return result["trigger_id"]
+
+    def modify_gtt_oco(self, trigger_id, symbol, quantity, stop, stop_limit, target, target_limit, last_price,
+                       product, reserved=False):
+        # Same tick-path rule as modify_order - never sleep for budget here
+        if not reserved and not self.order_limiter.try_acquire():
+            raise RateLimitExceeded(f"Order budget exhausted, modify of GTT {trigger_id} deferred")
+        self.kite.modify_gtt(trigger_id, **self._gtt_oco_args(symbol, quantity, stop, stop_limit,
+                                                              target, target_limit, last_price, product))
+        return trigger_id
+
+    def delete_gtt(self, trigger_id, reserved=False):
+        if not reserved:
+            self.order_limiter.acquire()
+        return self.kite.delete_gtt(trigger_id)
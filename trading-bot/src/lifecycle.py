@@ -0,0 +1,87 @@
+import logging
+from typing import Dict, List
+from src.utils.clock import SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+"""
+POSITION LIFECYCLE
+==================
+A position normally leaves the bot through its own stop or exit, whose
+postback (or LTP through the SL) calls remove_position. Positions closed any
+other way - sold by hand in Kite, squared off by the broker, a postback that
+never arrived - would otherwise be trailed forever, their tokens subscribed
+and their state entries saved on every write.
+
+Closes are caught twice over:
+
+    order feed      a completed SELL the bot didn't place retires the position
+                    at once (and cancels its stop, which would otherwise sell
+                    a second time)
+    positions feed  every RECONCILE_SECONDS the broker's net positions are
+                    compared with the bot's; anything flat there is retired,
+                    and bookkeeping no live position owns is reclaimed
+
+so nothing outlives its position by more than RECONCILE_SECONDS.
+"""
+
+
+def open_quantities(kite_client) -> Dict[str, int]:
+    """Symbol -> net quantity of every open long position at the broker"""
+    # Net, not day - NRML positions carried overnight only show up there
+    positions = kite_client.get_positions()
+    quantities = {}
+    for position in positions.get("net", []):
+        quantity = int(float(position.get("quantity", 0)))
+        if quantity > 0:
+            quantities[position.get("tradingsymbol")] = quantity
+    return quantities
+
+
+class PositionLifecycle:
+    """Reconciles one bot's positions with the broker's on a fixed interval"""
+
+    def __init__(self, bot, interval: float = 60.0, clock=None):
+        self.bot = bot
+        self.interval = interval
+        self.clock = clock or SYSTEM_CLOCK
+        self._next = None
+
+    def reconcile(self) -> List[str]:
+        """Retire positions that are flat at the broker; returns their symbols"""
+        try:
+            quantities = open_quantities(self.bot.kite_client)
+        except Exception as e:
+            logger.error("❌ Position reconcile failed, will retry: %s", e, extra={"user_id": self.bot.user_id})
+            return []
+
+        now = self.clock.time()
+        closed = []
+        for symbol, position in list(self.bot.active_positions.items()):
+            # A BUY seconds old may not be in the positions book yet
+            if symbol in quantities or now - position['opened_at'] < self.interval:
+                continue
+            logger.info("🔎 %s is flat at the broker - closed outside the bot", symbol,
+                        extra={"symbol": symbol, "user_id": self.bot.user_id})
+            self.bot.retire_position(symbol, "closed_externally")
+            closed.append(symbol)
+        reclaimed = self.bot.reclaim(quantities)
+        if closed or reclaimed:
+            logger.info("♻️  Reconciled: %s positions retired, %s stale entries reclaimed", len(closed), reclaimed,
+                        extra={"user_id": self.bot.user_id})
+        return closed
+
+    def step(self) -> float:
+        """Reconcile if due; returns seconds to the next reconcile"""
+        now = self.clock.time()
+        if self._next is None:
+            self._next = now + self.interval
+        if now >= self._next:
+            self.reconcile()
+            self._next = now + self.interval
+        return self._next - now
+
+    def run(self, stop_event):
+        """Reconcile every `interval` until stop_event is set (run in a daemon thread)"""
+        while not self.clock.wait(stop_event, self.step()):
+            pass
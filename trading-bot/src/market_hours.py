@@ -0,0 +1,209 @@
+import datetime
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from src.utils.clock import SYSTEM_CLOCK
+from src import config
+
+logger = logging.getLogger(__name__)
+
+"""
+MARKET HOURS
+============
+The exchange calendar (weekends, holidays, special sessions such as Muhurat
+trading) and a scheduler that walks every bot through the trading day:
+
+    prewarm     PREWARM_MINUTES before the open - reload the instrument dump,
+                load today's access tokens, re-validate them and connect the
+                ticker for carried positions (an account whose token fails
+                stays paused - it would only collect 403s)
+    open        resume the tick path
+    square_off  PRODUCT=MIS only, SQUARE_OFF_MINUTES before the close - cancel
+                every stop and sell every position, all accounts in parallel,
+                ahead of the broker's own auto square-off
+    close       pause the tick path and drop the ticker until the next prewarm
+
+Outside the session the bots keep no WebSocket open, so they don't collect
+403s from a feed that has nothing to send. Postbacks are handled as always.
+"""
+
+# Scheduler events, in the order they happen within a session
+PREWARM = "prewarm"
+OPEN = "open"
+SQUARE_OFF = "square_off"
+CLOSE = "close"
+
+
+def _time(value: str) -> datetime.time:
+    return datetime.datetime.strptime(value, "%H:%M").time()
+
+
+class MarketCalendar:
+    """Trading sessions in exchange time
+
+    `holidays` are closed days; `sessions` maps a day to its own (open, close),
+    for special sessions on a holiday or weekend or for shortened days.
+    """
+
+    def __init__(self, open_time: str = "09:15", close_time: str = "15:30", holidays: Iterable[str] = (),
+                 sessions: Dict[str, Tuple[str, str]] = None, timezone: str = "Asia/Kolkata"):
+        self.open_time = _time(open_time)
+        self.close_time = _time(close_time)
+        self.holidays = {datetime.date.fromisoformat(day) for day in holidays}
+        self.sessions = {datetime.date.fromisoformat(day): (_time(start), _time(end))
+                         for day, (start, end) in (sessions or {}).items()}
+        self.tz = ZoneInfo(timezone)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None, **kwargs):
+        """Calendar with the holidays/sessions of a JSON file (no file = weekends only)"""
+        if path:
+            with open(path, "r") as f:
+                data = json.load(f)
+            kwargs.setdefault("holidays", data.get("holidays", []))
+            kwargs.setdefault("sessions", data.get("sessions", {}))
+        return cls(**kwargs)
+
+    @classmethod
+    def from_config(cls):
+        return cls.load(config.MARKET_HOLIDAYS_FILE, open_time=config.MARKET_OPEN, close_time=config.MARKET_CLOSE,
+                        timezone=config.MARKET_TIMEZONE)
+
+    def day(self, ts: float) -> datetime.date:
+        """Exchange-local date of a timestamp"""
+        return datetime.datetime.fromtimestamp(ts, self.tz).date()
+
+    def session(self, day: datetime.date) -> Optional[Tuple[float, float]]:
+        """(open, close) timestamps of a day's session, None when the market is shut"""
+        if day in self.sessions:
+            start, end = self.sessions[day]
+        elif day.weekday() >= 5 or day in self.holidays:
+            return None
+        else:
+            start, end = self.open_time, self.close_time
+        return (datetime.datetime.combine(day, start, self.tz).timestamp(),
+                datetime.datetime.combine(day, end, self.tz).timestamp())
+
+    def is_open(self, ts: float) -> bool:
+        session = self.session(self.day(ts))
+        return session is not None and session[0] <= ts < session[1]
+
+
+class MarketScheduler:
+    """Fires the calendar's events for a set of bots
+
+    `bots` is called for the current bot list at every event; `warm` reloads
+    shared caches and today's sessions before the open, and returns the bots
+    whose session is unusable - those stay paused until the next pre-warm.
+    """
+
+    def __init__(self, calendar: MarketCalendar, bots: Callable[[], List], warm: Callable[[], Iterable] = None,
+                 clock=None, prewarm_seconds: float = None, square_off_seconds: float = None,
+                 square_off: bool = None):
+        self.calendar = calendar
+        self.bots = bots
+        self.warm = warm
+        self.clock = clock or SYSTEM_CLOCK
+        self.prewarm_seconds = config.PREWARM_MINUTES * 60 if prewarm_seconds is None else prewarm_seconds
+        self.square_off_seconds = config.SQUARE_OFF_MINUTES * 60 if square_off_seconds is None else square_off_seconds
+        self.square_off = config.PRODUCT == "MIS" if square_off is None else square_off
+        self._last = None  # Events up to this time have fired
+        self._blocked: List = []  # Bots whose session failed the last pre-warm
+
+    def events(self, day: datetime.date) -> List[Tuple[float, str]]:
+        session = self.calendar.session(day)
+        if session is None:
+            return []
+        start, end = session
+        events = [(start - self.prewarm_seconds, PREWARM), (start, OPEN), (end, CLOSE)]
+        if self.square_off:
+            events.append((max(start, end - self.square_off_seconds), SQUARE_OFF))
+        return sorted(events)
+
+    def _between(self, after: float, until: float) -> List[Tuple[float, str]]:
+        """Events in (after, until], oldest first"""
+        day, last = self.calendar.day(after), self.calendar.day(until)
+        events = []
+        while day <= last:
+            events.extend(event for event in self.events(day) if after < event[0] <= until)
+            day += datetime.timedelta(days=1)
+        return events
+
+    def sync(self):
+        """Bring the bots in line with the market right now - call before the bots start
+
+        Outside the session and its pre-warm window the tick path is paused.
+        Inside the square-off window (a restart at 15:20, say) the square-off
+        runs straight away.
+        """
+        now = self.clock.time()
+        self._last = now
+        session = self.calendar.session(self.calendar.day(now))
+        if session is None or not session[0] - self.prewarm_seconds <= now < session[1]:
+            logger.info("🌙 Market closed - tick path paused until the next session")
+            self._fire(CLOSE)
+            return
+        if self.square_off and now >= session[1] - self.square_off_seconds:
+            self._fire(SQUARE_OFF)
+
+    def step(self) -> float:
+        """Fire every event that has come due; returns seconds to the next one"""
+        now = self.clock.time()
+        if self._last is None:
+            self.sync()
+        for _, event in self._between(self._last, now):
+            self._fire(event)
+        self._last = now
+        # Look up to two weeks ahead - long weekends plus a holiday run never need more
+        upcoming = self._between(now, now + 14 * 86400)
+        return upcoming[0][0] - now if upcoming else 86400.0
+
+    def run(self, stop_event):
+        """Fire events until stop_event is set (waits are capped, so clock jumps are caught)"""
+        while True:
+            wait = self.step()
+            if self.clock.wait(stop_event, min(max(wait, 0.0), 60.0)):
+                return
+
+    def _fire(self, event: str):
+        bots = self.bots()
+        try:
+            if event == PREWARM:
+                logger.info("🌅 Pre-market warm-up for %s accounts", len(bots))
+                self._blocked = []
+                if self.warm is not None:
+                    try:
+                        self._blocked = list(self.warm() or ())
+                    except Exception as e:
+                        # No session is known to be good - connecting would only collect 403s
+                        logger.critical("🚨 Pre-market warm-up failed, every account stays paused: %s", e)
+                        self._blocked = list(bots)
+                for bot in self._usable(bots):
+                    bot.resume_market_data()  # Ticker connects now, not at the first tick of the day
+            elif event == OPEN:
+                logger.info("🔔 Market open")
+                for bot in self._usable(bots):
+                    bot.resume_market_data()
+            elif event == SQUARE_OFF:
+                self.square_off_all(bots)
+            elif event == CLOSE:
+                for bot in bots:
+                    bot.pause_market_data()
+        except Exception as e:
+            logger.error("❌ Market %s failed: %s", event, e)
+
+    def _usable(self, bots: List) -> List:
+        return [bot for bot in bots if not any(bot is blocked for blocked in self._blocked)]
+
+    @staticmethod
+    def square_off_all(bots: List) -> int:
+        """Square off every account at once - each account works within its own order budget"""
+        if not bots:
+            return 0
+        logger.info("⏰ MIS square-off for %s accounts", len(bots))
+        with ThreadPoolExecutor(max_workers=len(bots), thread_name_prefix="square-off") as pool:
+            closed = sum(pool.map(lambda bot: bot.square_off(), bots))
+        logger.info("✅ MIS square-off done: %s positions closed", closed)
+        return closed
@@ -0,0 +1,50 @@
+from src.utils.math_helpers import money_to_points
+
+
+def build_position(symbol: str, buy_price: float, quantity: int, params: dict,
+                   opened_at: float, saved: dict = None) -> dict:
+    """Create a position record, deriving point levels from its strategy parameters
+
+    Shared by the live bot and offline replay so both trail the same numbers.
+    `saved` restores the mutable fields of a position persisted in state.json.
+    """
+    saved = saved or {}
+
+    # Calculate lots based on the instrument's lot size
+    lots = max(1, quantity // params['lot_size'])
+
+    sl_gap = money_to_points(params['risk_rupees'], quantity, lots, params['risk_mode'])
+    target_gap = money_to_points(params['reward_rupees'], quantity, lots, params['risk_mode'])
+    trail_step = money_to_points(params['trail_rupees'], quantity, lots, params['risk_mode'])
+
+    # Levels that never change for the life of the position are computed once here,
+    # not on every tick
+    first_target = buy_price + target_gap
+    if params['first_target_sl_mode'] == "BUY":
+        base_sl = buy_price
+    else:
+        base_sl = (buy_price + first_target) / 2.0
+
+    return {
+        'symbol': symbol,
+        'buy_price': buy_price,
+        'quantity': quantity,
+        'lots': lots,
+        'params': params,
+        'sl_gap': sl_gap,
+        'target_gap': target_gap,
+        'trail_step': trail_step,
+        'first_target': first_target,
+        'base_sl': base_sl,
+        'opened_at': saved.get('opened_at', opened_at),
+        'first_target_hit': saved.get('first_target_hit', False),
+        'sl_order_id': saved.get('sl_order_id'),
+        'sl_trigger': saved.get('sl_trigger', 0.0),
+        'gtt_id': saved.get('gtt_id'),  # GTT OCO trigger instead of an SL order (SL_MODE=GTT)
+        'exiting': False,  # The bot's own market exit is on its way
+        # TRAIL_SOURCE=UNDERLYING: underlying the trail follows, and the option's own last price
+        'underlying': None,
+        'option_ltp': None,
+        # Scratch space owned by the position's strategy (high-water marks, ATR...)
+        'strategy_state': {},
+    }
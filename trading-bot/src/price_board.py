@@ -0,0 +1,213 @@
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+"""
+PRICE BOARD
+===========
+The bot's latest LTP, tick time and SL trigger per instrument, published to a
+named shared-memory segment so dashboards and scripts on the same machine
+can read prices without a REST call (and without talking to the bot at all).
+
+Layout (little-endian, fixed):
+
+    header  magic "KPB1" | capacity u32 | writer pid u64           16 bytes
+    slot    seq u64 | token u64 | ltp f64 | ts f64 | sl_trigger f64  40 bytes x capacity
+
+One writer (the bot) and any number of readers. Each slot is guarded by a
+seqlock: the writer makes `seq` odd, writes the fields, then makes it even
+again. A reader copies the slot and keeps the copy only if `seq` was even and
+unchanged around the copy - otherwise it raced a write and reads again.
+Readers never block the writer and take no locks. Token 0 marks a free slot.
+
+A segment whose writer pid is still running is never taken over - a second
+bot (or a restart overlapping the old process) with the same PRICE_BOARD_NAME
+fails instead of leaving the old board's readers on frozen prices.
+"""
+
+MAGIC = b"KPB1"
+_HEADER = struct.Struct("<4sIQ")
+_SLOT = struct.Struct("<QQddd")
+_SEQ = struct.Struct("<Q")
+_FIELDS = struct.Struct("<Qddd")  # token, ltp, ts, sl_trigger - the slot after its seq
+
+
+def board_size(capacity: int) -> int:
+    return _HEADER.size + capacity * _SLOT.size
+
+
+def _offset(index: int) -> int:
+    return _HEADER.size + index * _SLOT.size
+
+
+_attach_lock = threading.Lock()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open an existing segment without handing it to this process's resource tracker
+
+    Before Python 3.13 every attach is registered with the resource tracker,
+    which unlinks the segment when the attaching process exits - a reader
+    script would delete the bot's board on its way out.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None if rtype == "shared_memory" else register(name, rtype)
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if sys.platform == "win32":
+        # Windows frees a segment with its last handle - one that exists has a live owner
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Running, as another user
+    return True
+
+
+def _writer_pid(name: str) -> int:
+    """Pid recorded by the segment's writer, 0 if it isn't a price board"""
+    shm = _attach(name)
+    try:
+        magic, _, pid = _HEADER.unpack_from(shm.buf, 0)
+        return pid if magic == MAGIC else 0
+    finally:
+        shm.close()
+
+
+class PriceBoard:
+    """Writer side - owned by one bot, which creates and finally unlinks the segment"""
+
+    def __init__(self, name: str, capacity: int = 256):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=board_size(capacity))
+        except FileExistsError:
+            pid = _writer_pid(name)
+            if pid and _alive(pid):
+                raise FileExistsError(f"Price board {name!r} is being written by running process {pid} - "
+                                      f"give this bot its own PRICE_BOARD_NAME")
+            # Left behind by a bot that crashed - nobody writes it any more, take it over
+            logger.info("📋 Reclaiming price board %r from exited writer %s", name, pid or "unknown")
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=board_size(capacity))
+        self.name = name
+        self.capacity = capacity
+        self.buf = self.shm.buf
+        self.buf[:board_size(capacity)] = bytes(board_size(capacity))
+        _HEADER.pack_into(self.buf, 0, MAGIC, capacity, os.getpid())
+        self._slots: Dict[int, int] = {}  # token -> slot index
+        self._seqs = [0] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+        self._full_warned = False
+
+    def _write(self, index: int, token: int, ltp: float, ts: float, sl_trigger: float):
+        offset = _HEADER.size + index * _SLOT.size
+        seq = self._seqs[index] + 1
+        _SEQ.pack_into(self.buf, offset, seq)  # Odd: write in progress
+        _FIELDS.pack_into(self.buf, offset + _SEQ.size, token, ltp, ts, sl_trigger)
+        _SEQ.pack_into(self.buf, offset, seq + 1)
+        self._seqs[index] = seq + 1
+
+    def publish(self, token: int, ltp: float, ts: float = None, sl_trigger: float = 0.0):
+        """Write one instrument's latest price (called from the tick path - two struct writes)"""
+        index = self._slots.get(token)
+        if index is None:
+            if not self._free:
+                if not self._full_warned:
+                    logger.warning("⚠️  Price board %s is full (%s slots) - %s not published",
+                                   self.name, self.capacity, token)
+                    self._full_warned = True
+                return
+            index = self._slots[token] = self._free.pop()
+        self._write(index, token, ltp, time.time() if ts is None else ts, sl_trigger or 0.0)
+
+    def remove(self, token: int):
+        """Free an instrument's slot (position closed)"""
+        index = self._slots.pop(token, None)
+        if index is not None:
+            self._write(index, 0, 0.0, 0.0, 0.0)
+            self._free.append(index)
+            self._full_warned = False
+
+    def close(self):
+        """Detach and delete the segment - readers still attached keep their mapping"""
+        self.buf = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class PriceBoardReader:
+    """Reader side - for any local process; never writes, never blocks the bot"""
+
+    def __init__(self, name: str, retries: int = 1000):
+        self.shm = _attach(name)
+        self.buf = self.shm.buf
+        magic, self.capacity, _ = _HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            self.shm.close()
+            raise ValueError(f"Shared memory {name!r} is not a price board")
+        self.retries = retries
+        self._index: Dict[int, int] = {}  # token -> slot it was last seen in
+
+    def _read(self, index: int) -> Optional[tuple]:
+        """(token, ltp, ts, sl_trigger) of one slot, consistent; None if it kept changing"""
+        offset = _offset(index)
+        for _ in range(self.retries):
+            before, token, ltp, ts, sl_trigger = _SLOT.unpack_from(self.buf, offset)
+            if before & 1:
+                continue  # Write in progress
+            if _SEQ.unpack_from(self.buf, offset)[0] == before:
+                return token, ltp, ts, sl_trigger
+        return None
+
+    def get(self, token: int) -> Optional[dict]:
+        """Latest {ltp, ts, sl_trigger} for a token, None if the bot isn't tracking it"""
+        # Slots move only when positions close and open - remember where a token
+        # was and rescan the board only when it isn't there any more
+        index = self._index.get(token)
+        slot = self._read(index) if index is not None else None
+        if not slot or slot[0] != token:
+            self.snapshot()
+            index = self._index.get(token)
+            slot = self._read(index) if index is not None else None
+        if slot and slot[0] == token:
+            return {"ltp": slot[1], "ts": slot[2], "sl_trigger": slot[3]}
+        return None
+
+    def snapshot(self) -> Dict[int, dict]:
+        """Every tracked token -> {ltp, ts, sl_trigger}"""
+        prices = {}
+        self._index = {}
+        for index in range(self.capacity):
+            slot = self._read(index)
+            if slot and slot[0]:
+                self._index[slot[0]] = index
+                prices[slot[0]] = {"ltp": slot[1], "ts": slot[2], "sl_trigger": slot[3]}
+        return prices
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
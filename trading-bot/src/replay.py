@@ -0,0 +1,64 @@
+from itertools import groupby
+from typing import Dict, Iterable, List, Tuple
+from src.positions import build_position
+from src.strategies.engine import StrategyEngine
+
+"""
+OFFLINE REPLAY
+==============
+Runs recorded ticks through the same StrategyEngine and strategies the live
+bot uses, with paper fills instead of broker orders. Ticks sharing a
+timestamp are evaluated as one batch, like one WebSocket packet live.
+"""
+
+
+def replay(ticks: Iterable[Tuple[float, str, float]], entries: List[Tuple[str, float, int]],
+           rules, min_sl_step: float) -> Dict[str, dict]:
+    """Replay (timestamp, symbol, ltp) ticks against positions opened at `entries`
+
+    Positions open at their symbol's first tick. Returns per-symbol results with
+    the exit reason/price and every SL change, in the order they happened.
+    """
+    engine = StrategyEngine(min_sl_step)
+    pending = {symbol: (buy_price, quantity) for symbol, buy_price, quantity in entries}
+    positions: Dict[str, dict] = {}
+    results: Dict[str, dict] = {}
+
+    for timestamp, batch in groupby(ticks, key=lambda tick: tick[0]):
+        updates = []
+        for _, symbol, ltp in batch:
+            if symbol in pending:
+                buy_price, quantity = pending.pop(symbol)
+                position = build_position(symbol, buy_price, quantity, rules.resolve(symbol), timestamp)
+                position['sl_trigger'] = buy_price - position['sl_gap']
+                positions[symbol] = position
+                results[symbol] = {'buy_price': buy_price, 'quantity': quantity, 'opened_at': timestamp,
+                                   'sl_changes': [(timestamp, position['sl_trigger'], "initial")],
+                                   'exit_reason': None, 'exit_price': None, 'closed_at': None, 'last_ltp': ltp}
+            if symbol in positions:
+                results[symbol]['last_ltp'] = ltp
+                updates.append((positions[symbol], ltp))
+
+        ltps = {position['symbol']: ltp for position, ltp in updates}
+        for decision in engine.evaluate(updates, timestamp):
+            position = positions.get(decision.symbol)
+            if position is None:
+                continue
+            result = results[decision.symbol]
+            if decision.action in ("sl_hit", "exit"):
+                # Paper fill: stops fill at their trigger, market exits at the LTP
+                result['exit_price'] = position['sl_trigger'] if decision.action == "sl_hit" else ltps[decision.symbol]
+                result['exit_reason'] = decision.reason
+                result['closed_at'] = timestamp
+                del positions[decision.symbol]
+                continue
+            if decision.reason == "first_target":
+                position['first_target_hit'] = True
+            if decision.sl > position['sl_trigger']:
+                position['sl_trigger'] = decision.sl
+                result['sl_changes'].append((timestamp, decision.sl, decision.reason))
+
+    for symbol, result in results.items():
+        exit_price = result['exit_price'] if result['exit_price'] is not None else result['last_ltp']
+        result['pnl'] = (exit_price - result['buy_price']) * result['quantity']
+    return results
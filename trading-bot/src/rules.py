@@ -0,0 +1,196 @@
+import fnmatch
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+"""
+STRATEGY RULES
+==============
+Per-instrument risk/reward/trail settings. A rules file is a JSON list of
+rules, each matching on any of `underlying`, `segment` and `expiry` (glob
+patterns, omitted = any) and overriding some of the strategy parameters:
+
+    [
+      {"underlying": "BANKNIFTY", "risk_rupees": 800, "trail_rupees": 400},
+      {"underlying": "NIFTY", "expiry": "*JAN", "first_target_sl_mode": "BUY"}
+    ]
+
+Every matching rule applies, least specific first, on top of the .env
+defaults. The table is compiled once per load; the resolved parameters are
+cached per symbol and copied onto a position when it opens, so reloading
+the file never changes a position that is already being trailed.
+"""
+
+# Parameters a rule can set, with the type they are coerced to
+PARAM_TYPES = {
+    "lot_size": int,
+    "risk_rupees": float,
+    "reward_rupees": float,
+    "trail_rupees": float,
+    "risk_mode": str,
+    "first_target_sl_mode": str,
+    "strategy": str,
+    "trail_percent": float,
+    "atr_period": int,
+    "atr_multiplier": float,
+    "breakeven_seconds": float,
+    "max_hold_seconds": float,
+    "sl_mode": str,
+    "gtt_step_rupees": float,
+    "trail_source": str,
+}
+MATCH_FIELDS = ("underlying", "segment", "expiry")
+CACHE_LIMIT = 1024  # Resolved symbols kept per table
+
+# NIFTY24JAN25000CE (monthly), NIFTY2410325000CE (weekly: YY + M + DD), NIFTY24JANFUT
+_SYMBOL_RE = re.compile(
+    r"^(?P<underlying>[A-Z&\-]+)"
+    r"(?P<expiry>\d{2}(?:[A-Z]{3}|[1-9OND]\d{2}))"
+    r"(?P<strike>\d+(?:\.\d+)?)?"
+    r"(?P<kind>CE|PE|FUT)$"
+)
+
+
+def parse_symbol(symbol: str) -> Optional[dict]:
+    """Split an F&O trading symbol into underlying, expiry code, strike and kind"""
+    match = _SYMBOL_RE.match(symbol)
+    if not match:
+        return None
+    parts = match.groupdict()
+    parts["strike"] = float(parts["strike"]) if parts["strike"] else None
+    return parts
+
+
+def default_params(config) -> dict:
+    """Strategy parameters from the .env settings"""
+    return {
+        "lot_size": config.LOT_SIZE,
+        "risk_rupees": config.RISK_RUPEES,
+        "reward_rupees": config.REWARD_RUPEES,
+        "trail_rupees": config.TRAIL_RUPEES,
+        "risk_mode": config.RISK_MODE,
+        "first_target_sl_mode": config.FIRST_TARGET_SL_MODE,
+        "strategy": config.STRATEGY,
+        "trail_percent": config.TRAIL_PERCENT,
+        "atr_period": config.ATR_PERIOD,
+        "atr_multiplier": config.ATR_MULTIPLIER,
+        "breakeven_seconds": config.BREAKEVEN_SECONDS,
+        "max_hold_seconds": config.MAX_HOLD_SECONDS,
+        "sl_mode": config.SL_MODE,
+        "gtt_step_rupees": config.GTT_STEP_RUPEES,
+        "trail_source": config.TRAIL_SOURCE,
+    }
+
+
+def _compile_rule(index: int, rule: dict) -> dict:
+    if not isinstance(rule, dict):
+        raise ValueError(f"Rule {index} must be a JSON object")
+    unknown = set(rule) - set(PARAM_TYPES) - set(MATCH_FIELDS)
+    if unknown:
+        raise ValueError(f"Rule {index} has unknown keys: {sorted(unknown)}")
+
+    params = {}
+    for key, cast in PARAM_TYPES.items():
+        if key in rule:
+            value = cast(rule[key])
+            params[key] = value.upper() if key in ("risk_mode", "first_target_sl_mode", "sl_mode", "trail_source") else value
+
+    patterns = {}
+    for field in MATCH_FIELDS:
+        pattern = str(rule.get(field, "*")).upper()
+        if pattern != "*":
+            patterns[field] = re.compile(fnmatch.translate(pattern))
+
+    if "strategy" in params:
+        # Imported here - the strategies package depends on nothing in this module
+        from src.strategies.engine import get_strategy
+        get_strategy(params["strategy"])  # Reject unknown names at load time
+
+    return {"index": index, "patterns": patterns, "params": params}
+
+
+class RuleTable:
+    """Compiled, immutable rule set with a per-symbol resolution cache"""
+
+    def __init__(self, rules: List[dict], defaults: dict):
+        compiled = [_compile_rule(i, rule) for i, rule in enumerate(rules)]
+        # Least specific first so more specific rules override; file order breaks ties
+        compiled.sort(key=lambda r: (len(r["patterns"]), r["index"]))
+        self.rules = compiled
+        self.defaults = dict(defaults)
+        self._cache: Dict[tuple, dict] = {}
+
+    def resolve(self, symbol: str, segment: str = "NFO") -> dict:
+        """Strategy parameters for a symbol (returns a fresh copy)"""
+        key = (segment, symbol)
+        params = self._cache.get(key)
+        if params is None:
+            params = self._resolve(symbol, segment)
+            # Contracts expire and new ones list every week - keep a long-running
+            # bot from remembering all of them (a miss only costs one resolve)
+            if len(self._cache) >= CACHE_LIMIT:
+                self._cache.clear()
+            self._cache[key] = params
+        return dict(params)
+
+    def _resolve(self, symbol: str, segment: str) -> dict:
+        parts = parse_symbol(symbol) or {"underlying": symbol, "expiry": ""}
+        fields = {"underlying": parts["underlying"], "segment": segment.upper(), "expiry": parts["expiry"]}
+
+        params = dict(self.defaults)
+        for rule in self.rules:
+            if all(pattern.match(fields[field]) for field, pattern in rule["patterns"].items()):
+                params.update(rule["params"])
+        return params
+
+
+class RuleStore:
+    """Holds the live RuleTable and swaps in a new one when the file changes"""
+
+    def __init__(self, path: Optional[str], defaults: dict):
+        self.path = path
+        self.defaults = defaults
+        self.table = RuleTable([], defaults)
+        self._mtime = None
+        if path:
+            self.reload()
+
+    def resolve(self, symbol: str, segment: str = "NFO") -> dict:
+        return self.table.resolve(symbol, segment)
+
+    def reload(self) -> bool:
+        """Load and compile the rules file if it changed; keep the old table on errors"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            logger.error("Cannot read strategy rules file %s: %s", self.path, e)
+            return False
+        if mtime == self._mtime:
+            return False
+
+        try:
+            with open(self.path, "r") as f:
+                rules = json.load(f)
+            if not isinstance(rules, list):
+                raise ValueError("rules file must contain a JSON list")
+            table = RuleTable(rules, self.defaults)
+        except (ValueError, TypeError) as e:
+            logger.error("❌ Invalid strategy rules in %s, keeping previous rules: %s", self.path, e)
+            self._mtime = mtime  # Don't retry the same broken file every poll
+            return False
+
+        # Single reference swap - readers see either the old or the new table
+        self.table = table
+        self._mtime = mtime
+        logger.info("📐 Loaded %s strategy rules from %s", len(table.rules), self.path)
+        return True
+
+    def watch(self, stop_event: threading.Event, interval: float):
+        """Poll the rules file until stop_event is set (run in a daemon thread)"""
+        while not stop_event.wait(interval):
+            self.reload()
@@ -0,0 +1,191 @@
+import datetime
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+from dotenv import dotenv_values, find_dotenv
+from kiteconnect.exceptions import TokenException
+from src.utils.file_helpers import load_state, save_state
+from src import config
+
+try:
+    import fcntl
+except ImportError:  # Windows - cache still works, just without cross-process locking
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+"""
+SESSION MANAGER
+===============
+Checks at startup that an access token is actually accepted by Kite (one
+`profile()` call), instead of trusting the date it was saved on. A token
+revoked mid-day - by a fresh login elsewhere or from the developer console -
+is then caught before the bot trades, not at the first failed SL order.
+
+The check runs in a background thread while the rest of startup (instrument
+dump, rules, state) proceeds. Results are cached in SESSION_CACHE_DIR under
+an fcntl lock, so several processes started together validate each token
+once. The cache stores a fingerprint of the token, never the token itself.
+
+Nothing here prompts for input: a missing, expired or rejected token raises
+SessionError with a status and the command that fixes it.
+"""
+
+# Validation outcomes
+VALID = "valid"
+MISSING = "missing"    # No token saved
+EXPIRED = "expired"    # Token saved on an earlier day
+REJECTED = "rejected"  # Kite refused the token (revoked, logged out elsewhere)
+ERROR = "error"        # Could not reach Kite to tell
+
+
+class SessionError(Exception):
+    """The session cannot be used; `status` says why"""
+
+    def __init__(self, status: str, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def token_fingerprint(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode()).hexdigest()[:16]
+
+
+def env_credentials() -> dict:
+    """Today's single-account credentials from .env, without prompting"""
+    if not config.API_KEY:
+        raise SessionError(MISSING, "API_KEY is not set in .env")
+    if not config.ACCESS_TOKEN or not config.ACCESS_TOKEN_DATE:
+        raise SessionError(MISSING, "No access token in .env - run: pdm run auth")
+    try:
+        token_date = datetime.datetime.strptime(config.ACCESS_TOKEN_DATE, '%Y-%m-%d').date()
+    except ValueError:
+        raise SessionError(EXPIRED, f"Bad ACCESS_TOKEN_DATE {config.ACCESS_TOKEN_DATE!r} - run: pdm run auth")
+    if token_date < datetime.datetime.now().date():
+        raise SessionError(EXPIRED, f"Access token from {token_date} has expired - run: pdm run auth")
+    return {"api_key": config.API_KEY, "access_token": config.ACCESS_TOKEN}
+
+
+def reload_env_token():
+    """Re-read ACCESS_TOKEN(_DATE) from .env - `pdm run auth` rewrites them every morning,
+    after this process loaded them"""
+    values = dotenv_values(find_dotenv())
+    for name in ("ACCESS_TOKEN", "ACCESS_TOKEN_DATE"):
+        if values.get(name):
+            setattr(config, name, values[name])
+
+
+class SessionCache:
+    """Validation results shared by every bot process on the machine
+
+    One file (and one lock) per account, so accounts validate in parallel
+    while processes checking the same account wait for each other.
+    """
+
+    def __init__(self, directory: str, ttl: float):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest()[:16])
+
+    @contextmanager
+    def locked(self, key: str):
+        """Hold an account's lock - other processes wait instead of validating too"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f"{self._path(key)}.lock", "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, key: str, fingerprint: str) -> Optional[dict]:
+        """A still-fresh validation of this exact token, if any (call under the lock)"""
+        entry = load_state(f"{self._path(key)}.json")
+        if entry.get("fingerprint") != fingerprint:
+            return None
+        if time.time() - entry.get("validated_at", 0) > self.ttl:
+            return None
+        return entry
+
+    def put(self, key: str, fingerprint: str, profile_user_id: str):
+        """Record a successful validation (call under the lock)"""
+        path = f"{self._path(key)}.json"
+        save_state({
+            "fingerprint": fingerprint,
+            "user_id": profile_user_id,
+            "validated_at": time.time(),
+        }, path)
+        os.chmod(path, 0o600)
+
+
+class SessionValidator:
+    """Validates one account's session in a background thread"""
+
+    def __init__(self, kite_client, cache: SessionCache = None, label: str = None):
+        self.kite_client = kite_client
+        self.cache = cache or SessionCache(config.SESSION_CACHE_DIR, config.SESSION_CACHE_TTL_SECONDS)
+        self.label = label or kite_client.user_id or "default"
+        self.auth_command = f"pdm run auth --account {kite_client.user_id}" if kite_client.user_id else "pdm run auth"
+        self.status: Optional[str] = None
+        self.error: Optional[SessionError] = None
+        self._done = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name=f"session-{self.label}", daemon=True).start()
+        return self
+
+    def _run(self):
+        try:
+            self.validate()
+        except SessionError as e:
+            self.error = e
+        except Exception as e:
+            self.error = SessionError(ERROR, f"Could not validate the session for {self.label}: {e}")
+        finally:
+            if self.error:
+                self.status = self.error.status
+            self._done.set()
+
+    def validate(self) -> str:
+        """Check the token against the cache, or with one profile() call"""
+        kite = self.kite_client.kite
+        key = f"{kite.api_key}:{self.kite_client.user_id or ''}"
+        fingerprint = token_fingerprint(kite.access_token)
+
+        with self.cache.locked(key):
+            if self.cache.get(key, fingerprint):
+                logger.info("🔑 Session for %s already validated by another process", self.label)
+                self.status = VALID
+                return VALID
+
+            try:
+                profile = self.kite_client.get_profile()
+            except TokenException as e:
+                raise SessionError(REJECTED, f"Kite rejected the access token for {self.label}: {e} - run: {self.auth_command}")
+            except Exception as e:
+                raise SessionError(ERROR, f"Could not validate the session for {self.label}: {e}")
+
+            if self.kite_client.user_id and profile.get("user_id") != self.kite_client.user_id:
+                raise SessionError(REJECTED, f"Access token for {self.label} belongs to {profile.get('user_id')}")
+
+            self.cache.put(key, fingerprint, profile.get("user_id"))
+
+        logger.info("🔑 Session for %s validated (%s)", self.label, profile.get('user_id'))
+        self.status = VALID
+        return VALID
+
+    def wait(self, timeout: float = None) -> str:
+        """Block until validation finishes; raise SessionError unless the session is valid"""
+        if not self._done.wait(timeout):
+            raise SessionError(ERROR, f"Session validation for {self.label} timed out")
+        if self.error:
+            raise self.error
+        return self.status
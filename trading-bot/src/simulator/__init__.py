@@ -0,0 +1,10 @@
+"""
+KITE SIMULATOR
+==============
+A local stand-in for Kite Connect, for end-to-end load tests without a live
+account. Serves the REST subset KiteClient uses, a WebSocket feed in the
+KiteTicker binary format, and order postbacks to the bot's /postback.
+
+Run it with scripts/kite_simulator.py and point the bot at it with
+KITE_API_ROOT / KITE_WS_ROOT.
+"""
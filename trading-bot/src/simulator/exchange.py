@@ -0,0 +1,432 @@
+import datetime
+import itertools
+import json
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from src.simulator.packets import nfo_token
+from src.utils.clock import SYSTEM_CLOCK
+from src.utils.rate_limiter import TokenBucket
+
+LOT_SIZE = 75
+TICK_SIZE = 0.05
+
+
+class SimError(Exception):
+    """An API error, reported to the client the way Kite reports it"""
+
+    def __init__(self, error_type: str, message: str, http_status: int = 400):
+        super().__init__(message)
+        self.error_type = error_type
+        self.http_status = http_status
+
+
+def _round_tick(price: float) -> float:
+    return max(TICK_SIZE, round(round(price / TICK_SIZE) * TICK_SIZE, 2))
+
+
+def _percentiles(samples) -> dict:
+    values = sorted(samples)
+    if not values:
+        return {}
+    pick = lambda pct: values[min(len(values) - 1, int(pct / 100.0 * len(values)))]
+    return {"p50_ms": round(pick(50) * 1000, 2), "p99_ms": round(pick(99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2), "samples": len(values)}
+
+
+class SimulatedExchange:
+    """Instruments, prices, an order book with SL matching, positions and per-key rate limits
+
+    Everything is seeded, so a run with the same arguments produces the same
+    prices and fills. Order events are handed to `on_order_update`, which the
+    server turns into postbacks.
+    """
+
+    def __init__(self, instruments: int = 200, seed: int = 1, volatility: float = 0.002,
+                 user_id: str = "SIM001", order_rate: float = 10, api_rate: float = 10,
+                 reject_rate: float = 0.0, on_order_update: Callable[[dict], None] = None, clock=None):
+        self.rng = random.Random(seed)
+        self.volatility = volatility
+        self.user_id = user_id
+        self.order_rate = order_rate
+        self.api_rate = api_rate
+        self.reject_rate = reject_rate
+        self.on_order_update = on_order_update or (lambda order: None)
+        self.clock = clock or SYSTEM_CLOCK  # Drives the per-key rate limits
+
+        expiry = datetime.date.today() + datetime.timedelta(days=(3 - datetime.date.today().weekday()) % 7)
+        code = expiry.strftime("%y") + expiry.strftime("%b").upper()
+        self.expiry = expiry
+        self.instruments: List[dict] = []
+        for i in range(instruments):
+            strike = 20000 + 50 * (i // 2)
+            kind = "CE" if i % 2 == 0 else "PE"
+            self.instruments.append({
+                "instrument_token": nfo_token(i + 1),
+                "tradingsymbol": f"NIFTY{code}{strike}{kind}",
+                "strike": float(strike),
+                "instrument_type": kind,
+                "price": _round_tick(self.rng.uniform(50, 300)),
+            })
+        self.by_symbol = {inst["tradingsymbol"]: inst for inst in self.instruments}
+        self.by_token = {inst["instrument_token"]: inst for inst in self.instruments}
+
+        self.orders: Dict[str, dict] = {}
+        self.pending_stops: Dict[int, Dict[str, dict]] = {}  # token -> order_id -> SL order
+        self.gtts: Dict[int, dict] = {}
+        self.pending_gtts: Dict[int, Dict[int, dict]] = {}  # token -> trigger id -> active GTT
+        self.positions: Dict[str, dict] = {}  # symbol -> net position
+        self.last_tick_at: Dict[int, float] = {}  # token -> perf_counter of the last tick sent
+        self._order_ids = itertools.count(1)
+        self._gtt_ids = itertools.count(1)
+        self._limiters: Dict[str, tuple] = {}
+        self._lock = threading.RLock()
+
+        self.counters = {name: 0 for name in (
+            "ticks", "orders_placed", "orders_modified", "orders_cancelled", "orders_rejected",
+            "gtt_placed", "gtt_modified", "gtt_deleted", "gtt_triggered",
+            "rate_limited", "fills", "postbacks_sent", "postbacks_failed")}
+        self.tick_to_modify = deque(maxlen=10000)  # Bot reaction time: last tick of a token -> modify
+        self.postback_latency = deque(maxlen=10000)
+        self.started_at = time.perf_counter()
+
+    # ------------------------------------------------------------------ limits
+
+    def check_rate(self, api_key: str, kind: str):
+        """Apply Kite's per-key budget: `order` for place/modify/cancel, `api` for the rest"""
+        with self._lock:
+            limiters = self._limiters.get(api_key)
+            if limiters is None:
+                limiters = (TokenBucket(self.order_rate, clock=self.clock.monotonic, sleep=self.clock.sleep),
+                            TokenBucket(self.api_rate, clock=self.clock.monotonic, sleep=self.clock.sleep))
+                self._limiters[api_key] = limiters
+        if not limiters[0 if kind == "order" else 1].try_acquire():
+            with self._lock:
+                self.counters["rate_limited"] += 1
+            raise SimError("NetworkException", "Too many requests", 429)
+
+    def _maybe_reject(self, what: str):
+        if self.reject_rate and self.rng.random() < self.reject_rate:
+            self.counters["orders_rejected"] += 1
+            raise SimError("InputException", f"Simulated rejection of {what}")
+
+    # ------------------------------------------------------------------ market data
+
+    def instrument_rows(self) -> List[dict]:
+        return [{
+            "instrument_token": inst["instrument_token"],
+            "exchange_token": inst["instrument_token"] >> 8,
+            "tradingsymbol": inst["tradingsymbol"],
+            "name": "NIFTY",
+            "last_price": inst["price"],
+            "expiry": self.expiry.isoformat(),
+            "strike": inst["strike"],
+            "tick_size": TICK_SIZE,
+            "lot_size": LOT_SIZE,
+            "instrument_type": inst["instrument_type"],
+            "segment": "NFO-OPT",
+            "exchange": "NFO",
+        } for inst in self.instruments]
+
+    def ltp(self, keys: List[str]) -> dict:
+        result = {}
+        with self._lock:
+            for key in keys:
+                inst = self.by_symbol.get(key.split(":", 1)[-1])
+                if inst:
+                    result[key] = {"instrument_token": inst["instrument_token"], "last_price": inst["price"]}
+        return result
+
+    def tick(self, token: int) -> Optional[float]:
+        """Move one instrument's price a random step and match its stop orders"""
+        with self._lock:
+            inst = self.by_token.get(token)
+            if inst is None:
+                return None
+            inst["price"] = _round_tick(inst["price"] * (1 + self.rng.gauss(0, self.volatility)))
+            self.counters["ticks"] += 1
+            self.last_tick_at[token] = time.perf_counter()
+            self._match(inst)
+            return inst["price"]
+
+    def _match(self, inst: dict):
+        self._match_gtts(inst)
+        stops = self.pending_stops.get(inst["instrument_token"])
+        if not stops:
+            return
+        price = inst["price"]
+        for order_id, order in list(stops.items()):
+            if order["status"] == "TRIGGER PENDING" and price <= order["trigger_price"]:
+                order["status"] = "OPEN"  # Triggered - now a limit sell
+            if order["status"] == "OPEN" and price >= order["price"]:
+                del stops[order_id]
+                self._fill(order, price)
+
+    def _match_gtts(self, inst: dict):
+        gtts = self.pending_gtts.get(inst["instrument_token"])
+        if not gtts:
+            return
+        price = inst["price"]
+        for trigger_id, gtt in list(gtts.items()):
+            triggers = gtt["condition"]["trigger_values"]
+            if gtt["type"] == "two-leg":
+                leg = 0 if price <= triggers[0] else 1 if price >= triggers[1] else None
+            else:
+                # Single leg: fires when the price crosses the trigger from where it was set
+                above = gtt["condition"]["last_price"] < triggers[0]
+                leg = 0 if (price >= triggers[0] if above else price <= triggers[0]) else None
+            if leg is None:
+                continue
+            del gtts[trigger_id]
+            gtt["status"] = "triggered"
+            self.counters["gtt_triggered"] += 1
+            # Kite places the leg as a regular LIMIT order. A sell limit the price
+            # has gapped through rests in the book until the price comes back
+            order = self._new_order({**gtt["orders"][leg], "order_type": "LIMIT"}, "OPEN")
+            if order["transaction_type"] == "SELL" and price < order["price"]:
+                self.pending_stops.setdefault(order["instrument_token"], {})[order["order_id"]] = order
+                self.on_order_update(dict(order))
+            else:
+                self._fill(order, price)
+
+    # ------------------------------------------------------------------ GTT
+
+    def _gtt_fields(self, params: dict) -> dict:
+        try:
+            condition = json.loads(params["condition"])
+            orders = json.loads(params["orders"])
+            gtt_type = params["type"]
+        except (KeyError, ValueError) as e:
+            raise SimError("InputException", f"Invalid GTT parameters: {e}")
+        symbol = condition.get("tradingsymbol")
+        if symbol not in self.by_symbol:
+            raise SimError("InputException", f"Unknown instrument: {symbol}")
+        triggers = condition.get("trigger_values") or []
+        if gtt_type == "two-leg":
+            if len(triggers) != 2 or len(orders) != 2:
+                raise SimError("InputException", "An OCO GTT needs two triggers and two orders")
+            if not triggers[0] < condition.get("last_price", 0) < triggers[1]:
+                raise SimError("InputException", "OCO triggers must be on either side of the last price")
+        elif gtt_type != "single" or len(triggers) != 1 or len(orders) != 1:
+            raise SimError("InputException", f"Invalid GTT type/triggers: {gtt_type}")
+        return {"type": gtt_type, "condition": condition, "orders": orders,
+                "instrument_token": self.by_symbol[symbol]["instrument_token"]}
+
+    def place_gtt(self, params: dict) -> int:
+        with self._lock:
+            self._maybe_reject("GTT placement")
+            gtt = {"id": next(self._gtt_ids), "user_id": self.user_id, "status": "active",
+                   **self._gtt_fields(params)}
+            self.gtts[gtt["id"]] = gtt
+            self.pending_gtts.setdefault(gtt["instrument_token"], {})[gtt["id"]] = gtt
+            self.counters["gtt_placed"] += 1
+            self._match(self.by_token[gtt["instrument_token"]])
+            return gtt["id"]
+
+    def modify_gtt(self, trigger_id: int, params: dict) -> int:
+        with self._lock:
+            gtt = self._active_gtt(trigger_id)
+            self._maybe_reject("GTT modification")
+            fields = self._gtt_fields(params)
+            if fields["instrument_token"] != gtt["instrument_token"]:
+                raise SimError("InputException", "A GTT cannot be moved to another instrument")
+            gtt.update(fields)
+            self.counters["gtt_modified"] += 1
+            tick_at = self.last_tick_at.get(gtt["instrument_token"])
+            if tick_at:
+                self.tick_to_modify.append(time.perf_counter() - tick_at)
+            self._match(self.by_token[gtt["instrument_token"]])
+            return trigger_id
+
+    def delete_gtt(self, trigger_id: int) -> int:
+        with self._lock:
+            gtt = self._active_gtt(trigger_id)
+            gtt["status"] = "deleted"
+            self.pending_gtts.get(gtt["instrument_token"], {}).pop(trigger_id, None)
+            self.counters["gtt_deleted"] += 1
+            return trigger_id
+
+    def _active_gtt(self, trigger_id: int) -> dict:
+        gtt = self.gtts.get(trigger_id)
+        if gtt is None:
+            raise SimError("InputException", f"Unknown GTT: {trigger_id}")
+        if gtt["status"] != "active":
+            raise SimError("InputException", f"GTT {trigger_id} is already {gtt['status']}")
+        return gtt
+
+    def gtts_list(self) -> List[dict]:
+        with self._lock:
+            return [{k: v for k, v in gtt.items() if k != "instrument_token"} for gtt in self.gtts.values()]
+
+    # ------------------------------------------------------------------ orders
+
+    def _new_order(self, params: dict, status: str) -> dict:
+        symbol = params.get("tradingsymbol")
+        if symbol not in self.by_symbol:
+            raise SimError("InputException", f"Unknown instrument: {symbol}")
+        order = {
+            "order_id": f"SIM{next(self._order_ids):010d}",
+            "user_id": self.user_id,
+            "status": status,
+            "tradingsymbol": symbol,
+            "exchange": params.get("exchange", "NFO"),
+            "instrument_token": self.by_symbol[symbol]["instrument_token"],
+            "transaction_type": params.get("transaction_type"),
+            "order_type": params.get("order_type"),
+            "product": params.get("product", "MIS"),
+            "variety": params.get("variety", "regular"),
+            "quantity": int(params.get("quantity", 0)),
+            "price": float(params.get("price") or 0),
+            "trigger_price": float(params.get("trigger_price") or 0),
+            "average_price": 0.0,
+            "filled_quantity": 0,
+            "order_timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self.orders[order["order_id"]] = order
+        return order
+
+    def place_order(self, params: dict) -> str:
+        with self._lock:
+            self._maybe_reject("order placement")
+            if int(params.get("quantity", 0)) <= 0:
+                raise SimError("InputException", "Quantity must be positive")
+            order_type = params.get("order_type")
+            if order_type in ("SL", "SL-M"):
+                order = self._new_order(params, "TRIGGER PENDING")
+                if order_type == "SL-M":
+                    order["price"] = 0.0
+                self.pending_stops.setdefault(order["instrument_token"], {})[order["order_id"]] = order
+            elif order_type in ("MARKET", "LIMIT"):
+                order = self._new_order(params, "OPEN")
+                self._fill(order, self.by_symbol[order["tradingsymbol"]]["price"])
+            else:
+                raise SimError("InputException", f"Unsupported order_type: {order_type}")
+            self.counters["orders_placed"] += 1
+            return order["order_id"]
+
+    def modify_order(self, order_id: str, params: dict) -> str:
+        with self._lock:
+            order = self._open_order(order_id)
+            self._maybe_reject("order modification")
+            for field in ("trigger_price", "price"):
+                if params.get(field) is not None:
+                    order[field] = float(params[field])
+            if params.get("quantity"):
+                order["quantity"] = int(params["quantity"])
+            self.counters["orders_modified"] += 1
+            tick_at = self.last_tick_at.get(order["instrument_token"])
+            if tick_at:
+                self.tick_to_modify.append(time.perf_counter() - tick_at)
+            # A stop moved above the market triggers straight away
+            self._match(self.by_token[order["instrument_token"]])
+            return order_id
+
+    def cancel_order(self, order_id: str) -> str:
+        with self._lock:
+            order = self._open_order(order_id)
+            order["status"] = "CANCELLED"
+            self.pending_stops.get(order["instrument_token"], {}).pop(order_id, None)
+            self.counters["orders_cancelled"] += 1
+        self.on_order_update(dict(order))
+        return order_id
+
+    def _open_order(self, order_id: str) -> dict:
+        order = self.orders.get(order_id)
+        if order is None:
+            raise SimError("InputException", f"Unknown order: {order_id}")
+        if order["status"] not in ("OPEN", "TRIGGER PENDING"):
+            raise SimError("InputException", f"Order {order_id} is already {order['status']}")
+        return order
+
+    def _fill(self, order: dict, price: float):
+        order["status"] = "COMPLETE"
+        order["average_price"] = price
+        order["filled_quantity"] = order["quantity"]
+        sign = 1 if order["transaction_type"] == "BUY" else -1
+        position = self.positions.setdefault(order["tradingsymbol"], {
+            "tradingsymbol": order["tradingsymbol"], "exchange": order["exchange"],
+            "instrument_token": order["instrument_token"], "product": order["product"],
+            "quantity": 0, "buy_value": 0.0, "sell_value": 0.0,
+        })
+        position["quantity"] += sign * order["quantity"]
+        position["buy_value" if sign > 0 else "sell_value"] += price * order["quantity"]
+        self.counters["fills"] += 1
+        self.on_order_update(dict(order))
+
+    def new_day(self):
+        """Start the next session's order book - orders no longer open stay with the day they were in"""
+        with self._lock:
+            self.orders = {order_id: order for order_id, order in self.orders.items()
+                           if order["status"] in ("OPEN", "TRIGGER PENDING")}
+
+    def orders_list(self) -> List[dict]:
+        with self._lock:
+            return [dict(order) for order in self.orders.values()]
+
+    def positions_book(self) -> dict:
+        with self._lock:
+            net = []
+            for position in self.positions.values():
+                inst = self.by_symbol[position["tradingsymbol"]]
+                net.append({**position, "last_price": inst["price"],
+                            "pnl": position["sell_value"] - position["buy_value"] + position["quantity"] * inst["price"]})
+            return {"net": net, "day": [dict(p) for p in net]}
+
+    def profile(self) -> dict:
+        return {"user_id": self.user_id, "user_name": "Simulated Trader", "exchanges": ["NFO"],
+                "products": ["MIS", "NRML", "CNC"], "order_types": ["MARKET", "LIMIT", "SL", "SL-M"]}
+
+    # ------------------------------------------------------------------ trader
+
+    def open_position(self, quantity: int = LOT_SIZE, product: str = "MIS") -> Optional[str]:
+        """Simulate a manual BUY at market on a flat instrument (the bot's trigger to start trailing)"""
+        with self._lock:
+            flat = [inst["tradingsymbol"] for inst in self.instruments
+                    if self.positions.get(inst["tradingsymbol"], {}).get("quantity", 0) == 0]
+            if not flat:
+                return None
+            symbol = self.rng.choice(flat)
+            self.place_order({"tradingsymbol": symbol, "exchange": "NFO", "transaction_type": "BUY",
+                              "order_type": "MARKET", "quantity": quantity, "product": product})
+            return symbol
+
+    def close_position(self, symbol: str) -> Optional[str]:
+        """Simulate a manual SELL at market of a whole position, leaving any stop on it in place"""
+        with self._lock:
+            quantity = self.positions.get(symbol, {}).get("quantity", 0)
+            if quantity <= 0:
+                return None
+            position = self.positions[symbol]
+            return self.place_order({"tradingsymbol": symbol, "exchange": "NFO", "transaction_type": "SELL",
+                                     "order_type": "MARKET", "quantity": quantity, "product": position["product"]})
+
+    def open_positions(self) -> int:
+        with self._lock:
+            return sum(1 for position in self.positions.values() if position["quantity"] > 0)
+
+    def record_postback(self, latency: Optional[float]):
+        """Count a delivered (latency in seconds) or failed (None) postback"""
+        with self._lock:
+            if latency is None:
+                self.counters["postbacks_failed"] += 1
+            else:
+                self.counters["postbacks_sent"] += 1
+                self.postback_latency.append(latency)
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self.started_at
+        with self._lock:
+            counters = dict(self.counters)
+            tick_to_modify = list(self.tick_to_modify)
+            postback_latency = list(self.postback_latency)
+            open_positions = self.open_positions()
+        return {
+            "elapsed_seconds": round(elapsed, 1),
+            "ticks_per_second": round(counters["ticks"] / elapsed, 1) if elapsed else 0.0,
+            "open_positions": open_positions,
+            **counters,
+            "tick_to_modify": _percentiles(tick_to_modify),
+            "postback_latency": _percentiles(postback_latency),
+        }
@@ -0,0 +1,241 @@
+import datetime
+import logging
+from collections import Counter
+from typing import Dict, List, Optional
+from kiteconnect import KiteConnect
+from kiteconnect import exceptions as kite_exceptions
+from src.bot import DynamicTradingBot
+from src.instruments import InstrumentCache
+from src.kite_client import KiteClient
+from src.simulator.exchange import LOT_SIZE, SimError, SimulatedExchange
+from src.utils.clock import VirtualClock
+
+logger = logging.getLogger(__name__)
+
+"""
+VIRTUAL-TIME HARNESS
+====================
+Runs the real DynamicTradingBot - strategies, TrailingSL throttling, rate
+limiters, WebSocket reconnects - against SimulatedExchange in one thread,
+with every clock replaced by a VirtualClock. Nothing sleeps: a reconnect's
+10 s back-off or a THROTTLE_SECONDS window is just the clock moving, so a
+whole trading day runs in well under a second and, for a given seed,
+produces the same orders every time.
+
+The bot talks to the exchange through an unmodified KiteClient whose
+KiteConnect sends requests to the exchange in-process instead of over HTTP,
+and gets ticks from a VirtualTicker the harness drives.
+"""
+
+MARKET_OPEN = datetime.time(9, 15)
+TRADING_DAY_SECONDS = 6 * 3600 + 15 * 60  # 09:15 - 15:30
+
+
+class InProcessKite(KiteConnect):
+    """KiteConnect whose requests are answered by a SimulatedExchange directly
+
+    Only the transport is replaced - argument handling, GTT payloads and the
+    exception types the bot sees are kiteconnect's own.
+    """
+
+    def __init__(self, exchange: SimulatedExchange, clock):
+        super().__init__(api_key="sim")
+        self.set_access_token("sim")
+        self.exchange = exchange
+        self.clock = clock
+        self.calls = Counter()  # route -> count
+        self.order_log: List[tuple] = []  # (virtual time, route, order or trigger id)
+
+    def instruments(self, exchange=None):
+        # Rows as the CSV parser would return them - the bot only reads symbol and token
+        return self.exchange.instrument_rows() if exchange in (None, "NFO") else []
+
+    def _request(self, route, method, url_args=None, params=None, is_json=False, query_params=None):
+        url_args = url_args or {}
+        params = params or {}
+        self.calls[route] += 1
+        try:
+            placing = route.startswith(("order.", "gtt.")) and method != "GET"
+            self.exchange.check_rate(self.api_key, "order" if placing else "api")
+            result = self._dispatch(route, url_args, params)
+        except SimError as e:
+            exception = getattr(kite_exceptions, e.error_type, kite_exceptions.GeneralException)
+            raise exception(str(e), code=e.http_status)
+        if placing:
+            self.order_log.append((self.clock.time(), route, url_args.get("order_id") or url_args.get("trigger_id")))
+        return result
+
+    def _dispatch(self, route, url_args, params):
+        exchange = self.exchange
+        if route == "user.profile":
+            return exchange.profile()
+        if route == "market.quote.ltp":
+            keys = params.get("i")
+            return exchange.ltp(keys if isinstance(keys, list) else [keys])
+        if route == "portfolio.positions":
+            return exchange.positions_book()
+        if route == "orders":
+            return exchange.orders_list()
+        if route == "order.place":
+            return {"order_id": exchange.place_order({**params, "variety": url_args["variety"]})}
+        if route == "order.modify":
+            return {"order_id": exchange.modify_order(url_args["order_id"], params)}
+        if route == "order.cancel":
+            return {"order_id": exchange.cancel_order(url_args["order_id"])}
+        if route == "gtt":
+            return exchange.gtts_list()
+        if route == "gtt.place":
+            return {"trigger_id": exchange.place_gtt(params)}
+        if route == "gtt.modify":
+            return {"trigger_id": exchange.modify_gtt(int(url_args["trigger_id"]), params)}
+        if route == "gtt.delete":
+            return {"trigger_id": exchange.delete_gtt(int(url_args["trigger_id"]))}
+        raise SimError("GeneralException", f"Route {route} is not simulated", 404)
+
+
+class VirtualTicker:
+    """KiteTicker stand-in: the harness pushes ticks and drops connections"""
+
+    MODE_LTP = "ltp"
+    MODE_QUOTE = "quote"
+    MODE_FULL = "full"
+
+    def __init__(self, api_key, access_token, root=None):
+        self.connected = False
+        self.modes: Dict[int, str] = {}  # Subscribed token -> mode
+        self.on_ticks = self.on_connect = self.on_error = self.on_close = None
+
+    def connect(self, threaded=False):
+        self.connected = True
+        if self.on_connect:
+            self.on_connect(self, None)
+
+    def subscribe(self, tokens):
+        for token in tokens:
+            self.modes.setdefault(token, self.MODE_QUOTE)
+
+    def unsubscribe(self, tokens):
+        for token in tokens:
+            self.modes.pop(token, None)
+
+    def set_mode(self, mode, tokens):
+        for token in tokens:
+            if token in self.modes:
+                self.modes[token] = mode
+
+    def close(self, code=None, reason=None):
+        self.drop(code or 1000, reason or "closed")
+
+    def drop(self, code=1006, reason="connection lost"):
+        """Lose the connection the way the network would, with on_close"""
+        if not self.connected:
+            return
+        self.connected = False
+        if self.on_close:
+            self.on_close(self, code, reason)
+
+
+class TradingDaySimulation:
+    """Drives one bot through simulated market hours in virtual time"""
+
+    def __init__(self, state_file: str, seed: int = 1, instruments: int = 100, volatility: float = 0.001,
+                 product: str = "MIS", day: datetime.date = None):
+        day = day or datetime.date.today()
+        self.clock = VirtualClock(datetime.datetime.combine(day, MARKET_OPEN).timestamp())
+        self.started_at = self.clock.time()
+        self.product = product
+        self.exchange = SimulatedExchange(instruments=instruments, seed=seed, volatility=volatility,
+                                          user_id="SIM001", clock=self.clock, on_order_update=self._postback)
+        self.exchange.order_rate = self.exchange.api_rate = 10
+
+        client = KiteClient("sim", "sim", user_id="SIM001", clock=self.clock)
+        client.kite = InProcessKite(self.exchange, self.clock)
+        self.kite = client.kite
+        self.tickers: List[VirtualTicker] = []
+        self.bot = DynamicTradingBot(kite_client=client, state_file=state_file, instruments=InstrumentCache(),
+                                     user_id="SIM001", clock=self.clock, ticker_factory=self._new_ticker)
+        self.bot.instruments.load(client, "NFO")
+        self.ticks_sent = 0
+
+    def _new_ticker(self, api_key, access_token, root=None):
+        ticker = VirtualTicker(api_key, access_token, root)
+        self.tickers.append(ticker)
+        return ticker
+
+    @property
+    def ticker(self) -> Optional[VirtualTicker]:
+        return self.tickers[-1] if self.tickers else None
+
+    def _postback(self, order: dict):
+        # Delivered synchronously - in virtual time a postback takes no time
+        self.bot.handle_order_update(order)
+
+    def keep_open(self, positions: int):
+        """Play the manual trader: buy until the bot is trailing `positions` positions
+
+        Counts the bot's positions, not the exchange's - a stop whose limit the
+        price gapped through leaves the position open at the exchange after the
+        bot has let it go.
+        """
+        for _ in range(max(0, positions - len(self.bot.active_positions))):
+            if not self.exchange.open_position(LOT_SIZE, self.product):
+                break
+
+    def close_one(self) -> Optional[str]:
+        """Play the manual trader: sell one of the bot's positions by hand in Kite"""
+        for symbol in sorted(self.bot.active_positions):
+            if self.exchange.close_position(symbol):
+                return symbol
+        return None
+
+    def run(self, seconds: float = TRADING_DAY_SECONDS, tick_interval: float = 1.0, positions: int = 5,
+            disconnect_every: float = 0.0, close_every: float = 0.0) -> dict:
+        """Tick every subscribed token each `tick_interval` for `seconds` of virtual time"""
+        end = self.clock.time() + seconds
+        next_drop = self.clock.time() + disconnect_every if disconnect_every else None
+        next_close = self.clock.time() + close_every if close_every else None
+        while self.clock.time() < end:
+            self.clock.advance(tick_interval)
+            if next_close is not None and self.clock.time() >= next_close:
+                next_close += close_every
+                self.close_one()
+            self.keep_open(positions)
+            self.bot.lifecycle.step()
+            ticker = self.ticker
+            if ticker is None or not ticker.connected:
+                continue
+            if next_drop is not None and self.clock.time() >= next_drop:
+                next_drop += disconnect_every
+                ticker.drop()  # The bot backs off (virtually) and reconnects
+                continue
+            ticks = []
+            for token, mode in list(ticker.modes.items()):
+                price = self.exchange.tick(token)  # May fill a stop - the postback lands right here
+                ticks.append({"instrument_token": token, "last_price": price, "mode": mode})
+            if ticks and ticker.connected and ticker.on_ticks:
+                self.ticks_sent += len(ticks)
+                ticker.on_ticks(ticker, ticks)
+        return self.stats()
+
+    def next_day(self):
+        """Jump to the next day's open, with a fresh order book and order log as after a night"""
+        day = datetime.datetime.fromtimestamp(self.clock.time()).date() + datetime.timedelta(days=1)
+        self.clock.advance(datetime.datetime.combine(day, MARKET_OPEN).timestamp() - self.clock.time())
+        self.exchange.new_day()
+        self.kite.order_log.clear()
+
+    def stats(self) -> dict:
+        counters = self.exchange.counters
+        return {
+            "virtual_seconds": round(self.clock.time() - self.started_at, 1),
+            "ticks": self.ticks_sent,
+            "connections": len(self.tickers),
+            "positions_open": len(self.bot.active_positions),
+            "orders_placed": counters["orders_placed"],
+            "orders_modified": counters["orders_modified"],
+            "orders_cancelled": counters["orders_cancelled"],
+            "fills": counters["fills"],
+            "rate_limited": counters["rate_limited"],
+            "api_calls": dict(self.kite.calls),
+        }
+
@@ -0,0 +1,83 @@
+import struct
+import time
+from typing import Iterable, List, Optional
+
+"""
+Encoder for KiteTicker binary messages (the inverse of KiteTicker._parse_binary).
+
+A message is a big-endian uint16 packet count followed by uint16-length-
+prefixed packets. Prices are integers in paise for NSE/NFO. Packet sizes
+select the mode: 8 bytes LTP, 44 quote, 184 full (with timestamps and five
+levels of depth on each side).
+"""
+
+MODE_LTP = "ltp"
+MODE_QUOTE = "quote"
+MODE_FULL = "full"
+
+NFO_SEGMENT = 2  # Low byte of every NFO instrument token
+PRICE_DIVISOR = 100
+
+DEPTH_LEVELS = 5
+
+_LTP = struct.Struct(">II")
+_QUOTE = struct.Struct(">IIIIIIIIIII")
+_FULL_EXTRA = struct.Struct(">IIIII")
+_DEPTH_ENTRY = struct.Struct(">IIHxx")
+
+
+def nfo_token(index: int) -> int:
+    """Instrument token for the index-th simulated NFO contract"""
+    return (index << 8) | NFO_SEGMENT
+
+
+def _paise(price: float) -> int:
+    return int(round(price * PRICE_DIVISOR))
+
+
+def encode_tick(token: int, ltp: float, mode: str = MODE_LTP, timestamp: Optional[float] = None,
+                depth: Optional[dict] = None, volume: int = 0, ohlc: Optional[tuple] = None) -> bytes:
+    """One tick packet in the given mode"""
+    if mode == MODE_LTP:
+        return _LTP.pack(token, _paise(ltp))
+
+    open_, high, low, close = ohlc or (ltp, ltp, ltp, ltp)
+    packet = _QUOTE.pack(
+        token, _paise(ltp),
+        1,                                # last traded quantity
+        _paise(ltp),                      # average traded price
+        volume, 0, 0,                     # volume, total buy/sell quantity
+        _paise(open_), _paise(high), _paise(low), _paise(close),
+    )
+    if mode == MODE_QUOTE:
+        return packet
+
+    ts = int(timestamp if timestamp is not None else time.time())
+    packet += _FULL_EXTRA.pack(ts, 0, 0, 0, ts)  # last trade time, OI, OI high/low, exchange time
+    depth = depth or {}
+    for side in ("buy", "sell"):
+        levels = list(depth.get(side, []))[:DEPTH_LEVELS]
+        levels += [(0.0, 0, 0)] * (DEPTH_LEVELS - len(levels))
+        for price, quantity, orders in levels:
+            packet += _DEPTH_ENTRY.pack(quantity, _paise(price), orders)
+    return packet
+
+
+def encode_message(packets: List[bytes]) -> bytes:
+    """Frame tick packets into one binary WebSocket message"""
+    parts = [struct.pack(">H", len(packets))]
+    for packet in packets:
+        parts.append(struct.pack(">H", len(packet)))
+        parts.append(packet)
+    return b"".join(parts)
+
+
+def heartbeat() -> bytes:
+    """Kite's 1-byte keepalive, ignored by the client's parser"""
+    return b"\x00"
+
+
+def encode_ticks(ticks: Iterable[tuple]) -> bytes:
+    """Encode (token, ltp, mode, timestamp, depth) tuples into a message"""
+    return encode_message([encode_tick(token, ltp, mode, timestamp, depth)
+                           for token, ltp, mode, timestamp, depth in ticks])
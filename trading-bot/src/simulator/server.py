@@ -0,0 +1,378 @@
+import asyncio
+import base64
+import csv
+import hashlib
+import io
+import json
+import logging
+import queue
+import random
+import struct
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+from flask import Flask, Response, jsonify, request
+from src.simulator.exchange import SimError, SimulatedExchange
+from src.simulator.packets import MODE_FULL, MODE_LTP, MODE_QUOTE, encode_message, encode_tick, heartbeat
+
+logger = logging.getLogger(__name__)
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_INSTRUMENT_COLUMNS = ["instrument_token", "exchange_token", "tradingsymbol", "name", "last_price", "expiry",
+                       "strike", "tick_size", "lot_size", "instrument_type", "segment", "exchange"]
+
+
+# ---------------------------------------------------------------------- REST
+
+def create_rest_app(exchange: SimulatedExchange, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                    seed: int = 1) -> Flask:
+    """Flask app answering the Kite Connect v3 routes KiteClient calls"""
+    app = Flask("kite_simulator")
+    jitter = random.Random(seed)
+    jitter_lock = threading.Lock()
+
+    def api_key():
+        # "Authorization: token api_key:access_token"
+        auth = request.headers.get("Authorization", "")
+        return auth.split(" ", 1)[-1].split(":", 1)[0]
+
+    def ok(data):
+        return jsonify({"status": "success", "data": data})
+
+    @app.errorhandler(SimError)
+    def sim_error(e):
+        return jsonify({"status": "error", "error_type": e.error_type, "message": str(e)}), e.http_status
+
+    @app.before_request
+    def before():
+        if request.path.startswith("/sim/"):
+            return None
+        if not request.headers.get("Authorization", "").startswith("token "):
+            raise SimError("TokenException", "Missing or invalid access token", 403)
+        if latency_ms or jitter_ms:
+            with jitter_lock:
+                delay = latency_ms + jitter.uniform(0, jitter_ms)
+            time.sleep(delay / 1000.0)
+        placing = request.path.startswith(("/orders/", "/gtt/")) and request.method != "GET"
+        kind = "order" if placing else "api"
+        exchange.check_rate(api_key(), kind)
+        return None
+
+    @app.route("/user/profile")
+    def profile():
+        return ok(exchange.profile())
+
+    @app.route("/instruments")
+    @app.route("/instruments/<exchange_name>")
+    def instruments(exchange_name="NFO"):
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=_INSTRUMENT_COLUMNS)
+        writer.writeheader()
+        if exchange_name == "NFO":
+            writer.writerows(exchange.instrument_rows())
+        return Response(out.getvalue(), mimetype="text/csv")
+
+    @app.route("/quote/ltp")
+    def ltp():
+        return ok(exchange.ltp(request.args.getlist("i")))
+
+    @app.route("/orders")
+    def orders():
+        return ok(exchange.orders_list())
+
+    @app.route("/portfolio/positions")
+    def positions():
+        return ok(exchange.positions_book())
+
+    @app.route("/orders/<variety>", methods=["POST"])
+    def place(variety):
+        params = {**request.form.to_dict(), "variety": variety}
+        return ok({"order_id": exchange.place_order(params)})
+
+    @app.route("/orders/<variety>/<order_id>", methods=["PUT"])
+    def modify(variety, order_id):
+        return ok({"order_id": exchange.modify_order(order_id, request.form.to_dict())})
+
+    @app.route("/orders/<variety>/<order_id>", methods=["DELETE"])
+    def cancel(variety, order_id):
+        return ok({"order_id": exchange.cancel_order(order_id)})
+
+    @app.route("/gtt/triggers", methods=["GET"])
+    def gtts():
+        return ok(exchange.gtts_list())
+
+    @app.route("/gtt/triggers", methods=["POST"])
+    def place_gtt():
+        return ok({"trigger_id": exchange.place_gtt(request.form.to_dict())})
+
+    @app.route("/gtt/triggers/<int:trigger_id>", methods=["PUT"])
+    def modify_gtt(trigger_id):
+        return ok({"trigger_id": exchange.modify_gtt(trigger_id, request.form.to_dict())})
+
+    @app.route("/gtt/triggers/<int:trigger_id>", methods=["DELETE"])
+    def delete_gtt(trigger_id):
+        return ok({"trigger_id": exchange.delete_gtt(trigger_id)})
+
+    # Simulator control - not part of the Kite API
+    @app.route("/sim/stats")
+    def stats():
+        return jsonify(exchange.stats())
+
+    @app.route("/sim/open", methods=["POST"])
+    def open_positions():
+        count = int(request.args.get("count", 1))
+        return jsonify({"opened": [s for s in (exchange.open_position() for _ in range(count)) if s]})
+
+    return app
+
+
+# ---------------------------------------------------------------------- postbacks
+
+class PostbackSender:
+    """Delivers order updates to the bot's /postback from a small worker pool"""
+
+    def __init__(self, url: str, exchange: SimulatedExchange, workers: int = 4, timeout: float = 10.0):
+        self.url = url
+        self.exchange = exchange
+        self.timeout = timeout
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self._threads = [threading.Thread(target=self._worker, name=f"postback-{i}", daemon=True)
+                         for i in range(workers)]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def send(self, order: dict):
+        """Queue an order update (called with the exchange lock held - never blocks)"""
+        self._queue.put(order)
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+
+    def _worker(self):
+        while True:
+            order = self._queue.get()
+            if order is None:
+                return
+            body = json.dumps(order).encode()
+            req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                    response.read()
+                self.exchange.record_postback(time.perf_counter() - start)
+            except (urllib.error.URLError, OSError) as e:
+                logger.warning("Postback for %s failed: %s", order.get("order_id"), e)
+                self.exchange.record_postback(None)
+
+
+# ---------------------------------------------------------------------- WebSocket ticker
+
+class _Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.modes: Dict[int, str] = {}  # Subscribed token -> mode
+
+    async def send_binary(self, payload: bytes):
+        self.writer.write(_frame(0x2, payload))
+        await self.writer.drain()
+
+
+def _frame(opcode: int, payload: bytes) -> bytes:
+    """A single unmasked server frame"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack(">BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+class TickerServer:
+    """Minimal RFC 6455 server speaking the KiteTicker protocol
+
+    Clients subscribe with {"a": "subscribe", "v": [tokens]} and pick a mode
+    with {"a": "mode", "v": [mode, [tokens]]}. Every 1/packet_hz seconds each
+    subscribed token moves `ticks_per_packet` times and every client gets one
+    binary message with its tokens' ticks in the mode it asked for.
+    """
+
+    def __init__(self, exchange: SimulatedExchange, host: str = "127.0.0.1", port: int = 8765,
+                 packet_hz: float = 10.0, ticks_per_packet: int = 1):
+        self.exchange = exchange
+        self.host = host
+        self.port = port
+        self.packet_hz = packet_hz
+        self.ticks_per_packet = ticks_per_packet
+        self.connections = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.ready = threading.Event()
+        self._server = None
+        self._feed_task = None
+        self._stopped: Optional[threading.Event] = None
+
+    def start(self):
+        threading.Thread(target=self._run, name="sim-ticker", daemon=True).start()
+        self.ready.wait(5)
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        if self.loop and self._stopped is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+            self._stopped.wait(timeout)
+
+    async def _shutdown(self):
+        self._feed_task.cancel()
+        self._server.close()
+        for connection in list(self.connections):
+            connection.writer.close()
+        await self._server.wait_closed()
+        self.loop.stop()
+
+    def _run(self):
+        self._stopped = threading.Event()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._server = self.loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._feed_task = self.loop.create_task(self._feed())
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            # Let cancelled connection handlers finish before closing the loop
+            pending = [task for task in asyncio.all_tasks(self.loop) if not task.done()]
+            for task in pending:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.loop.close()
+            self._stopped.set()
+
+    async def _handshake(self, reader, writer) -> bool:
+        request_bytes = await reader.readuntil(b"\r\n\r\n")
+        lines = request_bytes.decode("latin-1").split("\r\n")
+        path = lines[0].split(" ")[1] if len(lines[0].split(" ")) > 1 else "/"
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        query = parse_qs(urlparse(path).query)
+        if not query.get("api_key") or not query.get("access_token"):
+            writer.write(b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+            return False
+
+        accept = base64.b64encode(hashlib.sha1((headers.get("sec-websocket-key", "") + _WS_GUID).encode()).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\n"
+                     b"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        await writer.drain()
+        return True
+
+    async def _read_frame(self, reader):
+        first, second = await reader.readexactly(2)
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", await reader.readexactly(8))[0]
+        mask = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return opcode, payload
+
+    async def _handle(self, reader, writer):
+        try:
+            if not await self._handshake(reader, writer):
+                writer.close()
+                return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+
+        connection = _Connection(reader, writer)
+        self.connections.add(connection)
+        try:
+            while True:
+                opcode, payload = await self._read_frame(reader)
+                if opcode == 0x8:  # Close
+                    writer.write(_frame(0x8, payload[:2]))
+                    await writer.drain()
+                    break
+                if opcode == 0x9:  # Ping
+                    writer.write(_frame(0xA, payload))
+                    await writer.drain()
+                elif opcode == 0x1:
+                    self._on_text(connection, payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections.discard(connection)
+            writer.close()
+
+    def _on_text(self, connection: _Connection, payload: bytes):
+        try:
+            message = json.loads(payload)
+            action, value = message["a"], message["v"]
+        except (ValueError, KeyError, TypeError):
+            return
+        if action == "subscribe":
+            for token in value:
+                connection.modes.setdefault(int(token), MODE_QUOTE)  # Kite's default mode
+        elif action == "unsubscribe":
+            for token in value:
+                connection.modes.pop(int(token), None)
+        elif action == "mode":
+            mode, tokens = value
+            if mode in (MODE_LTP, MODE_QUOTE, MODE_FULL):
+                for token in tokens:
+                    if int(token) in connection.modes:
+                        connection.modes[int(token)] = mode
+
+    def _depth(self, ltp: float) -> dict:
+        step = 0.05
+        return {"buy": [(round(ltp - step * (i + 1), 2), 75 * (i + 1), i + 1) for i in range(5)],
+                "sell": [(round(ltp + step * (i + 1), 2), 75 * (i + 1), i + 1) for i in range(5)]}
+
+    async def _feed(self):
+        interval = 1.0 / self.packet_hz
+        next_at = time.perf_counter()
+        idle = 0
+        while True:
+            next_at += interval
+            tokens = set()
+            for connection in list(self.connections):
+                tokens.update(connection.modes)
+
+            # Several moves per token per packet exercise the bot's conflation
+            moves = {token: [self.exchange.tick(token) for _ in range(self.ticks_per_packet)] for token in tokens}
+            now = time.time()
+            for connection in list(self.connections):
+                packets = []
+                for token, mode in connection.modes.items():
+                    for ltp in moves.get(token, ()):
+                        if ltp is not None:
+                            depth = self._depth(ltp) if mode == MODE_FULL else None
+                            packets.append(encode_tick(token, ltp, mode, now, depth))
+                try:
+                    if packets:
+                        await connection.send_binary(encode_message(packets))
+                    elif idle % int(self.packet_hz or 1) == 0:
+                        await connection.send_binary(heartbeat())
+                except ConnectionError:
+                    self.connections.discard(connection)
+            idle += 1
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
@@ -0,0 +1,35 @@
+from src.strategies.base import Decision, Strategy
+
+
+class AtrTrail(Strategy):
+    """SL trails the highest LTP by a multiple of an average-true-range estimate
+
+    The feed carries LTPs, not bars, so the range is an exponential moving
+    average of absolute tick-to-tick moves over `atr_period` ticks.
+    """
+
+    name = "atr_trail"
+
+    def evaluate(self, positions, ltps, now):
+        decisions = []
+        for position, ltp in zip(positions, ltps):
+            params = position['params']
+            state = position['strategy_state']
+
+            last = state.get('last', ltp)
+            alpha = 2.0 / (params['atr_period'] + 1)
+            atr = state.get('atr')
+            move = abs(ltp - last)
+            atr = move if atr is None else atr + alpha * (move - atr)
+            high = max(state.get('high', ltp), ltp)
+            ticks = state.get('ticks', 0) + 1
+            state.update(last=ltp, atr=atr, high=high, ticks=ticks)
+
+            # Wait for the average to warm up before trusting it
+            if ticks < params['atr_period']:
+                continue
+
+            new_sl = high - params['atr_multiplier'] * atr
+            if new_sl > position['sl_trigger']:
+                decisions.append(Decision(position['symbol'], "modify", new_sl, "atr_trail"))
+        return decisions
@@ -0,0 +1,24 @@
+from collections import namedtuple
+
+# What a strategy wants done with one position:
+#   action "modify" - move the SL trigger up to `sl`
+#   action "exit"   - close the position at market
+# `reason` is informational except "first_target", which also marks the
+# position's first target as hit.
+Decision = namedtuple("Decision", ["symbol", "action", "sl", "reason"])
+
+
+class Strategy:
+    """Base class for SL strategies
+
+    A strategy is evaluated once per tick batch for every position that uses
+    it, never once per position. It must be pure with respect to the outside
+    world - no broker calls, no wall-clock reads - so the same code runs live
+    and in offline replay. Per-position memory goes in position['strategy_state'].
+    """
+
+    name = None
+
+    def evaluate(self, positions, ltps, now):
+        """Return a list of Decisions for the positions (parallel to ltps)"""
+        raise NotImplementedError
@@ -0,0 +1,54 @@
+from typing import Dict, List, Tuple
+from src.strategies.atr_trail import AtrTrail
+from src.strategies.base import Decision, Strategy
+from src.strategies.percent_trail import PercentTrail
+from src.strategies.target_trail import BreakevenAfter, TargetTrail, TimeExit
+
+STRATEGIES: Dict[str, Strategy] = {
+    strategy.name: strategy
+    for strategy in (TargetTrail(), BreakevenAfter(), TimeExit(), PercentTrail(), AtrTrail())
+}
+
+
+def get_strategy(name: str) -> Strategy:
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown strategy '{name}'. Available: {sorted(STRATEGIES)}")
+
+
+class StrategyEngine:
+    """Evaluates a batch of (position, ltp) updates, one call per strategy"""
+
+    def __init__(self, min_sl_step: float):
+        self.min_sl_step = min_sl_step
+
+    def evaluate(self, updates: List[Tuple[dict, float]], now: float) -> List[Decision]:
+        decisions = []
+        groups: Dict[str, Tuple[list, list]] = {}
+
+        for position, ltp in updates:
+            # Common to every strategy: LTP through the SL means the stop has
+            # (very likely) filled - stop managing the position
+            if ltp <= position['sl_trigger']:
+                decisions.append(Decision(position['symbol'], "sl_hit", position['sl_trigger'], "ltp_below_sl"))
+                continue
+            positions, ltps = groups.setdefault(position['params']['strategy'], ([], []))
+            positions.append(position)
+            ltps.append(ltp)
+
+        for name, (positions, ltps) in groups.items():
+            by_symbol = {position['symbol']: position for position in positions}
+            for decision in get_strategy(name).evaluate(positions, ltps, now):
+                if decision.action == "modify" and not self._moves_sl_up(by_symbol[decision.symbol], decision):
+                    continue
+                decisions.append(decision)
+        return decisions
+
+    def _moves_sl_up(self, position: dict, decision: Decision) -> bool:
+        """SLs only ever move up, and by at least MIN_SL_STEP"""
+        if decision.reason == "first_target":
+            # Always passed through - it also flips first_target_hit; the
+            # executor skips the order if the SL is already at/above base_sl
+            return True
+        return decision.sl > position['sl_trigger'] + self.min_sl_step
@@ -0,0 +1,104 @@
+from src.utils.clock import SYSTEM_CLOCK
+from src.utils.rate_limiter import RateLimitExceeded
+
+
+class GttSL:
+    """Keeps a position's stop (and a target) in one Kite GTT OCO trigger
+
+    Drop-in alternative to TrailingSL for NRML/CNC positions. The trigger
+    lives at the exchange, so the position stays protected while the bot is
+    down, and it is only replaced when the trail has moved at least `step`
+    points - every smaller SL change the strategy asks for is skipped. The
+    move to the base SL at the first target always goes through.
+
+    The target leg sits `target_gap` above the first target, or above the
+    LTP once the trail is past it, so the trailing strategy keeps room to run.
+    """
+
+    def __init__(self, kite_client, symbol, quantity, config, state, persist,
+                 step, base_sl, first_target, target_gap, limit_buffer=None, clock=None):
+        self.kite = kite_client
+        self.symbol = symbol
+        self.quantity = quantity
+        self.config = config
+        self.state = state
+        self.persist = persist
+        self.limit_buffer = limit_buffer or (lambda: config.ORDER_BUFFER)
+        self.clock = clock or SYSTEM_CLOCK
+        self.step = step
+        self.base_sl = base_sl
+        self.first_target = first_target
+        self.target_gap = target_gap
+
+    def _legs(self, stop, ltp):
+        """Trigger and limit prices for both legs, as KiteClient's GTT calls take them"""
+        target = max(self.first_target, ltp) + self.target_gap
+        buffer = self.limit_buffer()
+        return {
+            "stop": stop,
+            "stop_limit": stop - buffer,
+            "target": target,
+            "target_limit": target - buffer,
+            "last_price": ltp,
+        }
+
+    def place_initial_sl(self, sl_trigger, ltp=None, reserved=False):
+        ltp = ltp if ltp is not None else self.state['buy_price']
+        legs = self._legs(sl_trigger, ltp)
+        trigger_id = self.kite.place_gtt_oco(self.symbol, self.quantity, product=self.config.PRODUCT,
+                                             reserved=reserved, **legs)
+        self.state['gtt_id'] = trigger_id
+        self.state['sl_trigger'] = sl_trigger
+        self.state['gtt_target'] = legs['target']
+        self.state['mod_count'] = 0
+        self.state['last_sl_update_time'] = self.clock.time()
+        self.persist()
+        return trigger_id
+
+    def modify_sl(self, new_trigger, ltp=None):
+        now = self.clock.time()
+        if now - self.state.get('last_sl_update_time', 0) < self.config.THROTTLE_SECONDS:
+            return False
+
+        current = self.state.get('sl_trigger', 0.0)
+        locks_in = current < self.base_sl <= new_trigger
+        if new_trigger - current < self.step and not locks_in:
+            return False  # Not a full GTT step yet - the parked stop still protects
+
+        ltp = ltp if ltp is not None else self.state['buy_price']
+        trigger_id = self.state.get('gtt_id')
+        if not trigger_id:
+            if not self.kite.reserve_orders(1):
+                return False
+            self.place_initial_sl(new_trigger, ltp, reserved=True)
+            return True
+
+        legs = self._legs(new_trigger, ltp)
+        try:
+            self.kite.modify_gtt_oco(trigger_id, self.symbol, self.quantity, product=self.config.PRODUCT, **legs)
+        except RateLimitExceeded:
+            return False
+        self.state['mod_count'] = self.state.get('mod_count', 0) + 1
+        self.state['sl_trigger'] = new_trigger
+        self.state['gtt_target'] = legs['target']
+        self.state['last_sl_update_time'] = now
+        self.persist()
+        return True
+
+    def cancel_stop(self):
+        """Delete the GTT without selling - the position was closed outside the bot"""
+        trigger_id = self.state.get('gtt_id')
+        if trigger_id:
+            self.kite.delete_gtt(trigger_id)
+            self.state['gtt_id'] = None
+            self.persist()
+
+    def exit_position(self):
+        """Delete the GTT and sell the position at market"""
+        trigger_id = self.state.get('gtt_id')
+        if trigger_id:
+            self.kite.delete_gtt(trigger_id)
+            self.state['gtt_id'] = None
+        exit_oid = self.kite.place_market_exit(self.symbol, self.quantity, self.config.PRODUCT)
+        self.persist()
+        return exit_oid
@@ -0,0 +1,19 @@
+from src.strategies.base import Decision, Strategy
+
+
+class PercentTrail(Strategy):
+    """SL follows the highest LTP seen at a fixed percentage below it"""
+
+    name = "percent_trail"
+
+    def evaluate(self, positions, ltps, now):
+        decisions = []
+        for position, ltp in zip(positions, ltps):
+            state = position['strategy_state']
+            high = max(state.get('high', ltp), ltp)
+            state['high'] = high
+
+            new_sl = high * (1.0 - position['params']['trail_percent'] / 100.0)
+            if new_sl > position['sl_trigger']:
+                decisions.append(Decision(position['symbol'], "modify", new_sl, "percent_trail"))
+        return decisions
@@ -0,0 +1,58 @@
+from src.strategies.base import Decision, Strategy
+from src.utils.math_helpers import trailing_steps
+
+
+class TargetTrail(Strategy):
+    """Default strategy: lock in base SL at the first target, then trail in fixed steps above it"""
+
+    name = "target_trail"
+
+    def evaluate(self, positions, ltps, now):
+        # One pass over the batch - no per-position method dispatch on the tick path
+        decisions = []
+        append = decisions.append
+        for position, ltp in zip(positions, ltps):
+            first_target = position['first_target']
+            if not position['first_target_hit']:
+                if ltp >= first_target:
+                    append(Decision(position['symbol'], "modify", position['base_sl'], "first_target"))
+            elif ltp > first_target:
+                new_sl = trailing_steps(position['base_sl'], ltp, first_target, position['trail_step'])
+                append(Decision(position['symbol'], "modify", new_sl, "trail"))
+        return decisions
+
+
+class BreakevenAfter(TargetTrail):
+    """Target trail, plus SL to buy price once the trade has been in profit for N seconds"""
+
+    name = "breakeven_after"
+
+    def evaluate(self, positions, ltps, now):
+        decisions = super().evaluate(positions, ltps, now)
+        trailed = {decision.symbol for decision in decisions}
+        for position, ltp in zip(positions, ltps):
+            if position['symbol'] in trailed:
+                continue
+            buy_price = position['buy_price']
+            held = now - position['opened_at']
+            if (held >= position['params']['breakeven_seconds'] and ltp > buy_price
+                    and position['sl_trigger'] < buy_price):
+                decisions.append(Decision(position['symbol'], "modify", buy_price, "breakeven"))
+        return decisions
+
+
+class TimeExit(TargetTrail):
+    """Target trail, but exit at market once the position is held for max_hold_seconds"""
+
+    name = "time_exit"
+
+    def evaluate(self, positions, ltps, now):
+        decisions, held, held_ltps = [], [], []
+        for position, ltp in zip(positions, ltps):
+            max_hold = position['params']['max_hold_seconds']
+            if max_hold > 0 and now - position['opened_at'] >= max_hold:
+                decisions.append(Decision(position['symbol'], "exit", None, "max_hold"))
+            else:
+                held.append(position)
+                held_ltps.append(ltp)
+        return decisions + super().evaluate(held, held_ltps, now)
@@ -1,40 +1,71 @@
-import time
-from src.utils.file_helpers import save_state
+from src.utils.clock import SYSTEM_CLOCK
+from src.utils.rate_limiter import RateLimitExceeded
 
 class TrailingSL:
-    def __init__(self, kite_client, symbol, quantity, config, state):
+    def __init__(self, kite_client, symbol, quantity, config, state, persist, limit_buffer=None, clock=None):
         self.kite = kite_client
         self.symbol = symbol
         self.quantity = quantity
         self.config = config
         self.state = state
+        # Owner's save hook - each account persists its full state to its own file
+        self.persist = persist
+        # Points between trigger and limit, read at every place/modify (depth-aware when set)
+        self.limit_buffer = limit_buffer or (lambda: config.ORDER_BUFFER)
+        self.clock = clock or SYSTEM_CLOCK
 
-    def place_initial_sl(self, sl_trigger):
-        limit = sl_trigger - self.config.ORDER_BUFFER
-        oid = self.kite.place_sl_order(self.symbol, self.quantity, sl_trigger, limit, self.config.PRODUCT)
+    def place_initial_sl(self, sl_trigger, reserved=False):
+        limit = sl_trigger - self.limit_buffer()
+        oid = self.kite.place_sl_order(self.symbol, self.quantity, sl_trigger, limit, self.config.PRODUCT, reserved=reserved)
         self.state['sl_order_id'] = oid
         self.state['sl_trigger'] = sl_trigger
         self.state['mod_count'] = 0
-        self.state['last_sl_update_time'] = time.time()
-        save_state(self.state, self.config.STATE_FILE)
+        self.state['last_sl_update_time'] = self.clock.time()
+        self.persist()
         return oid
 
-    def modify_sl(self, new_trigger):
-        now = time.time()
+    def modify_sl(self, new_trigger, ltp=None):
+        # ltp is only needed by GttSL (a GTT is placed against the last price)
+        now = self.clock.time()
         if now - self.state.get('last_sl_update_time', 0) < self.config.THROTTLE_SECONDS:
             return False
 
         oid = self.state.get('sl_order_id')
         if oid and self.state.get('mod_count', 0) < self.config.MAX_MODIFY_BEFORE_RECREATE:
-            limit = new_trigger - self.config.ORDER_BUFFER
-            self.kite.modify_order(oid, new_trigger, limit)
+            limit = new_trigger - self.limit_buffer()
+            try:
+                self.kite.modify_order(oid, new_trigger, limit)
+            except RateLimitExceeded:
+                # Out of order budget - skip, the next tick retries
+                return False
             self.state['mod_count'] += 1
             self.state['sl_trigger'] = new_trigger
             self.state['last_sl_update_time'] = now
-            save_state(self.state, self.config.STATE_FILE)
+            self.persist()
             return True
-        # recreate order if mod_count exceeded
+        # recreate order if mod_count exceeded - reserve budget for both calls
+        # first so we never cancel the old SL and then fail to place the new one
+        if not self.kite.reserve_orders(2 if oid else 1):
+            return False
         if oid:
-            self.kite.cancel_order(oid)
-        self.place_initial_sl(new_trigger)
+            self.kite.cancel_order(oid, reserved=True)
+        self.place_initial_sl(new_trigger, reserved=True)
         return True
+
+    def cancel_stop(self):
+        """Cancel the SL without selling - the position was closed outside the bot"""
+        oid = self.state.get('sl_order_id')
+        if oid:
+            self.kite.cancel_order(oid)
+            self.state['sl_order_id'] = None
+            self.persist()
+
+    def exit_position(self):
+        """Cancel the SL and sell the position at market"""
+        oid = self.state.get('sl_order_id')
+        if oid:
+            self.kite.cancel_order(oid)
+            self.state['sl_order_id'] = None
+        exit_oid = self.kite.place_market_exit(self.symbol, self.quantity, self.config.PRODUCT)
+        self.persist()
+        return exit_oid
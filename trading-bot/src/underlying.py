@@ -0,0 +1,215 @@
+import datetime
+import logging
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from src.rules import parse_symbol
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+"""
+UNDERLYING-DRIVEN TRAILING
+==========================
+Option LTPs jump around inside a wide spread, so a trail keyed off the
+option's own ticks moves the SL on noise. With `trail_source` UNDERLYING a
+position's trail is fed a model price instead: the option repriced with
+Black-Scholes from its underlying's tick.
+
+    one subscription per underlying   NIFTY options all follow "NSE:NIFTY 50"
+    one NumPy pass per underlying tick  every option on it repriced at once
+    implied vols cached               solved from the option's own LTP, refreshed
+                                      every IV_REFRESH_SECONDS (and when missing)
+
+The option's own ticks still decide whether the stop has been hit - the model
+only ever moves the SL up. Needs numpy; without it positions trail on their
+own LTP as before.
+"""
+
+YEAR_SECONDS = 365 * 86400
+MIN_YEARS = 3600 / YEAR_SECONDS  # Expiry day: price as if an hour were left, not zero
+MIN_VOL, MAX_VOL = 0.01, 5.0
+
+# Weekly expiry codes: YY + month (1-9, O, N, D) + DD
+_MONTHS = {**{str(m): m for m in range(1, 10)}, "O": 10, "N": 11, "D": 12}
+
+
+def norm_cdf(x):
+    """Standard normal CDF, vectorized (Abramowitz & Stegun 26.2.17, error < 7.5e-8)"""
+    z = np.abs(x)
+    t = 1.0 / (1.0 + 0.2316419 * z)
+    poly = t * (0.319381530 + t * (-0.356563782 + t * (1.781477937 + t * (-1.821255978 + t * 1.330274429))))
+    upper = 0.3989422804014327 * np.exp(-0.5 * z * z) * poly
+    return np.where(x >= 0, 1.0 - upper, upper)
+
+
+def _d1_d2(spot, strike, years, rate, vol):
+    root = vol * np.sqrt(years)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * years) / root
+    return d1, d1 - root
+
+
+def bs_price(spot, strike, years, rate, vol, call):
+    """European option prices - `call` is a bool array (False = put)"""
+    d1, d2 = _d1_d2(spot, strike, years, rate, vol)
+    discounted = strike * np.exp(-rate * years)
+    return np.where(call, spot * norm_cdf(d1) - discounted * norm_cdf(d2),
+                    discounted * norm_cdf(-d2) - spot * norm_cdf(-d1))
+
+
+def implied_vol(price, spot, strike, years, rate, call, iterations: int = 40):
+    """Vols that reproduce `price`, by vectorized bisection; NaN where no vol in range does"""
+    low = np.full(np.shape(price), MIN_VOL)
+    high = np.full(np.shape(price), MAX_VOL)
+    # Price is increasing in vol - bisection can't diverge the way Newton does on deep ITM/OTM
+    for _ in range(iterations):
+        mid = 0.5 * (low + high)
+        above = bs_price(spot, strike, years, rate, mid, call) > price
+        high = np.where(above, mid, high)
+        low = np.where(above, low, mid)
+    vol = 0.5 * (low + high)
+    reachable = ((bs_price(spot, strike, years, rate, MIN_VOL, call) <= price) &
+                 (price <= bs_price(spot, strike, years, rate, MAX_VOL, call)))
+    return np.where(reachable, vol, np.nan)
+
+
+def weekly_expiry(code: str) -> Optional[datetime.date]:
+    """Expiry date of a weekly code ("24D12"); None for monthly codes ("24DEC")"""
+    if len(code) != 5 or code[2] not in _MONTHS or not code[3:].isdigit():
+        return None
+    try:
+        return datetime.date(2000 + int(code[:2]), _MONTHS[code[2]], int(code[3:]))
+    except ValueError:
+        return None
+
+
+def parse_instruments(value: str) -> Dict[str, str]:
+    """"NIFTY=NSE:NIFTY 50,BANKNIFTY=NSE:NIFTY BANK" -> {underlying: exchange:tradingsymbol}"""
+    mapping = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, key = item.split("=", 1)
+            mapping[name.strip().upper()] = key.strip()
+    return mapping
+
+
+class _Group:
+    """Option positions on one underlying, as arrays for the pricing pass"""
+
+    def __init__(self):
+        self.positions: Dict[str, Tuple[dict, float, bool, float]] = {}  # symbol -> (position, strike, call, expiry ts)
+        self.ivs: Dict[str, float] = {}
+        self.refreshed_at = None
+        self._arrays = None  # Rebuilt only when positions come or go
+
+    def arrays(self):
+        if self._arrays is None:
+            rows = list(self.positions.values())
+            self._arrays = ([row[0] for row in rows],
+                            np.array([row[1] for row in rows], dtype=float),
+                            np.array([row[2] for row in rows], dtype=bool),
+                            np.array([row[3] for row in rows], dtype=float))
+        return self._arrays
+
+    def changed(self):
+        self._arrays = None
+
+
+class UnderlyingTracker:
+    """Maps option positions to their underlyings and reprices them on underlying ticks"""
+
+    def __init__(self, instruments: Dict[str, str], expiry_of: Callable[[str], Optional[datetime.date]] = None,
+                 rate: float = 0.065, refresh_seconds: float = 60.0, close_time: str = "15:30",
+                 timezone: str = "Asia/Kolkata"):
+        self.instruments = instruments  # Underlying name -> "EXCHANGE:TRADINGSYMBOL" it is priced from
+        self.expiry_of = expiry_of or (lambda symbol: None)
+        self.rate = rate
+        self.refresh_seconds = refresh_seconds
+        self.close_time = datetime.datetime.strptime(close_time, "%H:%M").time()
+        self.tz = ZoneInfo(timezone)
+        self._groups: Dict[str, _Group] = {}
+        self._keys: Dict[str, str] = {}  # option symbol -> underlying key
+
+    def keys(self) -> List[str]:
+        """Underlyings with at least one position on them"""
+        return list(self._groups)
+
+    def add(self, position: dict) -> Optional[str]:
+        """Track an option position; returns its underlying key, None if it can't be priced"""
+        symbol = position['symbol']
+        if np is None:
+            logger.warning("⚠️  %s: numpy is not installed - trailing on the option's own LTP", symbol,
+                           extra={"symbol": symbol})
+            return None
+        parts = parse_symbol(symbol)
+        if not parts or parts['kind'] not in ("CE", "PE"):
+            logger.warning("⚠️  %s: not an option - trailing on its own LTP", symbol, extra={"symbol": symbol})
+            return None
+        key = self.instruments.get(parts['underlying'])
+        if not key:
+            logger.warning("⚠️  %s: no instrument for underlying %s in UNDERLYING_INSTRUMENTS - trailing on "
+                           "its own LTP", symbol, parts['underlying'], extra={"symbol": symbol})
+            return None
+        expiry = self.expiry_of(symbol) or weekly_expiry(parts['expiry'])
+        if expiry is None:
+            logger.warning("⚠️  %s: expiry date unknown (load the instrument dump) - trailing on its own LTP",
+                           symbol, extra={"symbol": symbol})
+            return None
+
+        expires_at = datetime.datetime.combine(expiry, self.close_time, self.tz).timestamp()
+        group = self._groups.setdefault(key, _Group())
+        group.positions[symbol] = (position, parts['strike'], parts['kind'] == "CE", expires_at)
+        group.changed()
+        self._keys[symbol] = key
+        logger.info("🧮 %s: trailing from %s", symbol, key, extra={"symbol": symbol})
+        return key
+
+    def remove(self, symbol: str) -> Optional[str]:
+        """Stop tracking a position; returns its underlying key if nothing else uses it"""
+        key = self._keys.pop(symbol, None)
+        group = self._groups.get(key)
+        if group is None:
+            return None
+        group.positions.pop(symbol, None)
+        group.ivs.pop(symbol, None)
+        group.changed()
+        if group.positions:
+            return None
+        del self._groups[key]
+        return key
+
+    def reprice(self, key: str, spot: float, now: float) -> List[Tuple[dict, float]]:
+        """(position, model price) for every priceable option on an underlying, one vectorized pass"""
+        group = self._groups.get(key)
+        if group is None or spot <= 0:
+            return []
+        positions, strikes, calls, expiries = group.arrays()
+        years = np.maximum((expiries - now) / YEAR_SECONDS, MIN_YEARS)
+        ivs = np.array([group.ivs.get(position['symbol'], np.nan) for position in positions])
+
+        stale = group.refreshed_at is None or now - group.refreshed_at >= self.refresh_seconds
+        solve = np.ones(len(positions), dtype=bool) if stale else np.isnan(ivs)
+        if solve.any():
+            self._refresh_ivs(group, positions, solve, ivs, spot, strikes, years, calls)
+            if stale:
+                group.refreshed_at = now
+
+        prices = bs_price(spot, strikes, years, self.rate, ivs, calls)
+        return [(position, float(price)) for position, price in zip(positions, prices) if math.isfinite(price)]
+
+    def _refresh_ivs(self, group: _Group, positions, solve, ivs, spot, strikes, years, calls):
+        """Re-solve implied vols (in place) from the options' latest own LTPs"""
+        ltps = np.array([position.get('option_ltp') or np.nan for position in positions], dtype=float)
+        solve = solve & np.isfinite(ltps)
+        if not solve.any():
+            return
+        solved = implied_vol(ltps[solve], spot, strikes[solve], years[solve], self.rate, calls[solve])
+        for index, vol in zip(np.flatnonzero(solve), solved):
+            if math.isfinite(vol):
+                ivs[index] = vol
+                group.ivs[positions[index]['symbol']] = float(vol)
+            # An unsolvable price (below intrinsic, stale LTP) keeps the previous vol
@@ -0,0 +1,56 @@
+import threading
+import time
+
+
+class SystemClock:
+    """Wall-clock time - what the bot uses unless a test or simulation injects a VirtualClock"""
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        """Event.wait(timeout) - a VirtualClock skips the timeout instead of blocking"""
+        return event.wait(timeout)
+
+
+class VirtualClock(SystemClock):
+    """Time that only moves when told to
+
+    `sleep` and `wait` return immediately, advancing the clock by the time
+    they would have blocked, so reconnect delays and throttles cost nothing
+    in a simulation. Meant for single-threaded simulations: a sleep on one
+    thread moves time for every reader.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.now = float(start)
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        if seconds < 0:
+            raise ValueError(f"Time cannot go backwards ({seconds}s)")
+        with self._lock:
+            self.now += seconds
+
+    def sleep(self, seconds: float):
+        self.advance(max(0.0, seconds))
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        if not event.is_set():
+            self.advance(timeout)
+        return event.is_set()
+
+
+SYSTEM_CLOCK = SystemClock()
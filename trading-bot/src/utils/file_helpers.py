@@ -11,5 +11,14 @@ def load_state(path):
     return {}
 
 def save_state(state, path):
-    with open(path, "w") as f:
-        json.dump(state, f, indent=2)
+    # Write to a temp file and swap it in so a crash or SIGTERM mid-write
+    # never leaves a truncated state file behind
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,130 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+# Fields callers attach with `extra=` that structured output carries through
+CONTEXT_FIELDS = ("symbol", "order_id", "user_id")
+
+_listener = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the writer thread
+
+    The stock handler renders the message on the calling thread before
+    enqueueing, which is exactly the work the tick path should not pay for.
+    The queue is in-process, so the record can travel as-is; log arguments
+    must therefore be values that are not mutated afterwards (numbers,
+    strings), which is all the bot passes.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Let through one `sample=True` record per message and symbol every `interval` seconds
+
+    Repetitive hot-path messages (a trailing SL moving on every tick) are
+    logged with `extra={"sample": True}`. The first one in each interval is
+    kept and reports how many identical messages were dropped before it.
+    """
+
+    def __init__(self, interval: float, clock=time.monotonic, max_keys: int = 1024):
+        super().__init__()
+        self.interval = interval
+        self.max_keys = max_keys
+        self._clock = clock
+        self._last = {}  # (template, symbol) -> [last emitted at, suppressed since]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, "sample", False) or self.interval <= 0:
+            return True
+        key = (record.msg, getattr(record, "symbol", None))
+        now = self._clock()
+        with self._lock:
+            entry = self._last.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                return False
+            record.suppressed = entry[1] if entry else 0
+            if entry is None and len(self._last) >= self.max_keys:
+                # Symbols come and go - forget those quiet for a whole interval
+                self._last = {k: v for k, v in self._last.items() if now - v[0] < self.interval}
+            self._last[key] = [now, 0]
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the context fields as top-level keys"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS + ("suppressed",):
+            value = getattr(record, field, None)
+            if value:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic console line, noting sampled-out repeats"""
+
+    def format(self, record):
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{line} (+{suppressed} similar suppressed)" if suppressed else line
+
+
+def setup_logging(level: str = "INFO", fmt: str = "text", sample_seconds: float = 5.0, stream=None):
+    """Route all logging through a queue to a background writer thread
+
+    Safe to call more than once - later calls replace the earlier setup.
+    Returns the QueueListener, already started and stopped again at exit.
+    """
+    global _listener
+    if _listener is not None:
+        stop_logging()
+
+    writer = logging.StreamHandler(stream)
+    if fmt == "json":
+        writer.setFormatter(JsonFormatter())
+    else:
+        writer.setFormatter(TextFormatter("%(asctime)s %(levelname)s: %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    # Sample on the calling thread so dropped records never reach the queue
+    handler.addFilter(SamplingFilter(sample_seconds))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, writer, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,128 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+MIN_INTERVAL = 0.001  # Sampling faster would hold the GIL the profiled tick path needs
+
+
+class SamplingProfiler:
+    """Wall-clock sampler of every thread's Python stack
+
+    A background thread reads `sys._current_frames()` every `interval`
+    seconds and counts each distinct stack. Nothing is hooked into the
+    profiled code, so the cost is the sampling thread's own work - roughly a
+    percent of one core at the default 100 Hz - and only while it runs.
+
+    Stacks are reported in collapsed form, one `thread;outer;...;inner count`
+    line per stack, which flamegraph.pl, speedscope and inferno read as is.
+    Waiting threads show up too (in `wait`/`select`), which is what tells a
+    tick thread starved of the lock apart from one doing work.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = max(interval, MIN_INTERVAL)
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        labels: Dict[tuple, str] = {}  # (filename, function, first line) -> frame label
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    key = (code.co_filename, code.co_name, code.co_firstlineno)
+                    label = labels.get(key)
+                    if label is None:
+                        label = labels[key] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, heaviest first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_for(seconds: float, interval: float = 0.01) -> SamplingProfiler:
+    """Sample every thread for `seconds` (blocks the caller), then return the profiler"""
+    profiler = SamplingProfiler(interval).start()
+    try:
+        time.sleep(seconds)
+    finally:
+        profiler.stop()
+    return profiler
+
+
+_memory_lock = threading.Lock()
+_baseline: Optional[tracemalloc.Snapshot] = None
+
+
+def memory_report(top: int = 25, frames: int = 1) -> dict:
+    """Top allocation sites now, and growth since the previous report
+
+    The first call starts tracemalloc (which slows allocations while it is on)
+    and can only report what was allocated from then on; call again later to
+    see what grew. stop_memory_tracing() turns it off.
+    """
+    global _baseline
+    with _memory_lock:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(frames)
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        report = {
+            "tracing_started": started,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": _stats(snapshot.statistics("lineno")[:top]),
+            "growth": _stats(snapshot.compare_to(_baseline, "lineno")[:top]) if _baseline else [],
+        }
+        _baseline = snapshot
+    return report
+
+
+def stop_memory_tracing():
+    global _baseline
+    with _memory_lock:
+        tracemalloc.stop()
+        _baseline = None
+
+
+def _stats(stats) -> List[dict]:
+    rows = []
+    for stat in stats:
+        frame = stat.traceback[0]
+        row = {"where": f"{frame.filename}:{frame.lineno}", "bytes": stat.size, "count": stat.count}
+        if hasattr(stat, "size_diff"):
+            row.update(bytes_diff=stat.size_diff, count_diff=stat.count_diff)
+        rows.append(row)
+    return rows
@@ -0,0 +1,49 @@
+import threading
+import time
+
+# Refill arithmetic accumulates float error; treat "almost one" as a token
+_EPSILON = 1e-9
+
+
+class RateLimitExceeded(Exception):
+    """Raised instead of waiting when a non-blocking call finds the budget empty"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket - `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError(f"Rate limit must be positive, got {rate}")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, count=1):
+        """Take `count` tokens if they are all available, without waiting"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= count - _EPSILON:
+                self.tokens -= count
+                return True
+            return False
+
+    def acquire(self):
+        """Take a token, sleeping until one is available"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1 - _EPSILON:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self._sleep(wait)
@@ -0,0 +1,100 @@
+import types
+import pytest
+from src import config
+from src.bot import DynamicTradingBot
+from src.instruments import InstrumentCache
+
+
+class FakeKiteClient:
+    """In-memory stand-in for KiteClient - records order calls, never hits the network"""
+
+    def __init__(self, tokens=None, user_id=None):
+        self.user_id = user_id
+        self.kite = types.SimpleNamespace(api_key="fake", access_token=f"token-{user_id}")
+        self.tokens = tokens or {}  # symbol -> instrument token
+        self.calls = []
+        self._next_order_id = 0
+
+    def _order_id(self):
+        self._next_order_id += 1
+        return f"ORD{self._next_order_id}"
+
+    def set_access_token(self, access_token):
+        self.kite.access_token = access_token
+
+    def reserve_orders(self, count=1):
+        return True
+
+    def get_profile(self):
+        return {"user_id": self.user_id}
+
+    def get_positions(self):
+        return {"day": [], "net": []}
+
+    def get_ltp(self, *instruments):
+        return {key: {"instrument_token": self.tokens.get(key.split(":", 1)[1])} for key in instruments}
+
+    def get_instruments(self, exchange=None):
+        return [{"tradingsymbol": symbol, "instrument_token": token} for symbol, token in self.tokens.items()]
+
+    def place_sl_order(self, symbol, quantity, trigger, limit, product, reserved=False):
+        self.calls.append(("place", symbol, trigger))
+        return self._order_id()
+
+    def place_market_exit(self, symbol, quantity, product):
+        self.calls.append(("exit", symbol, quantity))
+        return self._order_id()
+
+    def modify_order(self, order_id, trigger, limit, reserved=False):
+        self.calls.append(("modify", order_id, trigger))
+        return order_id
+
+    def cancel_order(self, order_id, reserved=False):
+        self.calls.append(("cancel", order_id))
+        return order_id
+
+    def place_gtt_oco(self, symbol, quantity, stop, stop_limit, target, target_limit, last_price, product,
+                      reserved=False):
+        self.calls.append(("place_gtt", symbol, stop, target))
+        self._next_order_id += 1
+        return self._next_order_id
+
+    def modify_gtt_oco(self, trigger_id, symbol, quantity, stop, stop_limit, target, target_limit, last_price,
+                       product, reserved=False):
+        self.calls.append(("modify_gtt", trigger_id, stop, target))
+        return trigger_id
+
+    def delete_gtt(self, trigger_id, reserved=False):
+        self.calls.append(("delete_gtt", trigger_id))
+        return trigger_id
+
+
+@pytest.fixture(autouse=True)
+def session_cache_dir(tmp_path, monkeypatch):
+    """Keep session validations out of the working directory"""
+    monkeypatch.setattr(config, "SESSION_CACHE_DIR", str(tmp_path / "sessions"))
+
+
+@pytest.fixture(autouse=True)
+def no_trade_journal(monkeypatch):
+    """Registries built in tests don't journal unless a test asks for it"""
+    monkeypatch.setattr(config, "JOURNAL_FILE", "")
+
+
+@pytest.fixture(autouse=True)
+def no_market_scheduler(monkeypatch):
+    """Registries started in tests ignore the wall-clock market hours"""
+    monkeypatch.setattr(config, "MARKET_SCHEDULER", False)
+
+
+@pytest.fixture
+def make_bot(tmp_path):
+    """Build a bot on a fake client with its own state file"""
+    def _make_bot(user_id="AB1234", tokens=None, instruments=None):
+        return DynamicTradingBot(
+            kite_client=FakeKiteClient(tokens, user_id=user_id),
+            state_file=str(tmp_path / f"state_{user_id}.json"),
+            instruments=instruments if instruments is not None else InstrumentCache(),
+            user_id=user_id,
+        )
+    return _make_bot
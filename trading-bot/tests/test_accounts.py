@@ -0,0 +1,132 @@
+import json
+import pytest
+from src import config
+from src.accounts import AccountRegistry, load_accounts
+from src.auth import save_account_token
+from src.instruments import InstrumentCache
+from src.session import SessionError
+
+
+def write_accounts(tmp_path, accounts):
+    path = tmp_path / "accounts.json"
+    path.write_text(json.dumps(accounts))
+    return str(path)
+
+
+@pytest.mark.parametrize("scenario, accounts, error", [
+    ("empty list", [], "non-empty"),
+    ("missing user_id", [{"api_key": "k", "access_token": "t"}], "user_id"),
+    ("missing api_key", [{"user_id": "AB1234", "access_token": "t"}], "api_key"),
+    ("duplicate user_id", [{"user_id": "AB1234", "api_key": "k1", "access_token": "t"},
+                           {"user_id": "AB1234", "api_key": "k2", "access_token": "t"}], "Duplicate"),
+    ("shared state file", [{"user_id": "AB1234", "api_key": "k1", "access_token": "t", "state_file": "s.json"},
+                           {"user_id": "CD5678", "api_key": "k2", "access_token": "t", "state_file": "s.json"}], "state_file"),
+])
+def test_load_accounts_rejects_invalid(tmp_path, monkeypatch, scenario, accounts, error):
+    monkeypatch.setattr(config, "TOKENS_DIR", str(tmp_path / "tokens"))
+    with pytest.raises(ValueError, match=error):
+        load_accounts(write_accounts(tmp_path, accounts))
+
+
+def test_load_accounts_without_token_today_is_a_missing_session(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TOKENS_DIR", str(tmp_path / "tokens"))
+    with pytest.raises(SessionError, match="pdm run auth --account AB1234") as error:
+        load_accounts(write_accounts(tmp_path, [{"user_id": "AB1234", "api_key": "k"}]))
+    assert error.value.status == "missing"  # run_bot exits cleanly on it instead of a traceback
+
+
+def test_load_accounts_reads_daily_token_and_defaults_state_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TOKENS_DIR", str(tmp_path / "tokens"))
+    save_account_token("AB1234", "tok-ab")
+    accounts = load_accounts(write_accounts(tmp_path, [{"user_id": "AB1234", "api_key": "k"}]))
+    assert accounts[0]["access_token"] == "tok-ab"
+    assert accounts[0]["state_file"] == "state_AB1234.json"
+
+
+def test_prewarm_loads_todays_tokens_and_reports_accounts_without_one(tmp_path, monkeypatch, make_bot):
+    monkeypatch.setattr(config, "TOKENS_DIR", str(tmp_path / "tokens"))
+    registry = AccountRegistry()
+    registry.bots = {"AB1234": make_bot("AB1234"), "CD5678": make_bot("CD5678")}
+    save_account_token("AB1234", "tok-today")  # CD5678 did not log in this morning
+
+    assert registry.prewarm() == [registry.bots["CD5678"]]
+    assert registry.bots["AB1234"].kite_client.kite.access_token == "tok-today"
+    assert registry.bots["CD5678"].kite_client.kite.access_token == "token-CD5678"  # Yesterday's, never used
+
+
+def test_instrument_reload_drops_expired_contracts():
+    class Dump:
+        def __init__(self, symbols):
+            self.symbols = symbols
+
+        def get_instruments(self, exchange=None):
+            return [{"tradingsymbol": symbol, "instrument_token": n, "expiry": "2026-01-08"}
+                    for n, symbol in enumerate(self.symbols, 1)]
+
+    cache = InstrumentCache()
+    cache.load(Dump(["NIFTY26JAN25000CE", "NIFTY26JAN25100CE"]))
+    cache.load(Dump(["NIFTY26JAN25100CE"]))  # The next morning's dump
+    assert len(cache) == 1 and cache.get_expiry("NIFTY26JAN25000CE") is None
+    assert cache.get_token(None, "NIFTY26JAN25100CE") == 1
+
+
+def test_route_by_user_id(make_bot):
+    registry = AccountRegistry()
+    registry.bots = {"AB1234": make_bot("AB1234"), "CD5678": make_bot("CD5678")}
+    assert registry.route({"user_id": "CD5678"}) is registry.bots["CD5678"]
+    assert registry.route({"user_id": "AB1234"}) is registry.bots["AB1234"]
+    assert registry.route({"user_id": "ZZ0000"}) is None
+    assert registry.route({}) is None
+
+
+def test_state_files_are_isolated_per_account(make_bot):
+    shared = InstrumentCache()
+    bot_a = make_bot("AB1234", instruments=shared)
+    bot_b = make_bot("CD5678", instruments=shared)
+    bot_a.start_market_websocket = lambda: None
+    bot_a.start_trailing_for_position("NIFTY24DEC25000CE", 100.0, 75)
+
+    with open(bot_a.state_file) as f:
+        assert "NIFTY24DEC25000CE" in json.load(f)["active_positions"]
+    assert bot_a.state_file != bot_b.state_file
+    assert bot_b.state == {}
+
+
+def test_ticks_route_through_token_map(make_bot):
+    bot = make_bot()
+    seen = []
+    bot.process_price_updates = lambda updates: seen.extend((p["symbol"], ltp) for p, ltp in updates)
+    bot.active_positions = {"NIFTY24DEC25000CE": {"symbol": "NIFTY24DEC25000CE"},
+                            "NIFTY24DEC25100CE": {"symbol": "NIFTY24DEC25100CE"}}
+    bot.token_to_symbol = {111: "NIFTY24DEC25000CE", 222: "NIFTY24DEC25100CE"}
+
+    bot.handle_market_tick({"instrument_token": 222, "last_price": 55.5})
+    bot.handle_market_tick({"instrument_token": 999, "last_price": 10.0})  # Not ours
+
+    assert seen == [("NIFTY24DEC25100CE", 55.5)]
+
+
+def test_registry_start_bulk_loads_shared_instruments(make_bot):
+    registry = AccountRegistry()
+    bot = make_bot("AB1234", tokens={"NIFTY24DEC25000CE": 111}, instruments=registry.instruments)
+    bot.run = lambda: None
+    registry.bots = {"AB1234": bot}
+    registry.start()
+    assert registry.instruments.get_token(None, "NIFTY24DEC25000CE") == 111
+
+
+def test_registry_start_refuses_rejected_session(make_bot):
+    registry = AccountRegistry()
+    bot = make_bot("AB1234", instruments=registry.instruments)
+    bot.run = lambda: pytest.fail("bot started on a rejected session")
+    bot.kite_client.get_profile = lambda: {"user_id": "SOMEONE_ELSE"}
+    registry.bots = {"AB1234": bot}
+    with pytest.raises(SessionError) as excinfo:
+        registry.start()
+    assert excinfo.value.status == "rejected"
+
+
+def test_bots_share_an_initially_empty_cache(make_bot):
+    registry = AccountRegistry()
+    bot = make_bot("AB1234", tokens={"NIFTY24DEC25000CE": 111}, instruments=registry.instruments)
+    assert bot.instruments is registry.instruments
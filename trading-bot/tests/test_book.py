@@ -0,0 +1,67 @@
+import types
+import pytest
+from src import config
+from src.book import TopOfBook
+
+SYMBOL = "NIFTY24DEC25000CE"
+
+
+def depth(bid, ask):
+    return {"buy": [{"price": bid, "quantity": 75, "orders": 1}],
+            "sell": [{"price": ask, "quantity": 75, "orders": 1}]}
+
+
+def make_book(capacity=2):
+    return TopOfBook(capacity, alpha=0.5, multiplier=2.0, max_buffer=1.0, default_buffer=0.05)
+
+
+def test_slots_are_bounded_and_reused():
+    book = make_book(capacity=2)
+    assert book.track(1) and book.track(2) and book.track(1)
+    assert not book.track(3)
+    book.forget(1)
+    assert book.track(3)
+    assert book.quote(3) == (0.0, 0.0, 0.0)
+    assert len(book) == 2
+
+
+def test_spread_ewma_drives_limit_buffer():
+    book = make_book()
+    book.track(1)
+    assert book.limit_buffer(1) == 0.05  # No quote yet - fixed buffer
+    assert book.limit_buffer(99) == 0.05  # Untracked token
+
+    book.update(1, depth(100.0, 100.1))
+    assert book.quote(1) == pytest.approx((100.0, 100.1, 0.1))
+    assert book.limit_buffer(1) == 0.2
+
+    book.update(1, depth(99.8, 100.1))  # Spread widens to 0.3, EWMA 0.2
+    assert book.limit_buffer(1) == 0.4
+    book.update(1, {"buy": [], "sell": depth(0, 100.1)["sell"]})  # One-sided - spread kept
+    assert book.limit_buffer(1) == 0.4
+
+    book.update(1, depth(90.0, 100.0))
+    assert book.limit_buffer(1) == 1.0  # Capped at max_buffer
+
+
+def test_bot_prices_sl_limit_from_depth(make_bot, monkeypatch):
+    monkeypatch.setattr(config, "SL_LIMIT_MODE", "DEPTH")
+    monkeypatch.setattr(config, "DEPTH_MAX_TOKENS", 1)
+    monkeypatch.setattr(config, "THROTTLE_SECONDS", 0)
+    tokens = {SYMBOL: 11, "NIFTY24DEC25100CE": 12}
+    bot = make_bot(tokens=tokens)
+    modes = {}
+    bot.market_ws = types.SimpleNamespace(MODE_LTP="ltp", MODE_FULL="full", subscribe=lambda tokens: None,
+                                          set_mode=lambda mode, tokens: modes.update(dict.fromkeys(tokens, mode)))
+    limits = []
+    bot.kite_client.modify_order = lambda order_id, trigger, limit, reserved=False: limits.append(limit)
+    bot.start_trailing_for_position(SYMBOL, 100.0, 75)
+    bot.start_trailing_for_position("NIFTY24DEC25100CE", 100.0, 75)
+    assert modes == {11: "full", 12: "ltp"}  # Book capacity bounds full-mode subscriptions
+
+    bot.handle_ticks([{"instrument_token": 11, "last_price": 114.0, "depth": depth(113.9, 114.2)}])
+    position = bot.active_positions[SYMBOL]
+    assert limits == [pytest.approx(position['base_sl'] - 0.6)]
+
+    bot.remove_position(SYMBOL)
+    assert len(bot.book) == 0
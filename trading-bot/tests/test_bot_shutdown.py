@@ -0,0 +1,42 @@
+import threading
+import time
+
+
+def test_shutdown_waits_for_lock_holder_before_saving(make_bot):
+    bot = make_bot()
+    events = []
+    bot._save_state = lambda: events.append("save")
+
+    holder_ready = threading.Event()
+
+    def hold_lock():
+        with bot._lock:
+            holder_ready.set()
+            time.sleep(0.2)
+            events.append("sl-modify-done")
+
+    holder = threading.Thread(target=hold_lock)
+    holder.start()
+    holder_ready.wait()
+    bot.shutdown(timeout=5)
+    holder.join()
+
+    assert events == ["sl-modify-done", "save"]
+
+
+def test_postbacks_and_ticks_ignored_after_shutdown(make_bot):
+    bot = make_bot()
+    bot.shutdown(timeout=1)
+    bot._handle_order_update = lambda order: (_ for _ in ()).throw(AssertionError("postback processed"))
+    bot._handle_ticks = lambda ticks: (_ for _ in ()).throw(AssertionError("tick processed"))
+
+    bot.handle_order_update({"order_id": "1", "status": "COMPLETE"})
+    bot.handle_market_tick({"instrument_token": 1, "last_price": 10.0})
+
+
+def test_shutdown_flushes_state(make_bot):
+    bot = make_bot()
+    bot.state = {"active_positions": {"NIFTY24DEC25000CE": {"sl_trigger": 93.3}}}
+    bot.shutdown(timeout=1)
+    with open(bot.state_file) as f:
+        assert "NIFTY24DEC25000CE" in f.read()
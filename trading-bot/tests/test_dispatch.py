@@ -0,0 +1,59 @@
+import datetime
+from src.dispatch import TickDispatcher
+
+T0 = datetime.datetime(2024, 12, 2, 10, 0, 0)
+
+
+def at(seconds):
+    return T0 + datetime.timedelta(seconds=seconds)
+
+
+def test_conflates_to_latest_tick_per_token():
+    dispatcher = TickDispatcher()
+    ticks = [
+        {"instrument_token": 1, "last_price": 100.0},
+        {"instrument_token": 2, "last_price": 50.0},
+        {"instrument_token": 1, "last_price": 101.0},
+        {"instrument_token": 1, "last_price": 102.0},
+    ]
+    fresh = dispatcher.conflate(ticks)
+    assert {t["instrument_token"]: t["last_price"] for t in fresh} == {1: 102.0, 2: 50.0}
+    assert dispatcher.stats() == {"batches": 1, "ticks_received": 4, "ticks_conflated": 2, "ticks_stale": 0}
+
+
+def test_out_of_order_tick_in_packet_keeps_newer():
+    dispatcher = TickDispatcher()
+    fresh = dispatcher.conflate([
+        {"instrument_token": 1, "last_price": 102.0, "exchange_timestamp": at(2)},
+        {"instrument_token": 1, "last_price": 100.0, "exchange_timestamp": at(1)},
+    ])
+    assert [t["last_price"] for t in fresh] == [102.0]
+
+
+def test_watermark_drops_stale_ticks_across_packets():
+    dispatcher = TickDispatcher()
+    dispatcher.conflate([{"instrument_token": 1, "last_price": 102.0, "exchange_timestamp": at(5)}])
+    assert dispatcher.conflate([{"instrument_token": 1, "last_price": 99.0, "exchange_timestamp": at(3)}]) == []
+    assert dispatcher.ticks_stale == 1
+    # Same-second updates are still fresh
+    assert len(dispatcher.conflate([{"instrument_token": 1, "last_price": 103.0, "exchange_timestamp": at(5)}])) == 1
+
+
+def test_forget_resets_watermark():
+    dispatcher = TickDispatcher()
+    dispatcher.conflate([{"instrument_token": 1, "last_price": 102.0, "exchange_timestamp": at(5)}])
+    dispatcher.forget(1)
+    assert len(dispatcher.conflate([{"instrument_token": 1, "last_price": 99.0, "exchange_timestamp": at(3)}])) == 1
+
+
+def test_bot_evaluates_once_per_token(make_bot):
+    bot = make_bot()
+    seen = []
+    bot.process_price_updates = lambda updates: seen.extend((p["symbol"], ltp) for p, ltp in updates)
+    bot.active_positions = {"NIFTY24DEC25000CE": {"symbol": "NIFTY24DEC25000CE"}}
+    bot.token_to_symbol = {111: "NIFTY24DEC25000CE"}
+
+    bot.handle_ticks([{"instrument_token": 111, "last_price": p} for p in (100.0, 101.0, 99.5)])
+
+    assert seen == [("NIFTY24DEC25000CE", 99.5)]
+    assert bot.dispatcher.ticks_conflated == 2
@@ -0,0 +1,37 @@
+import json
+import os
+import pytest
+from src.utils import file_helpers
+from src.utils.file_helpers import load_state, save_state
+
+
+def test_save_state_round_trip_leaves_no_temp_file(tmp_path):
+    path = str(tmp_path / "state.json")
+    save_state({"active_positions": {"A": {"sl_trigger": 1.5}}}, path)
+    assert load_state(path) == {"active_positions": {"A": {"sl_trigger": 1.5}}}
+    assert os.listdir(tmp_path) == ["state.json"]
+
+
+def test_failed_write_keeps_previous_state(tmp_path, monkeypatch):
+    path = str(tmp_path / "state.json")
+    save_state({"version": 1}, path)
+
+    def broken_dump(obj, f, **kwargs):
+        f.write('{"version": ')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(file_helpers.json, "dump", broken_dump)
+    with pytest.raises(OSError):
+        save_state({"version": 2}, path)
+    monkeypatch.undo()
+
+    with open(path) as f:
+        assert json.load(f) == {"version": 1}
+    assert os.listdir(tmp_path) == ["state.json"]
+
+
+def test_load_state_missing_or_corrupt_is_empty(tmp_path):
+    assert load_state(str(tmp_path / "missing.json")) == {}
+    corrupt = tmp_path / "corrupt.json"
+    corrupt.write_text("{not json")
+    assert load_state(str(corrupt)) == {}
@@ -0,0 +1,102 @@
+import pytest
+from src import config
+
+SYMBOL = "NIFTY24DEC25000CE"
+
+
+@pytest.fixture
+def gtt_config(monkeypatch):
+    monkeypatch.setattr(config, "SL_MODE", "GTT")
+    monkeypatch.setattr(config, "PRODUCT", "NRML")
+    monkeypatch.setattr(config, "THROTTLE_SECONDS", 0)
+
+
+def open_position(bot):
+    bot.start_market_websocket = lambda: None
+    bot.start_trailing_for_position(SYMBOL, 100.0, 75)
+    return bot.active_positions[SYMBOL]
+
+
+def climb(bot, start, stop, step=0.5):
+    ltp = start
+    while ltp <= stop:
+        bot.process_price_update(SYMBOL, bot.active_positions[SYMBOL], ltp)
+        ltp += step
+
+
+def test_gtt_oco_replaced_only_every_gtt_step(make_bot, gtt_config, monkeypatch):
+    monkeypatch.setattr(config, "GTT_STEP_RUPEES", 1000)
+    bot = make_bot()
+    position = open_position(bot)
+    # SL 100 - 500/75, first target 100 + 1000/75, GTT step 1000/75 ~ 13.33 points
+    stop, target = bot.kite_client.calls[0][2:]
+    assert bot.kite_client.calls[0][0] == "place_gtt"
+    assert stop == pytest.approx(100 - 6.67) and target == pytest.approx(position['first_target'] + 13.33)
+    assert position['gtt_id'] and position['sl_order_id'] is None
+
+    climb(bot, 100.0, 140.0)
+    modifies = [call for call in bot.kite_client.calls if call[0] == "modify_gtt"]
+    # First target lock-in (always), then one replace per full GTT step
+    assert modifies[0][2] == pytest.approx(position['base_sl'])
+    assert all(b[2] - a[2] >= 13.33 for a, b in zip(modifies, modifies[1:]))
+    assert len(modifies) == 2
+    assert bot.state['active_positions'][SYMBOL]['sl_trigger'] == modifies[-1][2]
+
+
+def test_gtt_mode_cuts_order_calls(make_bot, gtt_config, monkeypatch):
+    # A GTT step of 10 trail steps: ~1 replace for every 10 modifies (and recreates) of an SL order
+    monkeypatch.setattr(config, "TRAIL_RUPEES", 250)
+    monkeypatch.setattr(config, "GTT_STEP_RUPEES", 2500)
+    gtt_bot = make_bot("AB1234")
+    open_position(gtt_bot)
+    climb(gtt_bot, 100.0, 450.0, step=0.25)
+
+    monkeypatch.setattr(config, "SL_MODE", "ORDER")
+    order_bot = make_bot("CD5678")
+    open_position(order_bot)
+    climb(order_bot, 100.0, 450.0, step=0.25)
+
+    assert len(order_bot.kite_client.calls) >= 9 * len(gtt_bot.kite_client.calls)
+
+
+def test_triggered_gtt_closes_position(make_bot, gtt_config):
+    bot = make_bot()
+    open_position(bot)
+    bot.handle_order_update({"status": "COMPLETE", "transaction_type": "SELL", "order_type": "LIMIT",
+                             "tradingsymbol": SYMBOL, "order_id": "X1"})
+    assert SYMBOL not in bot.active_positions
+    assert SYMBOL not in bot.state['active_positions']
+
+
+def test_exit_deletes_gtt_before_selling(make_bot, gtt_config):
+    bot = make_bot()
+    position = open_position(bot)
+    position['trailing_sl'].exit_position()
+    assert [call[0] for call in bot.kite_client.calls] == ["place_gtt", "delete_gtt", "exit"]
+
+
+def test_square_off_fill_is_not_taken_for_a_triggered_gtt(make_bot, gtt_config):
+    bot = make_bot()
+    open_position(bot)
+    exits = []
+    bot._journal = lambda kind, position, price=None, order_id=None, **detail: exits.append(detail.get('reason'))
+    place_market_exit = bot.kite_client.place_market_exit
+
+    def filled_at_once(symbol, quantity, product):
+        order_id = place_market_exit(symbol, quantity, product)
+        # The fill's postback lands while the square-off is still running
+        bot.handle_order_update({"status": "COMPLETE", "transaction_type": "SELL", "order_type": "MARKET",
+                                 "tradingsymbol": symbol, "order_id": order_id, "filled_quantity": quantity})
+        return order_id
+
+    bot.kite_client.place_market_exit = filled_at_once
+    assert bot.square_off(workers=1) == 1
+    assert exits == ["square_off"] and SYMBOL not in bot.active_positions
+
+
+def test_mis_positions_keep_sl_orders(make_bot, gtt_config, monkeypatch):
+    monkeypatch.setattr(config, "PRODUCT", "MIS")
+    bot = make_bot()
+    position = open_position(bot)
+    assert bot.kite_client.calls[0][0] == "place"
+    assert position['sl_order_id'] and position['gtt_id'] is None
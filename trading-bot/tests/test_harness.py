@@ -0,0 +1,70 @@
+import logging
+import threading
+from collections import defaultdict
+import pytest
+from src import config
+from src.simulator.harness import TRADING_DAY_SECONDS, TradingDaySimulation
+from src.utils.clock import VirtualClock
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    # A day of INFO logs is most of the run time
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def simulate(state_file, seed=3, **run):
+    sim = TradingDaySimulation(str(state_file), seed=seed)
+    return sim, sim.run(**run)
+
+
+def test_virtual_clock_sleep_and_wait_move_time_without_blocking():
+    clock = VirtualClock(1000.0)
+    clock.sleep(10)
+    assert clock.time() == clock.monotonic() == 1010.0
+
+    stop = threading.Event()
+    assert clock.wait(stop, 30) is False and clock.time() == 1040.0
+    stop.set()
+    assert clock.wait(stop, 30) is True and clock.time() == 1040.0  # Set events don't wait
+
+
+def test_full_trading_day_runs_in_virtual_time_deterministically(tmp_path):
+    sim, stats = simulate(tmp_path / "first.json", tick_interval=2.0, disconnect_every=1800)
+
+    # The whole 6h15m session passed on the virtual clock, one tick every 2s
+    assert stats["virtual_seconds"] == TRADING_DAY_SECONDS
+    assert sim.clock.time() == sim.started_at + TRADING_DAY_SECONDS
+    assert sim.ticks_sent >= TRADING_DAY_SECONDS / 2.0
+    assert stats["orders_placed"] > 10 and stats["orders_modified"] > 0 and stats["rate_limited"] == 0
+
+    _, again = simulate(tmp_path / "second.json", tick_interval=2.0, disconnect_every=1800)
+    assert again == stats
+
+
+def test_modifies_per_order_respect_throttle_in_virtual_time(tmp_path):
+    sim, stats = simulate(tmp_path / "state.json", seconds=2 * 3600, tick_interval=0.5)
+    modified_at = defaultdict(list)
+    for at, route, order_id in sim.kite.order_log:
+        if route == "order.modify":
+            modified_at[order_id].append(at)
+
+    gaps = [later - earlier for times in modified_at.values() for earlier, later in zip(times, times[1:])]
+    assert gaps and min(gaps) >= config.THROTTLE_SECONDS
+
+
+def test_ticks_resume_after_each_dropped_connection(tmp_path):
+    sim, stats = simulate(tmp_path / "state.json", seconds=3600, disconnect_every=600)
+
+    assert stats["connections"] >= 6  # Every drop reconnected after its (virtual) 10s back-off
+    ticker = sim.ticker
+    assert ticker.connected
+    # The new connection carries every position the bot is still trailing
+    tokens = {sim.bot.get_instrument_token(symbol) for symbol in sim.bot.active_positions}
+    assert tokens and tokens == set(ticker.modes)
+
+    before = stats["ticks"]
+    sim.run(seconds=10)
+    assert sim.ticks_sent > before
@@ -0,0 +1,91 @@
+import datetime
+import sqlite3
+import pytest
+from src import config
+from src.journal import TradeJournal, query_trades, summarize
+
+SYMBOL = "NIFTY24DEC25000CE"
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = TradeJournal(str(tmp_path / "trades.db"))
+    yield journal
+    journal.close()
+
+
+def journaled_bot(make_bot, journal, monkeypatch):
+    monkeypatch.setattr(config, "THROTTLE_SECONDS", 0)
+    bot = make_bot()
+    bot.journal = journal
+    bot.start_market_websocket = lambda: None
+    bot.start_trailing_for_position(SYMBOL, 100.0, 75)
+    return bot
+
+
+def test_trade_lifecycle_is_journaled(make_bot, journal, monkeypatch):
+    bot = journaled_bot(make_bot, journal, monkeypatch)
+    position = bot.active_positions[SYMBOL]
+    sl_order_id = position['sl_order_id']
+    for ltp in (114.0, 120.0, 124.0):  # First target, then two trail steps
+        bot.process_price_update(SYMBOL, position, ltp)
+    exit_trigger = position['sl_trigger']
+    bot.process_price_update(SYMBOL, position, exit_trigger - 0.5)  # LTP through the SL
+    assert SYMBOL not in bot.active_positions
+
+    # The SL's fill arrives after the position was dropped - it sets the real exit price
+    bot.handle_order_update({"status": "COMPLETE", "transaction_type": "SELL", "order_type": "SL",
+                             "tradingsymbol": SYMBOL, "order_id": sl_order_id, "average_price": exit_trigger - 0.3})
+    assert journal.flush()
+
+    [trade] = query_trades(journal.path)
+    assert trade['exit_reason'] == "ltp_below_sl"
+    assert trade['initial_sl'] == pytest.approx(100 - 500 / 75, abs=0.01)
+    assert trade['modifies'] == 3
+    assert trade['exit_price'] == pytest.approx(exit_trigger - 0.3)
+    assert trade['slippage'] == pytest.approx(-0.3)
+    assert trade['realized_pnl'] == pytest.approx((exit_trigger - 0.3 - 100.0) * 75)
+    assert trade['seconds_in_trade'] >= 0
+    kinds = [row[0] for row in sqlite3.connect(journal.path).execute("SELECT kind FROM events ORDER BY id")]
+    assert kinds == ["entry", "sl_placed", "target_hit", "sl_modified", "sl_modified", "sl_modified", "exit", "fill"]
+
+
+def test_market_exit_fill_matched_by_symbol(make_bot, journal, monkeypatch):
+    bot = journaled_bot(make_bot, journal, monkeypatch)
+    bot.handle_order_update({"status": "COMPLETE", "transaction_type": "SELL", "order_type": "MARKET",
+                             "tradingsymbol": SYMBOL, "order_id": "EXIT0", "average_price": 102.0, "filled_quantity": 25})
+    assert journal.flush()
+    assert query_trades(journal.path)[0]['exit_price'] is None  # A partial sell closes nothing
+
+    bot.handle_order_update({"status": "COMPLETE", "transaction_type": "SELL", "order_type": "MARKET",
+                             "tradingsymbol": SYMBOL, "order_id": "EXIT1", "average_price": 104.0, "filled_quantity": 75})
+    assert journal.flush()
+    [trade] = query_trades(journal.path)
+    assert (trade['exit_price'], trade['realized_pnl']) == (104.0, 300.0)
+
+
+def test_summaries_filter_and_group_on_indexes(journal):
+    # 00:30 IST is still the previous day in UTC - trades bucket by exchange day regardless of the host
+    days = {day: datetime.datetime.fromisoformat(f"{day} 00:30+05:30").timestamp() for day in ("2024-01-02", "2024-02-01")}
+    for n, (symbol, opened_at, exit_price) in enumerate([
+        ("NIFTY24JAN21000CE", days["2024-01-02"], 110.0),
+        ("BANKNIFTY24JAN47000PE", days["2024-01-02"], 95.0),
+        ("NIFTY24FEB21500CE", days["2024-02-01"], 120.0),
+    ]):
+        position = {"symbol": symbol, "opened_at": opened_at, "buy_price": 100.0, "quantity": 75}
+        journal.record("entry", position, "AB1234", 100.0)
+        journal.record("sl_placed", position, "AB1234", 90.0, f"ORD{n}")
+        journal.record("exit", position, "AB1234", exit_price, reason="sl_order")
+    assert journal.flush()
+
+    by_underlying = {row['underlying']: row for row in summarize(journal.path, group_by="underlying")}
+    assert by_underlying["NIFTY"]['trades'] == 2 and by_underlying["NIFTY"]['realized_pnl'] == 2250.0
+    assert by_underlying["BANKNIFTY"]['win_rate'] == 0.0
+    assert by_underlying["NIFTY"]['avg_slippage'] == pytest.approx(25.0)
+
+    january = summarize(journal.path, start="2024-01-01", end="2024-01-31", underlying="NIFTY")
+    assert [(row['day'], row['trades']) for row in january] == [("2024-01-02", 1)]
+
+    plan = " ".join(str(row) for row in sqlite3.connect(journal.path).execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM trades WHERE underlying = ? AND day >= ?", ("NIFTY", "2024-01-01")))
+    assert "trades_underlying_day" in plan
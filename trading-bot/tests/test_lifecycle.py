@@ -0,0 +1,117 @@
+import logging
+import os
+import tracemalloc
+from src.lifecycle import PositionLifecycle
+from src.simulator.harness import TradingDaySimulation
+from src.utils.clock import VirtualClock
+from src.utils.file_helpers import load_state, save_state
+
+SYMBOL = "NIFTY24DEC25000CE"
+OTHER = "NIFTY24DEC25100CE"
+
+
+def open_positions(make_bot, *symbols):
+    bot = make_bot(tokens={symbol: 11 + i for i, symbol in enumerate(symbols)})
+    bot.clock = VirtualClock(1000.0)
+    bot.start_market_websocket = lambda: None
+    for symbol in symbols:
+        bot.start_trailing_for_position(symbol, 100.0, 75)
+    return bot
+
+
+def sell(symbol, quantity, order_id="MANUAL1"):
+    return {"status": "COMPLETE", "transaction_type": "SELL", "order_type": "MARKET", "tradingsymbol": symbol,
+            "order_id": order_id, "quantity": quantity, "filled_quantity": quantity, "average_price": 104.0}
+
+
+def test_manual_sell_postback_retires_position_and_cancels_its_stop(make_bot):
+    bot = open_positions(make_bot, SYMBOL)
+    stop = bot.active_positions[SYMBOL]['sl_order_id']
+
+    bot.handle_order_update(sell(SYMBOL, 25))  # Partial - still trailed
+    assert SYMBOL in bot.active_positions
+
+    bot.handle_order_update(sell(SYMBOL, 75, "MANUAL2"))
+    assert SYMBOL not in bot.active_positions and SYMBOL not in bot.state['active_positions']
+    assert ("cancel", stop) in bot.kite_client.calls  # Left alone it would sell a second time
+
+
+def test_reconcile_retires_positions_flat_at_broker_and_reclaims_orphans(make_bot):
+    bot = open_positions(make_bot, SYMBOL, OTHER)
+    bot.kite_client.get_positions = lambda: {"net": [{"tradingsymbol": OTHER, "quantity": 75}]}
+    bot.state['active_positions']["NIFTY24DEC24000CE"] = {"buy_price": 90.0, "quantity": 75}  # Leaked entry
+    bot.token_to_symbol[99] = "NIFTY24DEC24000CE"
+    lifecycle = PositionLifecycle(bot, interval=60, clock=bot.clock)
+
+    assert lifecycle.step() == 60
+    bot.clock.advance(60)
+    lifecycle.step()
+    assert list(bot.active_positions) == [OTHER]
+    assert list(bot.state['active_positions']) == [OTHER] and 99 not in bot.token_to_symbol
+    assert ("cancel", "ORD1") in bot.kite_client.calls
+
+
+def test_restore_drops_closed_positions_from_state(make_bot, tmp_path):
+    state_file = tmp_path / "state_AB1234.json"
+    save_state({"active_positions": {
+        SYMBOL: {"buy_price": 100.0, "quantity": 75, "sl_order_id": "OLD1", "sl_trigger": 93.0},
+        OTHER: {"buy_price": 100.0, "quantity": 75, "sl_order_id": "OLD2", "sl_trigger": 93.0},
+    }}, str(state_file))
+    bot = make_bot(tokens={SYMBOL: 11, OTHER: 12})
+    bot.kite_client.get_positions = lambda: {"net": [{"tradingsymbol": OTHER, "quantity": 75}]}
+
+    bot.restore_positions()
+    assert list(bot.active_positions) == [OTHER]
+    assert list(load_state(str(state_file))['active_positions']) == [OTHER]
+    assert bot.kite_client.calls == [("cancel", "OLD1")]
+
+
+def current_rss() -> int:
+    """Resident set size now (not the peak), in bytes"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def bookkeeping(bot) -> dict:
+    return {"positions": len(bot.active_positions), "state": len(bot.state['active_positions']),
+            "token_to_symbol": len(bot.token_to_symbol), "subscribed": len(bot.subscribed_tokens),
+            "watermarks": len(bot.dispatcher.watermarks), "rules_cache": len(bot.rules.table._cache)}
+
+
+def test_soak_multi_day_memory_and_bookkeeping_stay_flat(tmp_path):
+    logging.disable(logging.INFO)
+    # A small universe, so every symbol has been traded (and its strings and
+    # rule resolution cached) by the end of day one
+    sim = TradingDaySimulation(str(tmp_path / "state.json"), seed=5, instruments=20)
+    bot = sim.bot
+    # Bot-side allocations only - the simulated exchange keeps every order it ever saw
+    bot_code = (tracemalloc.Filter(True, "*/src/*"), tracemalloc.Filter(False, "*/src/simulator/*"))
+    traced, rss, sizes = [], [], []
+    tracemalloc.start()
+    try:
+        for day in range(10):
+            sim.run(seconds=1800, tick_interval=2.0, close_every=300)  # Six positions sold by hand a day
+            sim.next_day()
+
+            snapshot = tracemalloc.take_snapshot().filter_traces(bot_code)
+            traced.append(sum(stat.size for stat in snapshot.statistics("filename")))
+            if os.path.exists("/proc/self/statm"):
+                rss.append(current_rss())
+            sizes.append(bookkeeping(bot))
+            # Every hand-sold position was let go; bookkeeping never outgrows what is open
+            assert all(sim.exchange.positions[symbol]["quantity"] > 0 for symbol in bot.active_positions)
+    finally:
+        tracemalloc.stop()
+        logging.disable(logging.NOTSET)
+
+    assert sim.exchange.counters["fills"] > 100
+    # Every structure is bounded by the open book or the universe - nothing accumulates per day
+    for day in sizes:
+        assert day["state"] == day["token_to_symbol"] == day["subscribed"] == day["positions"] <= 5
+        assert day["watermarks"] <= day["positions"]
+        assert day["rules_cache"] <= 20  # One entry per instrument, at most
+    # The first days warm per-symbol caches; after that ~40 retired positions
+    # leave next to nothing behind (one leaked position is several KiB)
+    assert traced[-1] - traced[3] < 12 * 1024
+    if rss:
+        assert rss[-1] - rss[3] < 4 * 1024 * 1024
@@ -0,0 +1,77 @@
+import io
+import json
+import logging
+import pytest
+from src.utils.logging_setup import JsonFormatter, SamplingFilter, setup_logging, stop_logging
+
+
+def make_record(msg, *args, **extra):
+    record = logging.LogRecord("src.bot", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_sampling_keeps_one_record_per_symbol_per_interval():
+    now = [0.0]
+    sampler = SamplingFilter(5.0, clock=lambda: now[0])
+    msg = "%s: SL update %.2f"
+
+    assert sampler.filter(make_record(msg, "A", 1.0, symbol="A", sample=True))
+    assert not sampler.filter(make_record(msg, "A", 2.0, symbol="A", sample=True))
+    assert not sampler.filter(make_record(msg, "A", 3.0, symbol="A", sample=True))
+    # Other symbols and unsampled records are independent
+    assert sampler.filter(make_record(msg, "B", 1.0, symbol="B", sample=True))
+    assert sampler.filter(make_record(msg, "A", 4.0, symbol="A"))
+
+    now[0] = 5.0
+    record = make_record(msg, "A", 5.0, symbol="A", sample=True)
+    assert sampler.filter(record)
+    assert record.suppressed == 2
+
+
+def test_json_formatter_carries_context_fields():
+    record = make_record("New BUY %s @ %s", "NIFTY24DEC25000CE", 100.0,
+                         symbol="NIFTY24DEC25000CE", order_id="ORD1")
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["msg"] == "New BUY NIFTY24DEC25000CE @ 100.0"
+    assert entry["symbol"] == "NIFTY24DEC25000CE"
+    assert entry["order_id"] == "ORD1"
+    assert "user_id" not in entry
+
+
+class Unformattable:
+    """Fails if rendered on the calling thread"""
+
+    def __init__(self):
+        self.caller_thread_done = False
+
+    def __str__(self):
+        assert self.caller_thread_done
+        return "rendered"
+
+
+@pytest.fixture
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    stop_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_records_are_formatted_by_the_writer_thread(restore_root_logger):
+    stream = io.StringIO()
+    listener = setup_logging("INFO", "json", sample_seconds=5.0, stream=stream)
+    listener.stop()  # Hold records in the queue so the caller's side can be checked
+
+    value = Unformattable()
+    logging.getLogger("src.bot").info("value=%s", value, extra={"symbol": "X"})
+    logging.getLogger("src.bot").debug("below level %s", value)
+    assert stream.getvalue() == ""
+
+    value.caller_thread_done = True
+    listener.start()
+    stop_logging()
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(line["msg"], line["symbol"]) for line in lines] == [("value=rendered", "X")]
@@ -0,0 +1,119 @@
+import datetime
+import pytest
+from src.market_hours import CLOSE, OPEN, PREWARM, SQUARE_OFF, MarketCalendar, MarketScheduler
+from src.utils.clock import VirtualClock
+
+SYMBOLS = ["NIFTY24DEC25000CE", "NIFTY24DEC25100CE", "NIFTY24DEC25200CE"]
+MONDAY = datetime.date(2026, 1, 5)
+
+
+@pytest.fixture
+def calendar():
+    return MarketCalendar(holidays=["2026-01-07"], sessions={"2026-01-10": ("18:00", "19:00")})
+
+
+def at(calendar, day, hhmm):
+    return datetime.datetime.combine(day, datetime.datetime.strptime(hhmm, "%H:%M").time(), calendar.tz).timestamp()
+
+
+class RecordingBot:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def resume_market_data(self):
+        self.calls.append("resume")
+
+    def pause_market_data(self):
+        self.calls.append("pause")
+
+    def square_off(self):
+        self.calls.append("square_off")
+        return 1
+
+
+def test_calendar_sessions_skip_weekends_and_holidays(calendar):
+    assert calendar.session(MONDAY) == (at(calendar, MONDAY, "09:15"), at(calendar, MONDAY, "15:30"))
+    assert calendar.session(datetime.date(2026, 1, 7)) is None  # Holiday
+    assert calendar.session(datetime.date(2026, 1, 11)) is None  # Sunday
+    special = datetime.date(2026, 1, 10)  # A Saturday with its own session
+    assert calendar.is_open(at(calendar, special, "18:30")) and not calendar.is_open(at(calendar, special, "10:00"))
+    assert not calendar.is_open(at(calendar, MONDAY, "15:30"))
+
+
+def test_scheduler_walks_a_trading_day_and_sleeps_through_the_weekend(calendar):
+    clock = VirtualClock(at(calendar, MONDAY, "08:00"))
+    calls, warmed = [], []
+    scheduler = MarketScheduler(calendar, lambda: [RecordingBot(calls)], warm=lambda: warmed.append(clock.time()),
+                                clock=clock, prewarm_seconds=600, square_off_seconds=900, square_off=True)
+    scheduler.sync()
+    assert calls == ["pause"]  # Before the pre-warm window
+
+    fired = []
+    while clock.time() < at(calendar, MONDAY, "16:00"):
+        clock.advance(scheduler.step())
+        fired.append((datetime.datetime.fromtimestamp(clock.time(), calendar.tz).strftime("%H:%M"), list(calls)))
+        calls.clear()
+    assert [when for when, _ in fired[:4]] == ["09:05", "09:15", "15:15", "15:30"]
+    assert warmed == [at(calendar, MONDAY, "09:05")]
+    assert scheduler.events(MONDAY)[-2:] == [(at(calendar, MONDAY, "15:15"), SQUARE_OFF), (at(calendar, MONDAY, "15:30"), CLOSE)]
+
+    # Friday's close to Monday's pre-warm is one wait, skipping the weekend
+    clock.now = at(calendar, datetime.date(2026, 1, 9), "15:31")
+    scheduler.step()
+    assert scheduler.step() == at(calendar, datetime.date(2026, 1, 10), "17:50") - clock.time()  # Special session
+    assert [event for _, event in scheduler.events(datetime.date(2026, 1, 10))] == [PREWARM, OPEN, SQUARE_OFF, CLOSE]
+
+
+def test_accounts_failing_prewarm_stay_paused_through_the_open(calendar):
+    clock = VirtualClock(at(calendar, MONDAY, "09:00"))
+    good_calls, bad_calls = [], []
+    good, bad = RecordingBot(good_calls), RecordingBot(bad_calls)
+    results = iter([[bad], RuntimeError("instrument dump and sessions both down")])
+
+    def warm():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    scheduler = MarketScheduler(calendar, lambda: [good, bad], warm=warm, clock=clock,
+                                prewarm_seconds=600, square_off=False)
+    scheduler.sync()
+    for hhmm in ("09:05", "09:15"):
+        clock.now = at(calendar, MONDAY, hhmm)
+        scheduler.step()
+    assert good_calls == ["pause", "resume", "resume"]
+    assert bad_calls == ["pause"]  # An expired token never reconnects
+
+    # Nothing is known to be good when the warm-up itself fails
+    good_calls.clear()
+    bad_calls.clear()
+    clock.now = at(calendar, datetime.date(2026, 1, 6), "09:15")
+    scheduler.step()
+    assert good_calls == bad_calls == ["pause"]  # Monday's close, then no resume
+
+
+def test_restart_inside_square_off_window_squares_off_at_once(calendar):
+    calls = []
+    clock = VirtualClock(at(calendar, MONDAY, "15:20"))
+    MarketScheduler(calendar, lambda: [RecordingBot(calls)], clock=clock, square_off=True).sync()
+    assert calls == ["square_off"]
+
+
+def test_square_off_cancels_and_exits_every_position(make_bot):
+    bot = make_bot()
+    bot.start_market_websocket = lambda: None
+    for symbol in SYMBOLS:
+        bot.start_trailing_for_position(symbol, 100.0, 75)
+    sl_orders = {bot.active_positions[symbol]['sl_order_id'] for symbol in SYMBOLS}
+    bot.kite_client.calls.clear()
+
+    assert bot.square_off(workers=3) == 3
+    assert not bot.active_positions and not bot.state['active_positions']
+    assert {call[1] for call in bot.kite_client.calls if call[0] == "cancel"} == sl_orders
+    assert sorted(call[1] for call in bot.kite_client.calls if call[0] == "exit") == SYMBOLS
+
+    # Ticks are ignored until the next session resumes the tick path
+    assert bot._market_paused.is_set()
+    bot.resume_market_data()
+    assert not bot._market_paused.is_set()
@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import pytest
+from src.price_board import _HEADER, MAGIC, PriceBoard, PriceBoardReader
+
+SYMBOL = "NIFTY24DEC25000CE"
+TOKEN = 1001
+
+
+@pytest.fixture
+def board():
+    board = PriceBoard(f"kpb_test_{os.getpid()}", capacity=4)
+    yield board
+    board.close()
+
+
+def test_publish_read_and_slot_reuse(board):
+    reader = PriceBoardReader(board.name)
+    board.publish(11, 101.5, 1000.0, 95.0)
+    board.publish(12, 55.0, 1001.0)
+    board.publish(11, 102.0, 1002.0, 96.0)
+    assert reader.get(11) == {"ltp": 102.0, "ts": 1002.0, "sl_trigger": 96.0}
+    assert set(reader.snapshot()) == {11, 12}
+
+    board.remove(11)
+    assert reader.get(11) is None
+    for token in (13, 14, 15):
+        board.publish(token, 1.0, 1.0)
+    board.publish(16, 1.0, 1.0)  # Board full - dropped, not raised
+    assert set(reader.snapshot()) == {12, 13, 14, 15}
+    reader.close()
+
+
+def _read_slots(name, reads, results):
+    reader = PriceBoardReader(name)
+    torn = seen = 0
+    for _ in range(reads):
+        price = reader.get(TOKEN)
+        if price:
+            seen += 1
+            # The writer always writes ltp == ts == sl_trigger - any mix is a torn read
+            torn += not (price["ltp"] == price["ts"] == price["sl_trigger"])
+    reader.close()
+    results.put((seen, torn))
+
+
+def test_live_board_is_never_taken_over_but_a_dead_writers_is(board):
+    with pytest.raises(FileExistsError, match=str(os.getpid())):
+        PriceBoard(board.name, capacity=4)
+    board.publish(11, 101.5, 1000.0)
+    reader = PriceBoardReader(board.name)
+    assert reader.get(11)["ltp"] == 101.5  # Still the live writer's board
+    reader.close()
+
+    exited = multiprocessing.Process(target=int)
+    exited.start()
+    exited.join()
+    _HEADER.pack_into(board.buf, 0, MAGIC, 4, exited.pid)  # As if that writer had crashed
+    successor = PriceBoard(board.name, capacity=4)
+    reader = PriceBoardReader(board.name)
+    try:
+        assert reader.get(11) is None  # A fresh board
+    finally:
+        reader.close()
+        successor.close()
+
+
+def test_reader_in_another_process_never_sees_a_torn_slot(board):
+    board.publish(TOKEN, 0.0, 0.0, 0.0)
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    reader = context.Process(target=_read_slots, args=(board.name, 20000, results))
+    reader.start()
+    value = 0.0
+    while reader.is_alive():
+        value += 1
+        board.publish(TOKEN, value, value, value)
+    seen, torn = results.get(timeout=10)
+    reader.join()
+    # A read may give up while the writer spins on one slot, but never returns a mix
+    assert seen > 19000 and torn == 0
+
+
+def test_bot_publishes_ltp_and_sl_and_clears_closed_positions(make_bot, board):
+    bot = make_bot(tokens={SYMBOL: TOKEN})
+    bot.price_board = board
+    bot.start_market_websocket = lambda: None
+    bot.start_trailing_for_position(SYMBOL, 100.0, 75)
+    bot.token_to_symbol[TOKEN] = SYMBOL  # What subscribe_to_symbol maps once the ticker is up
+    reader = PriceBoardReader(board.name)
+
+    bot.handle_ticks([{"instrument_token": TOKEN, "last_price": 101.0}])
+    price = reader.get(TOKEN)
+    assert price["ltp"] == 101.0 and price["sl_trigger"] == bot.active_positions[SYMBOL]["sl_trigger"]
+
+    bot.handle_ticks([{"instrument_token": TOKEN, "last_price": 90.0}])  # Below the SL - position dropped
+    assert SYMBOL not in bot.active_positions and reader.get(TOKEN) is None
+    reader.close()
@@ -0,0 +1,43 @@
+import threading
+from src.utils.profiler import MIN_INTERVAL, SamplingProfiler, memory_report, profile_for, stop_memory_tracing
+
+
+def busy_tick_loop(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(200))
+
+
+def test_profile_collapses_stacks_per_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_tick_loop, args=(stop,), name="ticker")
+    worker.start()
+    try:
+        profiler = profile_for(0.3, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert profiler.samples > 10
+    lines = profiler.collapsed().splitlines()
+    ticker = [line for line in lines if line.startswith("ticker;")]
+    assert ticker and any("busy_tick_loop (test_profiler.py:" in line for line in ticker)
+    stack, count = ticker[0].rsplit(" ", 1)
+    assert int(count) > 0 and "profiler" not in stack.split(";")[0]
+
+
+def test_sampling_interval_has_a_floor():
+    # interval_ms=0.001 from the admin endpoint must not become a GIL-holding spin
+    assert SamplingProfiler(interval=1e-6).interval == MIN_INTERVAL
+
+
+def test_memory_report_shows_growth_between_calls():
+    try:
+        first = memory_report(top=5)
+        assert first["tracing_started"] and first["growth"] == []
+        hoard = [bytearray(1024) for _ in range(2000)]  # ~2 MB from one line
+        second = memory_report(top=5)
+        assert not second["tracing_started"]
+        assert "test_profiler.py:" in second["growth"][0]["where"] and second["growth"][0]["bytes_diff"] > 1_000_000
+        del hoard
+    finally:
+        stop_memory_tracing()
@@ -0,0 +1,56 @@
+import pytest
+from src.utils.rate_limiter import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_burst_up_to_capacity_then_refuse():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=3, clock=clock, sleep=clock.sleep)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=1, clock=clock, sleep=clock.sleep)
+    assert bucket.try_acquire()
+    clock.now += 0.05
+    assert not bucket.try_acquire()
+    clock.now += 0.05
+    assert bucket.try_acquire()
+
+
+@pytest.mark.parametrize("rate, requests, expected_seconds", [
+    (10, 1, 0.0),    # First request uses the initial token
+    (10, 11, 1.0),   # 10 more tokens take one second to refill
+    (2, 5, 2.0),     # 4 extra tokens at 2/s
+])
+def test_acquire_waits_for_tokens(rate, requests, expected_seconds):
+    clock = FakeClock()
+    bucket = TokenBucket(rate=rate, capacity=1, clock=clock, sleep=clock.sleep)
+    for _ in range(requests):
+        bucket.acquire()
+    assert clock.now == pytest.approx(expected_seconds)
+
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_rejects_non_positive_rate(rate):
+    with pytest.raises(ValueError):
+        TokenBucket(rate=rate)
+
+
+def test_try_acquire_many_is_all_or_nothing():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=2, clock=clock, sleep=clock.sleep)
+    assert not bucket.try_acquire(3)
+    assert bucket.try_acquire(2)
+    assert not bucket.try_acquire(1)
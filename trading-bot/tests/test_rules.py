@@ -0,0 +1,97 @@
+import json
+import os
+import pytest
+from src.rules import RuleStore, RuleTable, parse_symbol
+
+DEFAULTS = {
+    "lot_size": 75,
+    "risk_rupees": 500.0,
+    "reward_rupees": 1000.0,
+    "trail_rupees": 250.0,
+    "risk_mode": "PER_LOT",
+    "first_target_sl_mode": "MIDPOINT",
+}
+
+
+@pytest.mark.parametrize("symbol, expected", [
+    ("NIFTY24JAN25000CE", ("NIFTY", "24JAN", 25000.0, "CE")),       # Monthly option
+    ("NIFTY2410325000PE", ("NIFTY", "24103", 25000.0, "PE")),       # Weekly option (YY M DD)
+    ("BANKNIFTY24N2751000CE", ("BANKNIFTY", "24N27", 51000.0, "CE")),
+    ("M&M24DEC3000CE", ("M&M", "24DEC", 3000.0, "CE")),
+    ("NIFTY24JANFUT", ("NIFTY", "24JAN", None, "FUT")),
+])
+def test_parse_symbol(symbol, expected):
+    parts = parse_symbol(symbol)
+    assert (parts["underlying"], parts["expiry"], parts["strike"], parts["kind"]) == expected
+
+
+def test_parse_symbol_rejects_non_derivatives():
+    assert parse_symbol("RELIANCE") is None
+
+
+@pytest.mark.parametrize("scenario, symbol, segment, expected", [
+    ("no rule matches - defaults", "FINNIFTY24JAN20000CE", "NFO", {"risk_rupees": 500.0, "trail_rupees": 250.0}),
+    ("underlying rule", "BANKNIFTY24JAN50000CE", "NFO", {"risk_rupees": 800.0, "trail_rupees": 400.0}),
+    ("specific expiry rule layers on underlying rule", "BANKNIFTY24N2750000CE", "NFO",
+     {"risk_rupees": 800.0, "trail_rupees": 100.0, "first_target_sl_mode": "BUY"}),
+    ("segment rule", "SENSEX24JAN80000CE", "BFO", {"lot_size": 20}),
+    ("segment must match", "SENSEX24JAN80000CE", "NFO", {"lot_size": 75}),
+])
+def test_rule_resolution(scenario, symbol, segment, expected):
+    table = RuleTable([
+        {"underlying": "BANKNIFTY", "expiry": "[0-9][0-9][1-9OND][0-9][0-9]", "trail_rupees": 100, "first_target_sl_mode": "buy"},
+        {"underlying": "BANKNIFTY", "risk_rupees": 800, "trail_rupees": 400},
+        {"underlying": "SENSEX", "segment": "BFO", "lot_size": 20},
+    ], DEFAULTS)
+    params = table.resolve(symbol, segment)
+    for key, value in expected.items():
+        assert params[key] == value, f"Failed in scenario: {scenario}"
+
+
+def test_resolve_returns_copies():
+    table = RuleTable([], DEFAULTS)
+    table.resolve("NIFTY24JAN25000CE")["risk_rupees"] = 1
+    assert table.resolve("NIFTY24JAN25000CE")["risk_rupees"] == 500.0
+
+
+def test_unknown_rule_keys_rejected():
+    with pytest.raises(ValueError, match="unknown keys"):
+        RuleTable([{"underlying": "NIFTY", "risk": 100}], DEFAULTS)
+
+
+def write_rules(path, rules, mtime):
+    path.write_text(json.dumps(rules))
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_store_reloads_on_change_and_keeps_table_on_bad_file(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, [{"underlying": "NIFTY", "risk_rupees": 600}], 1_000_000_000)
+    store = RuleStore(str(path), DEFAULTS)
+    opened_with = store.resolve("NIFTY24JAN25000CE")
+    assert opened_with["risk_rupees"] == 600.0
+
+    assert not store.reload()  # Unchanged file is not re-read
+
+    write_rules(path, [{"underlying": "NIFTY", "risk_rupees": 700}], 2_000_000_000)
+    assert store.reload()
+    assert store.resolve("NIFTY24JAN25000CE")["risk_rupees"] == 700.0
+    assert opened_with["risk_rupees"] == 600.0  # Already-open positions keep their params
+
+    path.write_text("[{broken")
+    os.utime(path, ns=(3_000_000_000, 3_000_000_000))
+    assert not store.reload()
+    assert store.resolve("NIFTY24JAN25000CE")["risk_rupees"] == 700.0
+
+
+def test_position_keeps_params_across_reload(make_bot, tmp_path):
+    bot = make_bot()
+    bot.start_market_websocket = lambda: None
+    bot.rules.table = RuleTable([{"underlying": "NIFTY", "risk_rupees": 750}], DEFAULTS)
+    bot.start_trailing_for_position("NIFTY24JAN25000CE", 100.0, 75)
+    bot.rules.table = RuleTable([{"underlying": "NIFTY", "risk_rupees": 1500}], DEFAULTS)
+
+    position = bot.active_positions["NIFTY24JAN25000CE"]
+    assert position["params"]["risk_rupees"] == 750
+    assert position["sl_trigger"] == pytest.approx(90.0)
+    assert bot.state["active_positions"]["NIFTY24JAN25000CE"]["params"]["risk_rupees"] == 750
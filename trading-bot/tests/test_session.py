@@ -0,0 +1,91 @@
+import datetime
+import pytest
+from kiteconnect.exceptions import TokenException
+from src import config
+from src import session
+from src.session import SessionCache, SessionError, SessionValidator
+
+
+class FakeKite:
+    def __init__(self, access_token="tok-1"):
+        self.api_key = "key"
+        self.access_token = access_token
+
+
+class ProfileClient:
+    """Counts profile() calls; optionally rejects the token"""
+
+    def __init__(self, user_id="AB1234", profile_user_id=None, error=None, access_token="tok-1"):
+        self.user_id = user_id
+        self.kite = FakeKite(access_token)
+        self.profile_user_id = profile_user_id or user_id
+        self.error = error
+        self.profile_calls = 0
+
+    def get_profile(self):
+        self.profile_calls += 1
+        if self.error:
+            raise self.error
+        return {"user_id": self.profile_user_id}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SessionCache(str(tmp_path / "sessions"), ttl=300)
+
+
+def test_valid_session_is_shared_through_cache(cache):
+    first = ProfileClient()
+    assert SessionValidator(first, cache).start().wait(5) == session.VALID
+
+    # A second process with the same token reuses the validation
+    second = ProfileClient()
+    assert SessionValidator(second, cache).validate() == session.VALID
+    assert (first.profile_calls, second.profile_calls) == (1, 0)
+
+
+def test_new_token_is_revalidated(cache):
+    SessionValidator(ProfileClient(access_token="tok-1"), cache).validate()
+    client = ProfileClient(access_token="tok-2")
+    SessionValidator(client, cache).validate()
+    assert client.profile_calls == 1
+
+
+def test_rejected_token_fails_fast_with_status(cache):
+    client = ProfileClient(error=TokenException("Incorrect `api_key` or `access_token`."))
+    validator = SessionValidator(client, cache).start()
+    with pytest.raises(SessionError) as excinfo:
+        validator.wait(5)
+    assert excinfo.value.status == session.REJECTED
+    assert "pdm run auth --account AB1234" in str(excinfo.value)
+    # Failures are not cached - the next start checks again
+    with pytest.raises(SessionError):
+        SessionValidator(client, cache).validate()
+    assert client.profile_calls == 2
+
+
+def test_token_for_wrong_account_is_rejected(cache):
+    with pytest.raises(SessionError) as excinfo:
+        SessionValidator(ProfileClient(profile_user_id="ZZ9999"), cache).validate()
+    assert excinfo.value.status == session.REJECTED
+
+
+def test_network_failure_is_reported_as_error(cache):
+    with pytest.raises(SessionError) as excinfo:
+        SessionValidator(ProfileClient(error=ConnectionError("timed out")), cache).validate()
+    assert excinfo.value.status == session.ERROR
+
+
+def test_env_credentials_never_prompt(monkeypatch):
+    monkeypatch.setattr(config, "API_KEY", "key")
+    monkeypatch.setattr(config, "ACCESS_TOKEN", "tok")
+    monkeypatch.setattr("builtins.input", lambda *a: pytest.fail("prompted for input"))
+
+    yesterday = (datetime.date.today() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+    monkeypatch.setattr(config, "ACCESS_TOKEN_DATE", yesterday)
+    with pytest.raises(SessionError) as excinfo:
+        session.env_credentials()
+    assert excinfo.value.status == session.EXPIRED
+
+    monkeypatch.setattr(config, "ACCESS_TOKEN_DATE", datetime.date.today().strftime("%Y-%m-%d"))
+    assert session.env_credentials() == {"api_key": "key", "access_token": "tok"}
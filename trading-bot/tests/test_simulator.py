@@ -0,0 +1,189 @@
+import base64
+import json
+import os
+import socket
+import struct
+import threading
+import pytest
+from kiteconnect import KiteTicker
+from kiteconnect.exceptions import InputException, NetworkException
+from waitress.server import create_server
+from src import config
+from src.kite_client import KiteClient
+from src.simulator.exchange import SimError, SimulatedExchange
+from src.simulator.packets import MODE_FULL, MODE_LTP, MODE_QUOTE, encode_message, encode_tick, nfo_token
+from src.simulator.server import TickerServer, create_rest_app
+
+parse_binary = KiteTicker("key", "token")._parse_binary
+
+
+def test_packets_round_trip_through_kiteticker_parser():
+    message = encode_message([
+        encode_tick(nfo_token(1), 101.25),
+        encode_tick(nfo_token(2), 55.5, MODE_QUOTE),
+        encode_tick(nfo_token(3), 12.05, MODE_FULL, timestamp=1733120000,
+                    depth={"buy": [(12.0, 75, 1)], "sell": [(12.1, 150, 2)]}),
+    ])
+    ltp, quote, full = parse_binary(message)
+    assert (ltp["mode"], ltp["instrument_token"], ltp["last_price"]) == ("ltp", nfo_token(1), 101.25)
+    assert (quote["mode"], quote["last_price"]) == ("quote", 55.5)
+    assert full["mode"] == "full" and full["exchange_timestamp"].timestamp() == 1733120000
+    assert full["depth"]["buy"][0] == {"quantity": 75, "price": 12.0, "orders": 1}
+    assert full["depth"]["sell"][0]["price"] == 12.1
+
+
+@pytest.fixture
+def exchange():
+    updates = []
+    exchange = SimulatedExchange(instruments=4, seed=7, on_order_update=updates.append)
+    exchange.updates = updates
+    return exchange
+
+
+def sl_params(symbol, trigger, limit):
+    return {"tradingsymbol": symbol, "exchange": "NFO", "transaction_type": "SELL", "order_type": "SL",
+            "quantity": 75, "product": "MIS", "trigger_price": trigger, "price": limit}
+
+
+def test_stop_order_triggers_and_fills_with_postback(exchange):
+    inst = exchange.instruments[0]
+    symbol, token = inst["tradingsymbol"], inst["instrument_token"]
+    exchange.place_order({"tradingsymbol": symbol, "transaction_type": "BUY", "order_type": "MARKET",
+                          "quantity": 75, "product": "MIS"})
+    order_id = exchange.place_order(sl_params(symbol, inst["price"] - 1, inst["price"] - 2))
+    assert exchange.orders[order_id]["status"] == "TRIGGER PENDING"
+
+    # Moving the stop above the market fills it immediately
+    exchange.modify_order(order_id, {"trigger_price": inst["price"] + 1, "price": inst["price"] - 5})
+    assert exchange.orders[order_id]["status"] == "COMPLETE"
+    assert [(u["transaction_type"], u["status"]) for u in exchange.updates] == [("BUY", "COMPLETE"), ("SELL", "COMPLETE")]
+    assert exchange.open_positions() == 0
+    assert exchange.tick(token) is not None
+
+
+def test_cancel_and_errors(exchange):
+    symbol = exchange.instruments[1]["tradingsymbol"]
+    order_id = exchange.place_order(sl_params(symbol, 1.0, 0.95))
+    exchange.cancel_order(order_id)
+    assert exchange.updates[-1]["status"] == "CANCELLED"
+    with pytest.raises(SimError):
+        exchange.modify_order(order_id, {"trigger_price": 2.0})
+    with pytest.raises(SimError):
+        exchange.place_order(sl_params("NOPE", 1.0, 0.95))
+
+    exchange.reject_rate = 1.0
+    with pytest.raises(SimError) as excinfo:
+        exchange.place_order(sl_params(symbol, 1.0, 0.95))
+    assert excinfo.value.error_type == "InputException"
+
+
+@pytest.fixture
+def rest(exchange, monkeypatch):
+    server = create_server(create_rest_app(exchange), host="127.0.0.1", port=0, threads=4)
+    threading.Thread(target=server.run, daemon=True).start()
+    monkeypatch.setattr(config, "KITE_API_ROOT", f"http://127.0.0.1:{server.effective_port}")
+    yield server
+    server.close()
+
+
+def test_unmodified_kite_client_against_rest(exchange, rest):
+    client = KiteClient("key", "token")
+    symbol = exchange.instruments[2]["tradingsymbol"]
+
+    assert client.get_profile()["user_id"] == "SIM001"
+    assert len(client.get_instruments("NFO")) == 4
+    token = client.get_ltp(f"NFO:{symbol}")[f"NFO:{symbol}"]["instrument_token"]
+    assert token == exchange.instruments[2]["instrument_token"]
+
+    order_id = client.place_sl_order(symbol, 75, 1.0, 0.95, "MIS")
+    assert client.modify_order(order_id, 1.5, 1.45) == order_id
+    assert exchange.orders[order_id]["trigger_price"] == 1.5
+    assert client.cancel_order(order_id) == order_id
+    with pytest.raises(InputException):
+        client.cancel_order(order_id)
+
+
+def test_gtt_oco_through_rest_triggers_stop_leg(exchange, rest):
+    client = KiteClient("key", "token")
+    inst = exchange.instruments[3]
+    symbol, price = inst["tradingsymbol"], inst["price"]
+    exchange.place_order({"tradingsymbol": symbol, "transaction_type": "BUY", "order_type": "MARKET",
+                          "quantity": 75, "product": "NRML"})
+
+    trigger_id = client.place_gtt_oco(symbol, 75, price - 5, price - 5.05, price + 5, price + 4.95, price, "NRML")
+    with pytest.raises(InputException):
+        # OCO triggers must straddle the last price
+        client.modify_gtt_oco(trigger_id, symbol, 75, price + 1, price + 0.95, price + 5, price + 4.95, price, "NRML")
+    # Raising the stop above the market fires the stop leg as a LIMIT sell
+    client.modify_gtt_oco(trigger_id, symbol, 75, price + 1, price - 1, price + 5, price + 4.95, price + 2, "NRML")
+    assert exchange.gtts[trigger_id]["status"] == "triggered"
+    assert exchange.updates[-1]["transaction_type"] == "SELL" and exchange.updates[-1]["status"] == "COMPLETE"
+    assert exchange.open_positions() == 0
+    with pytest.raises(InputException):
+        client.delete_gtt(trigger_id)
+
+
+def test_rest_enforces_per_key_rate_limit(exchange, rest):
+    exchange._limiters.clear()
+    exchange.order_rate = 1
+    client = KiteClient("key", "token")
+    client.order_limiter.try_acquire = lambda count=1: True  # Client-side budget off - let the server refuse
+    client.order_limiter.acquire = lambda: None
+    symbol = exchange.instruments[0]["tradingsymbol"]
+    client.place_sl_order(symbol, 75, 1.0, 0.95, "MIS")
+    with pytest.raises(NetworkException):
+        client.place_sl_order(symbol, 75, 1.0, 0.95, "MIS")
+    assert exchange.counters["rate_limited"] == 1
+
+
+def ws_connect(port):
+    sock = socket.create_connection(("127.0.0.1", port), timeout=5)
+    key = base64.b64encode(os.urandom(16)).decode()
+    sock.sendall((f"GET /?api_key=k&access_token=t HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\n"
+                  f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+    response = b""
+    while b"\r\n\r\n" not in response:
+        response += sock.recv(1024)
+    assert response.startswith(b"HTTP/1.1 101")
+    return sock
+
+
+def ws_send_text(sock, text):
+    payload = text.encode()
+    mask = os.urandom(4)
+    sock.sendall(struct.pack(">BB", 0x81, 0x80 | len(payload)) + mask +
+                 bytes(b ^ mask[i % 4] for i, b in enumerate(payload)))
+
+
+def ws_recv(sock):
+    def read(n):
+        data = b""
+        while len(data) < n:
+            data += sock.recv(n - len(data))
+        return data
+    first, second = read(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", read(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", read(8))[0]
+    return first & 0x0F, read(length)
+
+
+def test_ticker_streams_subscribed_tokens_in_kite_format(exchange):
+    ticker = TickerServer(exchange, port=0, packet_hz=50, ticks_per_packet=2).start()
+    sock = ws_connect(ticker.port)
+    try:
+        token = exchange.instruments[0]["instrument_token"]
+        ws_send_text(sock, json.dumps({"a": "subscribe", "v": [token]}))
+        ws_send_text(sock, json.dumps({"a": "mode", "v": [MODE_LTP, [token]]}))
+        for _ in range(50):
+            opcode, payload = ws_recv(sock)
+            ticks = parse_binary(payload)
+            if ticks and ticks[0]["mode"] == "ltp":
+                break
+        assert opcode == 0x2
+        assert [t["instrument_token"] for t in ticks] == [token, token]
+    finally:
+        sock.close()
+        ticker.stop()
@@ -0,0 +1,162 @@
+import pytest
+from src import config
+from src.positions import build_position
+from src.replay import replay
+from src.rules import RuleTable
+from src.strategies.engine import StrategyEngine, get_strategy
+
+DEFAULTS = {
+    "lot_size": 75,
+    "risk_rupees": 500.0,
+    "reward_rupees": 1000.0,
+    "trail_rupees": 250.0,
+    "risk_mode": "PER_LOT",
+    "first_target_sl_mode": "MIDPOINT",
+    "strategy": "target_trail",
+    "trail_percent": 10.0,
+    "atr_period": 3,
+    "atr_multiplier": 2.0,
+    "breakeven_seconds": 60.0,
+    "max_hold_seconds": 0.0,
+}
+
+
+class FakeRules:
+    def __init__(self, **overrides):
+        self.table = RuleTable([], {**DEFAULTS, **overrides})
+
+    def resolve(self, symbol, segment="NFO"):
+        return self.table.resolve(symbol, segment)
+
+
+def make_position(symbol="NIFTY24DEC25000CE", buy_price=100.0, opened_at=0.0, **overrides):
+    # 1 lot of 75: sl_gap 6.67, target_gap 13.33, trail_step 3.33
+    position = build_position(symbol, buy_price, 75, {**DEFAULTS, **overrides}, opened_at)
+    position['sl_trigger'] = buy_price - position['sl_gap']
+    return position
+
+
+@pytest.mark.parametrize("scenario, first_target_hit, sl, ltp, expected", [
+    ("below target - nothing", False, 93.33, 110.0, None),
+    ("first target - SL to midpoint", False, 93.33, 113.5, ("modify", 106.665, "first_target")),
+    ("trail less than one step - same SL filtered", True, 106.665, 115.0, None),
+    ("trail two steps", True, 106.665, 120.0, ("modify", 113.325, "trail")),
+    ("LTP through SL", True, 106.665, 106.0, ("sl_hit", 106.665, "ltp_below_sl")),
+])
+def test_target_trail_matches_original_logic(scenario, first_target_hit, sl, ltp, expected):
+    position = make_position()
+    position['first_target_hit'] = first_target_hit
+    position['sl_trigger'] = sl
+    decisions = StrategyEngine(min_sl_step=0.1).evaluate([(position, ltp)], now=0.0)
+    if expected is None:
+        assert decisions == [], f"Failed in scenario: {scenario}"
+    else:
+        (decision,) = decisions
+        assert (decision.action, decision.reason) == (expected[0], expected[2]), f"Failed in scenario: {scenario}"
+        assert decision.sl == pytest.approx(expected[1], abs=0.01)
+
+
+def test_one_call_per_strategy_per_batch(monkeypatch):
+    calls = []
+    for name in ("target_trail", "percent_trail"):
+        strategy = get_strategy(name)
+        original = strategy.evaluate
+        monkeypatch.setattr(strategy, "evaluate",
+                            lambda positions, ltps, now, _orig=original, _name=name: calls.append((_name, len(positions))) or _orig(positions, ltps, now))
+
+    updates = [(make_position(f"NIFTY24DEC{25000 + i}CE"), 101.0) for i in range(5)]
+    updates += [(make_position(f"NIFTY24DEC{26000 + i}CE", strategy="percent_trail"), 101.0) for i in range(3)]
+    StrategyEngine(0.1).evaluate(updates, now=0.0)
+
+    assert sorted(calls) == [("percent_trail", 3), ("target_trail", 5)]
+
+
+@pytest.mark.parametrize("strategy", ["target_trail", "breakeven_after", "time_exit"])
+def test_batch_matches_positions_evaluated_alone(strategy):
+    def positions():
+        batch = []
+        for i, (hit, ltp) in enumerate([(False, 110.0), (False, 113.5), (True, 120.0), (True, 105.0)]):
+            position = make_position(f"NIFTY24DEC{25000 + i}CE", strategy=strategy, opened_at=10.0 * i,
+                                     breakeven_seconds=60.0, max_hold_seconds=300.0)
+            position['first_target_hit'] = hit
+            batch.append((position, ltp))
+        return batch
+
+    alone = [get_strategy(strategy).evaluate([position], [ltp], 320.0) for position, ltp in positions()]
+    batched = get_strategy(strategy).evaluate(*zip(*positions()), 320.0)
+    assert sorted(batched) == sorted(decision for decisions in alone for decision in decisions)
+    assert len(batched) >= 2
+
+
+def test_percent_trail_follows_high():
+    position = make_position(strategy="percent_trail", trail_percent=10.0)
+    engine = StrategyEngine(0.1)
+    (decision,) = engine.evaluate([(position, 120.0)], now=0.0)
+    assert decision.sl == pytest.approx(108.0)
+    position['sl_trigger'] = decision.sl
+    assert engine.evaluate([(position, 115.0)], now=1.0) == []  # Below the high - SL holds
+
+
+def test_atr_trail_waits_for_warmup_then_trails():
+    position = make_position(strategy="atr_trail", atr_period=3, atr_multiplier=2.0)
+    engine = StrategyEngine(0.1)
+    assert engine.evaluate([(position, 101.0)], now=0.0) == []
+    assert engine.evaluate([(position, 102.0)], now=1.0) == []
+    (decision,) = engine.evaluate([(position, 103.0)], now=2.0)
+    assert decision.reason == "atr_trail"
+    assert 93.33 < decision.sl < 103.0
+
+
+def test_breakeven_after_seconds_in_profit():
+    position = make_position(strategy="breakeven_after", breakeven_seconds=60.0, opened_at=1000.0)
+    engine = StrategyEngine(0.1)
+    assert engine.evaluate([(position, 105.0)], now=1030.0) == []
+    (decision,) = engine.evaluate([(position, 105.0)], now=1060.0)
+    assert (decision.sl, decision.reason) == (100.0, "breakeven")
+    position['sl_trigger'] = 100.0
+    assert engine.evaluate([(position, 105.0)], now=1070.0) == []
+
+
+def test_time_exit_after_max_hold():
+    position = make_position(strategy="time_exit", max_hold_seconds=300.0, opened_at=0.0)
+    engine = StrategyEngine(0.1)
+    assert engine.evaluate([(position, 101.0)], now=299.0) == []
+    (decision,) = engine.evaluate([(position, 101.0)], now=300.0)
+    assert (decision.action, decision.reason) == ("exit", "max_hold")
+
+
+def test_unknown_strategy_rejected_by_rules():
+    with pytest.raises(ValueError, match="Unknown strategy"):
+        RuleTable([{"strategy": "martingale"}], DEFAULTS)
+
+
+def test_replay_runs_same_strategy_offline():
+    ticks = [(0, "NIFTY24DEC25000CE", 100.0), (1, "NIFTY24DEC25000CE", 114.0),
+             (4, "NIFTY24DEC25000CE", 121.0), (5, "NIFTY24DEC25000CE", 112.0)]
+    results = replay(ticks, [("NIFTY24DEC25000CE", 100.0, 75)], FakeRules(), min_sl_step=0.1)
+
+    result = results["NIFTY24DEC25000CE"]
+    assert [reason for _, _, reason in result['sl_changes']] == ["initial", "first_target", "trail"]
+    assert result['exit_reason'] == "ltp_below_sl"
+    assert result['exit_price'] == pytest.approx(113.325, abs=0.01)
+    assert result['pnl'] == pytest.approx((113.325 - 100.0) * 75, abs=1.0)
+
+
+def test_bot_applies_batched_decisions(make_bot, monkeypatch):
+    monkeypatch.setattr(config, "THROTTLE_SECONDS", 0.0)
+    bot = make_bot(tokens={"NIFTY24DEC25000CE": 111, "NIFTY24DEC25100CE": 222})
+    bot.start_market_websocket = lambda: None
+    bot.start_trailing_for_position("NIFTY24DEC25000CE", 100.0, 75)
+    bot.start_trailing_for_position("NIFTY24DEC25100CE", 50.0, 75)
+    bot.token_to_symbol = {111: "NIFTY24DEC25000CE", 222: "NIFTY24DEC25100CE"}
+
+    bot.handle_ticks([
+        {"instrument_token": 111, "last_price": 114.0},  # First target
+        {"instrument_token": 222, "last_price": 43.0},   # Through the SL
+    ])
+
+    position = bot.active_positions["NIFTY24DEC25000CE"]
+    assert position['first_target_hit']
+    assert position['sl_trigger'] == pytest.approx(106.665, abs=0.01)
+    assert "NIFTY24DEC25100CE" not in bot.active_positions
+    assert ("modify", position['sl_order_id'], position['sl_trigger']) in bot.kite_client.calls
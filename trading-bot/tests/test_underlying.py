@@ -0,0 +1,101 @@
+import datetime
+import types
+import pytest
+from src import config
+from src import underlying
+from src.underlying import UnderlyingTracker, bs_price, implied_vol
+from src.utils.clock import VirtualClock
+
+try:
+    import numpy as np
+except ImportError:  # Optional - pdm install -G underlying
+    np = None
+
+needs_numpy = pytest.mark.skipif(np is None, reason="numpy not installed (pdm install -G underlying)")
+
+CALL, PUT = "NIFTY25O2325000CE", "NIFTY25O2325000PE"  # Weekly, expiring 2025-10-23
+SPOT_TOKEN = 256265
+MONDAY = datetime.datetime(2025, 10, 20, 10, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=5, minutes=30))).timestamp()
+
+
+@needs_numpy
+def test_implied_vol_inverts_price_and_rejects_unreachable_prices():
+    strikes = np.array([24000.0, 25000.0, 26000.0, 25000.0])
+    calls = np.array([True, True, True, False])
+    years = np.full(4, 7 / 365)
+    prices = bs_price(25000.0, strikes, years, 0.065, np.full(4, 0.15), calls)
+    assert implied_vol(prices, 25000.0, strikes, years, 0.065, calls) == pytest.approx([0.15] * 4, abs=1e-6)
+    # Below intrinsic: no vol prices it
+    assert np.isnan(implied_vol(np.array([500.0]), 25000.0, np.array([24000.0]), np.array([7 / 365]), 0.065,
+                                np.array([True])))[0]
+
+
+@needs_numpy
+def test_tracker_reprices_every_option_on_an_underlying_with_cached_vols():
+    tracker = UnderlyingTracker({"NIFTY": "NSE:NIFTY 50"}, refresh_seconds=60)
+    call = {'symbol': CALL, 'option_ltp': 120.0}
+    put = {'symbol': PUT, 'option_ltp': 110.0}
+    assert tracker.add(call) == tracker.add(put) == "NSE:NIFTY 50"
+    assert tracker.add({'symbol': "NIFTY25OCTFUT"}) is None  # Not an option
+
+    # Vols are solved from the options' own LTPs, so the model starts at their quotes
+    prices = dict((p['symbol'], price) for p, price in tracker.reprice("NSE:NIFTY 50", 25000.0, MONDAY))
+    assert prices == {CALL: pytest.approx(120.0, abs=0.01), PUT: pytest.approx(110.0, abs=0.01)}
+
+    # A noisy option quote doesn't move the model until the vols are refreshed
+    call['option_ltp'] = 150.0
+    moved = dict((p['symbol'], price) for p, price in tracker.reprice("NSE:NIFTY 50", 25050.0, MONDAY + 30))
+    assert moved[CALL] > prices[CALL] and moved[PUT] < prices[PUT]
+    assert moved[CALL] < 150.0
+    refreshed = dict((p['symbol'], price) for p, price in tracker.reprice("NSE:NIFTY 50", 25050.0, MONDAY + 60))
+    assert refreshed[CALL] == pytest.approx(150.0, abs=0.01)
+
+    assert tracker.remove(CALL) is None  # The put still follows NIFTY
+    assert tracker.remove(PUT) == "NSE:NIFTY 50" and tracker.keys() == []
+
+
+def underlying_bot(make_bot, monkeypatch, subscribed):
+    monkeypatch.setattr(config, "TRAIL_SOURCE", "UNDERLYING")
+    monkeypatch.setattr(config, "STRATEGY", "percent_trail")
+    monkeypatch.setattr(config, "THROTTLE_SECONDS", 0)
+    bot = make_bot(tokens={CALL: 11, "NIFTY 50": SPOT_TOKEN})
+    bot.clock = VirtualClock(MONDAY)
+    bot.market_ws = types.SimpleNamespace(MODE_LTP="ltp", MODE_FULL="full", subscribe=subscribed.extend,
+                                          set_mode=lambda mode, tokens: None, unsubscribe=lambda tokens: None)
+    bot.start_trailing_for_position(CALL, 120.0, 75)
+    return bot
+
+
+@needs_numpy
+def test_bot_trails_from_the_underlying_and_stops_on_the_option(make_bot, monkeypatch):
+    subscribed = []
+    bot = underlying_bot(make_bot, monkeypatch, subscribed)
+    position = bot.active_positions[CALL]
+    assert position['underlying'] == "NSE:NIFTY 50" and subscribed == [11, SPOT_TOKEN]
+
+    def modifies():
+        return [call for call in bot.kite_client.calls if call[0] == "modify"]
+
+    bot.handle_ticks([{"instrument_token": 11, "last_price": 120.0}, {"instrument_token": SPOT_TOKEN, "last_price": 25000.0}])
+    bot.handle_ticks([{"instrument_token": 11, "last_price": 180.0}])  # Spread noise - the trail ignores it
+    assert modifies() == []
+
+    bot.handle_ticks([{"instrument_token": SPOT_TOKEN, "last_price": 25100.0}])
+    assert len(modifies()) == 1
+    assert position['sl_trigger'] == pytest.approx(0.9 * position['strategy_state']['high'])
+    assert position['strategy_state']['high'] < 180.0  # The model price, not the option's spike
+
+    bot.handle_ticks([{"instrument_token": 11, "last_price": position['sl_trigger'] - 1}])  # The stop filled
+    assert CALL not in bot.active_positions and bot.underlyings.keys() == []
+    assert SPOT_TOKEN not in bot.subscribed_tokens
+
+
+def test_without_numpy_positions_trail_on_their_own_ltp(make_bot, monkeypatch):
+    monkeypatch.setattr(underlying, "np", None)
+    subscribed = []
+    bot = underlying_bot(make_bot, monkeypatch, subscribed)
+    position = bot.active_positions[CALL]
+    assert position['underlying'] is None and subscribed == [11]  # No spot subscription
+
+    bot.handle_ticks([{"instrument_token": 11, "last_price": 150.0}])
+    assert position['sl_trigger'] == pytest.approx(135.0)  # 10% under the option's own high